@@ -1,18 +1,169 @@
-from sqlalchemy import create_engine
+import logging
+import os
+
+from sqlalchemy import create_engine, event, inspect, select
+from sqlalchemy.schema import AddConstraint, CreateTable, MetaData
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-DATABASE_URL = "sqlite:///./app.db" 
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app.db")
+DB_ECHO = _env_bool("DB_ECHO", False)
+
+# Pool de conexões (só para bancos servidor, ex.: Postgres)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 30))
+
+# PRAGMAs aplicados a cada conexão SQLite
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_FOREIGN_KEYS = _env_bool("SQLITE_FOREIGN_KEYS", True)
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+def async_url(url: str) -> str:
+    scheme, rest = url.split("://", 1)
+    return f"{ASYNC_DRIVERS.get(scheme.split('+')[0], scheme)}://{rest}"
+
+def is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+def engine_options(url: str) -> dict:
+    options = {"echo": DB_ECHO}
+    if is_sqlite(url):
+        if "aiosqlite" not in url:
+            options["connect_args"] = {"check_same_thread": False}
+        return options
+    options.update(
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_pre_ping=True,
+    )
+    return options
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA foreign_keys={'ON' if SQLITE_FOREIGN_KEYS else 'OFF'}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
 
-# engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False}, echo=True)
+def configure_engine(engine, url: str):
+    if is_sqlite(url):
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+    return engine
+
+engine = configure_engine(create_engine(DATABASE_URL, **engine_options(DATABASE_URL)), DATABASE_URL)
 
-# SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, expire_on_commit=False)
 Base = declarative_base()
 
+# Engine assíncrono opcional, usado pelos endpoints de leitura mais acessados.
+# Depende de um driver async (aiosqlite/asyncpg); sem ele, só o engine síncrono existe.
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", async_url(DATABASE_URL))
+try:
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL))
+    configure_engine(async_engine.sync_engine, ASYNC_DATABASE_URL)
+    AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+except ImportError as e:
+    logging.warning(f"Engine assíncrono indisponível: {e}")
+    async_engine = None
+    AsyncSessionLocal = None
+
+def ensure_indexes(engine):
+    """create_all não cria índices novos em tabelas que já existem; este passo cria."""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+def _stale_foreign_keys(inspector, table):
+    reflected = {
+        (tuple(fk["constrained_columns"]), fk["referred_table"]): fk
+        for fk in inspector.get_foreign_keys(table.name)
+    }
+    stale = []
+    for constraint in table.foreign_key_constraints:
+        if not constraint.ondelete:
+            continue
+        fk = reflected.get((tuple(constraint.column_keys), constraint.referred_table.name))
+        current = ((fk or {}).get("options") or {}).get("ondelete") or ""
+        if current.upper() != constraint.ondelete.upper():
+            stale.append((constraint, fk))
+    return stale
+
+def _rebuild_sqlite_table(engine, table):
+    # SQLite não altera FKs: recria a tabela e copia as linhas (procedimento da doc do SQLite).
+    metadata = MetaData()
+    for other in Base.metadata.sorted_tables:
+        other.to_metadata(metadata)
+    temporary = table.to_metadata(metadata, name=f"{table.name}__rebuild")
+    columns = [column.name for column in table.columns]
+    with engine.connect() as connection:
+        connection.exec_driver_sql("PRAGMA foreign_keys=OFF")
+        connection.commit()
+        try:
+            with connection.begin():
+                connection.execute(CreateTable(temporary))
+                connection.execute(temporary.insert().from_select(columns, select(*table.columns)))
+                connection.exec_driver_sql(f"DROP TABLE {table.name}")
+                connection.exec_driver_sql(f"ALTER TABLE {temporary.name} RENAME TO {table.name}")
+        finally:
+            connection.exec_driver_sql(f"PRAGMA foreign_keys={'ON' if SQLITE_FOREIGN_KEYS else 'OFF'}")
+            connection.commit()
+
+def ensure_foreign_key_cascades(engine):
+    """
+    Aplica as regras `ondelete` do modelo em bancos criados antes delas. No SQLite
+    a tabela é recriada (os índices voltam em `ensure_indexes`); nos demais, a FK é
+    trocada por ALTER TABLE.
+    """
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        stale = _stale_foreign_keys(inspector, table)
+        if not stale:
+            continue
+        logging.info(f"Atualizando regras ON DELETE da tabela {table.name}")
+        if engine.dialect.name == "sqlite":
+            _rebuild_sqlite_table(engine, table)
+            continue
+        quote = engine.dialect.identifier_preparer.quote
+        with engine.begin() as connection:
+            for constraint, fk in stale:
+                if fk and fk.get("name"):
+                    connection.exec_driver_sql(f"ALTER TABLE {quote(table.name)} DROP CONSTRAINT {quote(fk['name'])}")
+                connection.execute(AddConstraint(constraint))
+
 def create_tables():
+    from app.services.search import ensure_search_index
+    from app.services.category_counter import ensure_product_count_column
+    from app.services.profit_service import ensure_profit_margin_columns
+    from app.services.catalog_names import ensure_normalized_name_columns
+    from app.services.sales_rollup import ensure_sales_rollup
+
     Base.metadata.create_all(bind=engine)
+    ensure_foreign_key_cascades(engine)
+    ensure_normalized_name_columns(engine)
+    ensure_indexes(engine)
+    ensure_product_count_column(engine)
+    ensure_profit_margin_columns(engine)
+    ensure_sales_rollup(engine)
+    ensure_search_index(engine)
 
 def get_db():
     db = SessionLocal()
@@ -20,3 +171,9 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    if AsyncSessionLocal is None:
+        raise RuntimeError("Driver assíncrono não instalado (aiosqlite/asyncpg)")
+    async with AsyncSessionLocal() as db:
+        yield db
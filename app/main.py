@@ -3,12 +3,21 @@ import os
 
 load_dotenv()
 
-import logging
+from app.services.logging_config import configure_logging
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+configure_logging()
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.routers import products, categories, sales, export, users, price_history
+from app.routers import products, categories, sales, export, users, price_history, maintenance, metrics
+from app.services.email_service import mail_queue
+from app.services.security import start_hash_pool, shutdown_hash_pool
+from app.services.response_cache import ResponseCacheMiddleware
+from app.services.metrics import MetricsMiddleware, instrument_engine
+from app.services.slow_query import instrument_slow_queries
+from app.services.write_queue import write_queue, WRITE_QUEUE_ENABLED
+from app.services.logging_config import RequestContextMiddleware, stop_logging
+from app.database import create_tables, engine, async_engine
 from fastapi.middleware.cors import CORSMiddleware
 
 tags_metadata = [
@@ -36,15 +45,41 @@ tags_metadata = [
         "name": "price-history",
         "description": "Operações relacionadas à histórico de preços dos produtos",
     },
+    {
+        "name": "maintenance",
+        "description": "Tarefas de manutenção executadas em segundo plano",
+    },
 ]
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_hash_pool()
+    create_tables()
+    mail_queue.start()
+    if WRITE_QUEUE_ENABLED:
+        write_queue.start()
+        instrument_slow_queries(write_queue.engine)
+    yield
+    write_queue.stop()
+    mail_queue.stop()
+    shutdown_hash_pool()
+    stop_logging()
+
 app = FastAPI(
     title="SmartMart API",
     description="API para gerenciamento interno de produtos, categorias e vendas da SmartMart Solutions.",
     version="1.0.0",
-    openapi_tags=tags_metadata
+    openapi_tags=tags_metadata,
+    lifespan=lifespan
 )
 
+for instrumented in (engine, async_engine.sync_engine if async_engine is not None else None):
+    if instrumented is not None:
+        instrument_engine(instrumented)
+        instrument_slow_queries(instrumented)
+
+app.add_middleware(ResponseCacheMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000"],  
@@ -53,12 +88,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(MetricsMiddleware)
+
+app.add_middleware(RequestContextMiddleware)
+
 app.include_router(products.router)
 app.include_router(categories.router)
 app.include_router(sales.router)
 app.include_router(export.router)
 app.include_router(users.router)
 app.include_router(price_history.router)
+app.include_router(maintenance.router)
+app.include_router(metrics.router)
 
 if __name__ == "__main__":
     smtp_user = os.getenv("SMTP_USER")
@@ -1 +1 @@
-from .models import Category, Product, Sale, User, PriceHistory 
\ No newline at end of file
+from .models import Category, Product, Sale, SalesDailyRollup, User, PriceHistory 
\ No newline at end of file
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Enum, func
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Date, Enum, Index, UniqueConstraint, func
+from sqlalchemy.orm import relationship, synonym
 from app.database import Base
+from app.utils.names import normalized_name_default
 from datetime import datetime
 import enum  
 
@@ -8,9 +9,13 @@ class Category(Base):
     __tablename__ = "categories"
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, unique=True, index=True)
+    normalized_name = Column(String, nullable=True, unique=True, index=True, default=normalized_name_default)
     description = Column(String, nullable=True) 
     discount_percentage = Column(Float, nullable=True)
+    profit_margin = Column(Float, nullable=True)
+    product_count = Column(Integer, nullable=False, default=0, server_default="0")
     products = relationship("Product", back_populates="category")
+    total_products = synonym("product_count")
 
     def __repr__(self):
         return f"Category(id={self.id}, name={self.name})"
@@ -19,12 +24,14 @@ class Product(Base):
     __tablename__ = "products"
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
+    normalized_name = Column(String, nullable=True, unique=True, index=True, default=normalized_name_default)
     description = Column(String, nullable=True)
     price = Column(Float, nullable=True)
     category_id = Column(Integer, ForeignKey("categories.id"), nullable=True)
     brand = Column(String, nullable=True)
+    profit_margin = Column(Float, nullable=True)
     category = relationship("Category", back_populates="products")
-    price_history = relationship("PriceHistory", back_populates="product")
+    price_history = relationship("PriceHistory", back_populates="product", cascade="all, delete", passive_deletes=True)
     sales = relationship("Sale", cascade="all, delete", passive_deletes=True)
 
 class Sale(Base):
@@ -35,6 +42,40 @@ class Sale(Base):
     total_price = Column(Float)
     date = Column(DateTime)
 
+class SalesDailyRollup(Base):
+    __tablename__ = "sales_daily_rollup"
+    __table_args__ = (UniqueConstraint("product_id", "day", name="uq_sales_daily_rollup_product_day"),)
+
+    id = Column(Integer, primary_key=True)
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
+    day = Column(Date, nullable=False, index=True)
+    sale_count = Column(Integer, nullable=False, default=0)
+    quantity = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0.0)
+    profit = Column(Float, nullable=False, default=0.0)
+
+class SaleChange(Base):
+    # Vendas alteradas/removidas (ou produto removido, com as vendas em cascata), para
+    # que a cópia analítica de cada processo veja as escritas dos outros.
+    __tablename__ = "sale_changes"
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = Column(Integer, primary_key=True)
+    sale_id = Column(Integer, nullable=True)
+    product_id = Column(Integer, nullable=True)
+    changed_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+class TokenRevocation(Base):
+    # Revogações de sessão (por jti ou por usuário), lidas por todos os workers.
+    __tablename__ = "token_revocations"
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = Column(Integer, primary_key=True)
+    jti = Column(String, nullable=True)
+    user_id = Column(Integer, nullable=True)
+    revoked_at = Column(Float, nullable=False)
+    expires_at = Column(Float, nullable=False, index=True)
+
 class RoleEnum(str, enum.Enum):  
     admin = "admin"
     viewer = "viewer"
@@ -51,9 +92,10 @@ class User(Base):
 
 class PriceHistory(Base):
     __tablename__ = 'price_history'
+    __table_args__ = (Index("ix_price_history_product_date", "product_id", "date"),)
 
     id = Column(Integer, primary_key=True, index=True)
-    product_id = Column(Integer, ForeignKey('products.id'))
+    product_id = Column(Integer, ForeignKey('products.id', ondelete="CASCADE"))
     price = Column(Float)
     date = Column(DateTime, default=datetime.utcnow)
     reason = Column(String)
@@ -1,102 +1,150 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile
 from sqlalchemy.orm import Session, aliased
 from sqlalchemy import asc, desc, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models import models
 from app.schemas import schemas
-from app.database import get_db
-from app.utils.pagination import paginate
+from app.database import get_db, get_async_db
+from app.services.response_cache import invalidate, PRODUCTS, CATEGORIES
+from app.utils.pagination import paginate, paginate_cursor, COUNT_MODES
 from app.schemas.schemas import PaginatedResponse
+from app.services.auth import require_viewer, require_admin
+from app.services import catalog_names
+from app.services.csv_importer import IMPORT_MODES
+from app.utils.names import normalize_name
+from app.services.write_queue import run_write
 
-router = APIRouter(prefix="/categories", tags=["categories"])
+router = APIRouter(prefix="/categories", tags=["categories"], dependencies=[Depends(require_viewer)])
 
 @router.get("", response_model=schemas.PaginatedResponse[schemas.Category])
-def get_categories(
-    db: Session = Depends(get_db),
+async def get_categories(
+    db: AsyncSession = Depends(get_async_db),
     sort_by: str = Query("name", enum=["id", "name"]),
     sort_order: str = Query("asc", enum=["asc", "desc"]),
     skip: int = Query(0, ge=0),
-    limit: int = Query(10, ge=1)
+    limit: int = Query(10, ge=1),
+    pagination: str = Query("offset", enum=["offset", "cursor"]),
+    cursor: str = Query(None),
+    count: str = Query("exact", enum=COUNT_MODES)
+):
+    return await db.run_sync(list_categories, sort_by, sort_order, skip, limit, pagination, cursor, count)
+
+def list_categories(
+    db: Session,
+    sort_by: str = "name",
+    sort_order: str = "asc",
+    skip: int = 0,
+    limit: int = 10,
+    pagination: str = "offset",
+    cursor: str = None,
+    count: str = "exact"
 ):
     sort_direction = desc if sort_order == "desc" else asc
     sort_column = models.Category.id if sort_by == "id" else models.Category.name
 
-    query = db.query(models.Category).order_by(sort_direction(sort_column))
+    query = db.query(models.Category)
 
-    query = query.outerjoin(models.Product).group_by(models.Category.id)
-
-    categories, total = paginate(query, skip, limit)
+    next_cursor = None
+    if pagination == "cursor" or cursor:
+        categories, total, next_cursor = paginate_cursor(
+            query, sort_by, sort_column, models.Category.id, sort_order, cursor, limit, count
+        )
+    else:
+        query = query.order_by(sort_direction(sort_column))
+        categories, total = paginate(query, skip, limit, count)
 
     for category in categories:
-        category_data = db.query(models.Product).filter(models.Product.category_id == category.id).count()
-        category.total_products = category_data
         category.description = category.description or ""
 
     return schemas.PaginatedResponse(
         items=categories,
-        total=total
+        total=total,
+        next_cursor=next_cursor
     )
 
 
-@router.post("/", response_model=schemas.Category)
+@router.post("/", response_model=schemas.Category, dependencies=[Depends(require_admin)])
 def create_category(category: schemas.CategoryCreate, db: Session = Depends(get_db)):
-    normalized_name = category.name.strip().lower()
-
-    existing_category = db.query(models.Category).filter(
-        models.Category.name.ilike(normalized_name)
-    ).first()
+    try:
+        db_category = run_write(db, insert_category, category)
+    except IntegrityError:
+        # Outra requisição gravou o mesmo nome entre a checagem e o commit.
+        raise HTTPException(status_code=400, detail="Categoria com o mesmo nome já existe")
+    invalidate(CATEGORIES)
+    return db_category
 
-    if existing_category:
+def insert_category(db: Session, category: schemas.CategoryCreate):
+    if catalog_names.name_taken(db, models.Category, category.name):
         raise HTTPException(status_code=400, detail="Categoria com o mesmo nome já existe")
 
     if category.discount_percentage is not None and (category.discount_percentage < 0 or category.discount_percentage > 100):
         raise HTTPException(status_code=400, detail="O campo 'discount_percentage' deve estar entre 0 e 100")
 
-    db_category = models.Category(**category.dict())
+    if category.profit_margin is not None and not 0 <= category.profit_margin <= 1:
+        raise HTTPException(status_code=400, detail="O campo 'profit_margin' deve estar entre 0 e 1")
+
+    db_category = models.Category(**category.dict(), normalized_name=normalize_name(category.name))
     db.add(db_category)
-    db.commit()
+    db.flush()
     db.refresh(db_category)
     return db_category
 
-@router.put("/{category_id}", response_model=schemas.Category)
+@router.put("/{category_id}", response_model=schemas.Category, dependencies=[Depends(require_admin)])
 def update_category(
     category_id: int,
     updated_category: schemas.CategoryUpdate = None,
     db: Session = Depends(get_db)
 ):
+    try:
+        category = run_write(db, change_category, category_id, updated_category)
+    except IntegrityError:
+        raise HTTPException(status_code=400, detail="Já existe outra categoria com esse nome")
+    invalidate(CATEGORIES, PRODUCTS)
+    return category
+
+def change_category(db: Session, category_id: int, updated_category: schemas.CategoryUpdate = None):
     category = db.query(models.Category).filter(models.Category.id == category_id).first()
     if not category:
         raise HTTPException(status_code=404, detail="Categoria não encontrada")
     if not updated_category:
         raise HTTPException(status_code=400, detail="Nenhum dado foi fornecido para atualização.")
     if updated_category.name is not None:
-        normalized_name = updated_category.name.strip().lower()
-        existing_category = db.query(models.Category).filter(
-            models.Category.id != category_id,
-            models.Category.name.ilike(normalized_name)
-        ).first()
-        if existing_category:
+        if catalog_names.name_taken(db, models.Category, updated_category.name, exclude_id=category_id):
             raise HTTPException(status_code=400, detail="Já existe outra categoria com esse nome")
         category.name = updated_category.name.strip()
+        category.normalized_name = normalize_name(updated_category.name)
     if updated_category.description is not None:
         category.description = updated_category.description
     if updated_category.discount_percentage is not None:
         category.discount_percentage = updated_category.discount_percentage
-    db.commit()
+    if updated_category.profit_margin is not None:
+        if not 0 <= updated_category.profit_margin <= 1:
+            raise HTTPException(status_code=400, detail="O campo 'profit_margin' deve estar entre 0 e 1")
+        category.profit_margin = updated_category.profit_margin
+    db.flush()
     db.refresh(category)
     return category
 
 
-@router.delete("/{category_id}")
+@router.delete("/{category_id}", dependencies=[Depends(require_admin)])
 def delete_category(category_id: int, db: Session = Depends(get_db)):
+    run_write(db, remove_category, category_id)
+    invalidate(CATEGORIES, PRODUCTS)
+    return {"detail": "Categoria deletada com sucesso"}
+
+def remove_category(db: Session, category_id: int):
     category = db.query(models.Category).filter(models.Category.id == category_id).first()
     if not category:
         raise HTTPException(status_code=404, detail="Categoria não encontrada")
 
     db.delete(category)
-    db.commit()
-    return {"detail": "Categoria deletada com sucesso"}
 
-@router.post("/upload-csv")
-def upload_categories_csv(file: UploadFile, db: Session = Depends(get_db)):
+@router.post("/upload-csv", dependencies=[Depends(require_admin)])
+def upload_categories_csv(
+    file: UploadFile,
+    db: Session = Depends(get_db),
+    mode: str = Query("insert", enum=IMPORT_MODES)
+):
     from app.services.csv_importer import import_categories_csv
-    return import_categories_csv(file, db)
+    return import_categories_csv(file, db, mode)
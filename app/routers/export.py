@@ -1,60 +1,110 @@
-from fastapi import APIRouter, Depends
-from fastapi.responses import StreamingResponse
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-import csv
-import io
 
 from app.database import get_db
-# from app import models
-from app.models.models import Product, Sale, Category, User  
+from app.models.models import Product, Sale, Category, User, PriceHistory
+from app.utils.streaming import csv_response
+from app.utils.columnar import columnar_response, COLUMNAR_FORMATS
+from app.utils.profit import margin_expression
+from app.services.auth import require_viewer, require_admin
 
-router = APIRouter(prefix="/export", tags=["export"])
+router = APIRouter(prefix="/export", tags=["export"], dependencies=[Depends(require_viewer)])
 
-def generate_csv(data, headers):
-    stream = io.StringIO()
-    writer = csv.writer(stream)
-    writer.writerow(headers)
-    for item in data:
-        writer.writerow([getattr(item, h) for h in headers])
-    stream.seek(0)
-    return stream
+EXPORT_FORMATS = ("csv",) + COLUMNAR_FORMATS
+COMPRESSION_OPTIONS = ("zstd", "snappy", "gzip", "lz4", "none")
 
-@router.get("/products")
-def export_products_csv(db: Session = Depends(get_db)):
-    products = db.query(Product).all()
+def _export(db: Session, statement, name: str, format: str, compression: str = None):
+    if format == "csv":
+        return csv_response(db, statement, f"{name}.csv")
+    return columnar_response(db, statement, name, format, compression)
 
-    headers = ["id", "name", "description", "price", "category_id", "brand"]
+def _filtered(statement, date_column, product_column, start: datetime = None, end: datetime = None, product_id: int = None):
+    if start:
+        statement = statement.where(date_column >= start)
+    if end:
+        statement = statement.where(date_column < end)
+    if product_id is not None:
+        statement = statement.where(product_column == product_id)
+    return statement
 
-    return StreamingResponse(
-        generate_csv(products, headers),
-        media_type="text/csv",
-        headers={"Content-Disposition": "attachment; filename=products.csv"}
-    )
+@router.get("/products")
+def export_products_csv(
+    db: Session = Depends(get_db),
+    format: str = Query("csv", enum=EXPORT_FORMATS),
+    compression: str = Query(None, enum=COMPRESSION_OPTIONS)
+):
+    statement = select(
+        Product.id, Product.name, Product.description, Product.price, Product.category_id, Product.brand
+    ).order_by(Product.id)
+    return _export(db, statement, "products", format, compression)
 
 @router.get("/sales")
-def export_sales_csv(db: Session = Depends(get_db)):
-    sales = db.query(Sale).all()
-    headers = ["id", "product_id", "quantity", "total_price", "date"]
-    return StreamingResponse(generate_csv(sales, headers), media_type="text/csv", headers={"Content-Disposition": "attachment; filename=sales.csv"})
+def export_sales_csv(
+    db: Session = Depends(get_db),
+    format: str = Query("csv", enum=EXPORT_FORMATS),
+    compression: str = Query(None, enum=COMPRESSION_OPTIONS),
+    start: datetime = Query(None),
+    end: datetime = Query(None),
+    product_id: int = Query(None)
+):
+    statement = select(Sale.id, Sale.product_id, Sale.quantity, Sale.total_price, Sale.date).order_by(Sale.id)
+    statement = _filtered(statement, Sale.date, Sale.product_id, start, end, product_id)
+    return _export(db, statement, "sales", format, compression)
 
 @router.get("/categories")
-def export_categories_csv(db: Session = Depends(get_db)):
-    categories = db.query(Category).all()
-    headers = ["id", "name", "description"]  
-    return StreamingResponse(generate_csv(categories, headers), media_type="text/csv", headers={"Content-Disposition": "attachment; filename=categories.csv"})
+def export_categories_csv(
+    db: Session = Depends(get_db),
+    format: str = Query("csv", enum=EXPORT_FORMATS),
+    compression: str = Query(None, enum=COMPRESSION_OPTIONS)
+):
+    statement = select(Category.id, Category.name, Category.description).order_by(Category.id)
+    return _export(db, statement, "categories", format, compression)
 
 @router.get("/sales_with_profit")
-def export_sales_with_profit_csv(db: Session = Depends(get_db)):
-    sales = db.query(Sale).all()
-    headers = ["id", "product_id", "quantity", "total_price", "date", "profit"]
-    return StreamingResponse(generate_csv(sales, headers), media_type="text/csv", headers={"Content-Disposition": "attachment; filename=sales_with_profit.csv"})
-
-@router.get("/users")
-def export_users_csv(db: Session = Depends(get_db)):
-    users = db.query(User).all()
-    headers = ["id", "email", "username", "role", "created_at"]
-    return StreamingResponse(
-        generate_csv(users, headers),
-        media_type="text/csv",
-        headers={"Content-Disposition": "attachment; filename=users.csv"}
-    )
\ No newline at end of file
+def export_sales_with_profit_csv(
+    db: Session = Depends(get_db),
+    format: str = Query("csv", enum=EXPORT_FORMATS),
+    compression: str = Query(None, enum=COMPRESSION_OPTIONS),
+    start: datetime = Query(None),
+    end: datetime = Query(None),
+    product_id: int = Query(None)
+):
+    statement = select(
+        Sale.id,
+        Sale.product_id,
+        Sale.quantity,
+        Sale.total_price,
+        Sale.date,
+        (Sale.total_price * margin_expression()).label("profit")
+    ).join(Product, Product.id == Sale.product_id).outerjoin(
+        Category, Category.id == Product.category_id
+    ).order_by(Sale.id)
+    statement = _filtered(statement, Sale.date, Sale.product_id, start, end, product_id)
+    return _export(db, statement, "sales_with_profit", format, compression)
+
+@router.get("/price_history")
+def export_price_history(
+    db: Session = Depends(get_db),
+    format: str = Query("csv", enum=EXPORT_FORMATS),
+    compression: str = Query(None, enum=COMPRESSION_OPTIONS),
+    start: datetime = Query(None),
+    end: datetime = Query(None),
+    product_id: int = Query(None)
+):
+    statement = select(
+        PriceHistory.id, PriceHistory.product_id, PriceHistory.price, PriceHistory.date, PriceHistory.reason
+    ).order_by(PriceHistory.id)
+    statement = _filtered(statement, PriceHistory.date, PriceHistory.product_id, start, end, product_id)
+    return _export(db, statement, "price_history", format, compression)
+
+@router.get("/users", dependencies=[Depends(require_admin)])
+def export_users_csv(
+    db: Session = Depends(get_db),
+    format: str = Query("csv", enum=EXPORT_FORMATS),
+    compression: str = Query(None, enum=COMPRESSION_OPTIONS)
+):
+    statement = select(User.id, User.email, User.username, User.role, User.created_at).order_by(User.id)
+    return _export(db, statement, "users", format, compression)
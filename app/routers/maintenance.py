@@ -0,0 +1,22 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import JSONResponse
+from fastapi.encoders import jsonable_encoder
+from app.services.auth import require_admin
+from app.services.write_queue import write_queue_status
+from remove_orphan_sales import orphan_cleanup
+
+router = APIRouter(prefix="/maintenance", tags=["maintenance"], dependencies=[Depends(require_admin)])
+
+@router.post("/orphan-sales", status_code=202)
+def start_orphan_cleanup():
+    if not orphan_cleanup.start():
+        return JSONResponse(status_code=409, content=jsonable_encoder(orphan_cleanup.status()))
+    return orphan_cleanup.status()
+
+@router.get("/orphan-sales")
+def get_orphan_cleanup_status():
+    return orphan_cleanup.status()
+
+@router.get("/write-queue")
+def get_write_queue_status():
+    return write_queue_status()
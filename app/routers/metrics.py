@@ -0,0 +1,10 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+from app.services.auth import require_admin
+from app.services.metrics import metrics, METRICS_PUBLIC
+
+router = APIRouter(tags=["metrics"], dependencies=[] if METRICS_PUBLIC else [Depends(require_admin)])
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
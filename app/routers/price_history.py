@@ -1,20 +1,71 @@
+from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import asc, desc
-from app.database import get_db
+from sqlalchemy import asc, desc, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
 from app.models import models
 from app.schemas import schemas
+from app.utils.pagination import paginate_cursor, COUNT_MODES
+from app.services.auth import require_viewer
 from typing import List
 
-router = APIRouter(prefix="/price-history", tags=["price-history"])
+router = APIRouter(prefix="/price-history", tags=["price-history"], dependencies=[Depends(require_viewer)])
+
+BUCKET_INTERVALS = ["hour", "day", "week"]
+MAX_AS_OF_PRODUCTS = 1000
+
+@router.get("/as-of", response_model=List[schemas.PriceAsOf])
+async def get_prices_as_of(
+    product_ids: List[int] = Query(...),
+    timestamp: datetime = Query(...),
+    db: AsyncSession = Depends(get_async_db)
+):
+    if len(product_ids) > MAX_AS_OF_PRODUCTS:
+        raise HTTPException(status_code=400, detail=f"Máximo de {MAX_AS_OF_PRODUCTS} produtos por consulta")
+    return await db.run_sync(prices_as_of, product_ids, timestamp)
 
 @router.get("/{product_id}", response_model=List[schemas.PriceHistory])
-def get_price_history(
+async def get_price_history(
     product_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     sort: str = Query("asc", enum=["asc", "desc"]),
     sort_by: str = Query("date", enum=["date", "price"])
 ):
+    price_history = await db.run_sync(list_price_history, product_id, sort, sort_by)
+
+    if not price_history:
+        raise HTTPException(status_code=404, detail="Histórico de preços não encontrado para o produto")
+
+    return price_history
+
+@router.get("/{product_id}/raw", response_model=schemas.PaginatedResponse[schemas.PriceHistory])
+async def get_price_history_page(
+    product_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    sort: str = Query("asc", enum=["asc", "desc"]),
+    sort_by: str = Query("date", enum=["date", "price"]),
+    start: datetime = Query(None),
+    end: datetime = Query(None),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: str = Query(None),
+    count: str = Query("none", enum=COUNT_MODES)
+):
+    return await db.run_sync(
+        list_price_history_page, product_id, sort, sort_by, start, end, limit, cursor, count
+    )
+
+@router.get("/{product_id}/buckets", response_model=List[schemas.PriceHistoryBucket])
+async def get_price_history_buckets(
+    product_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    interval: str = Query("day", enum=BUCKET_INTERVALS),
+    start: datetime = Query(None),
+    end: datetime = Query(None)
+):
+    return await db.run_sync(price_history_buckets, product_id, interval, start, end)
+
+def list_price_history(db: Session, product_id: int, sort: str = "asc", sort_by: str = "date"):
     query = db.query(models.PriceHistory).filter(models.PriceHistory.product_id == product_id)
 
     sort_column_map = {
@@ -26,9 +77,112 @@ def get_price_history(
 
     query = query.order_by(desc(sort_column) if sort == "desc" else asc(sort_column))
 
-    price_history = query.all()
-    
-    if not price_history:
-        raise HTTPException(status_code=404, detail="Histórico de preços não encontrado para o produto")
-    
-    return price_history
+    return query.all()
+
+def _in_range(statement, start: datetime = None, end: datetime = None):
+    # Filtros por product_id + intervalo de data usam o índice (product_id, date).
+    if start is not None:
+        statement = statement.filter(models.PriceHistory.date >= start)
+    if end is not None:
+        statement = statement.filter(models.PriceHistory.date < end)
+    return statement
+
+def list_price_history_page(
+    db: Session,
+    product_id: int,
+    sort: str = "asc",
+    sort_by: str = "date",
+    start: datetime = None,
+    end: datetime = None,
+    limit: int = 100,
+    cursor: str = None,
+    count: str = "none"
+):
+    query = db.query(models.PriceHistory).filter(models.PriceHistory.product_id == product_id)
+    query = _in_range(query, start, end)
+
+    sort_column_map = {
+        "date": models.PriceHistory.date,
+        "price": models.PriceHistory.price
+    }
+    sort_column = sort_column_map.get(sort_by, models.PriceHistory.date)
+
+    items, total, next_cursor = paginate_cursor(
+        query, sort_by, sort_column, models.PriceHistory.id, sort, cursor, limit, count
+    )
+    return schemas.PaginatedResponse(items=items, total=total, next_cursor=next_cursor)
+
+def _bucket_expression(db: Session, interval: str):
+    column = models.PriceHistory.date
+    if db.get_bind().dialect.name == "postgresql":
+        return func.date_trunc(interval, column)
+    # SQLite: semanas começam na segunda-feira, como no date_trunc do Postgres.
+    if interval == "hour":
+        return func.strftime("%Y-%m-%d %H:00:00", column)
+    if interval == "week":
+        return func.strftime("%Y-%m-%d 00:00:00", column, "weekday 0", "-6 days")
+    return func.strftime("%Y-%m-%d 00:00:00", column)
+
+def price_history_buckets(
+    db: Session,
+    product_id: int,
+    interval: str = "day",
+    start: datetime = None,
+    end: datetime = None
+):
+    """
+    Reduz o histórico de um produto a um ponto por hora/dia/semana com preço
+    mínimo, máximo e o último registrado no período, agregado no banco. Registros
+    sem preço ou sem data ficam de fora (e não entram em `count`): um bucket só com
+    eles teria min/max/último nulos.
+    """
+    history = models.PriceHistory
+    ranked = _in_range(
+        select(
+            _bucket_expression(db, interval).label("bucket"),
+            history.price,
+            func.row_number().over(
+                partition_by=_bucket_expression(db, interval),
+                order_by=(history.date.desc(), history.id.desc())
+            ).label("position")
+        ).where(history.product_id == product_id, history.price.is_not(None), history.date.is_not(None)),
+        start,
+        end
+    ).subquery()
+
+    statement = (
+        select(
+            ranked.c.bucket,
+            func.min(ranked.c.price).label("min_price"),
+            func.max(ranked.c.price).label("max_price"),
+            func.max(ranked.c.price).filter(ranked.c.position == 1).label("last_price"),
+            func.count().label("count")
+        )
+        .group_by(ranked.c.bucket)
+        .order_by(ranked.c.bucket)
+    )
+    return [schemas.PriceHistoryBucket(**row._mapping) for row in db.execute(statement)]
+
+def prices_as_of(db: Session, product_ids: List[int], timestamp: datetime):
+    """
+    Preço vigente de cada produto no instante `timestamp`: o último registro com
+    data <= timestamp. Cada produto resolve com uma busca no índice (product_id, date).
+    Produtos sem histórico até lá ficam de fora da resposta.
+    """
+    history = models.PriceHistory
+    latest_id = (
+        select(history.id)
+        .where(history.product_id == models.Product.id, history.date <= timestamp)
+        .order_by(history.date.desc(), history.id.desc())
+        .limit(1)
+        .correlate(models.Product)
+        .scalar_subquery()
+    )
+    statement = (
+        select(history.product_id, history.price, history.date)
+        .select_from(models.Product)
+        .join(history, history.id == latest_id)
+        .where(models.Product.id.in_(set(product_ids)))
+        .order_by(history.product_id)
+    )
+    return [schemas.PriceAsOf(**row._mapping) for row in db.execute(statement)]
@@ -1,35 +1,64 @@
 import logging
+from datetime import datetime
+from typing import List
 from fastapi import APIRouter, Depends, UploadFile, HTTPException, Query
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import asc, desc
+from sqlalchemy import DateTime, and_, asc, case, desc, literal, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models import models
 from app.schemas import schemas
-from app.services import csv_importer
-from app.database import get_db
-from app.utils.pagination import paginate
-from remove_orphan_sales import remove_orphan_sales
+from app.services import csv_importer, search, category_counter, sales_analytics, catalog_names
+from app.services.response_cache import invalidate, PRODUCTS, CATEGORIES, PRICE_HISTORY
+from app.database import get_db, get_async_db
+from app.utils.pagination import paginate, paginate_cursor, count_query, COUNT_MODES
+from app.utils.streaming import ndjson_response
+from app.utils.names import normalize_name
+from app.services.auth import require_viewer, require_admin
+from app.services.write_queue import run_write
 
-router = APIRouter(prefix="/products", tags=["products"])
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/products", tags=["products"], dependencies=[Depends(require_viewer)])
 
 @router.get("", response_model=schemas.PaginatedResponse[schemas.Product])
-def get_products(
-    db: Session = Depends(get_db),
+async def get_products(
+    db: AsyncSession = Depends(get_async_db),
     page: int = 1,
     category_id: int = Query(None),
     title: str = Query(None),
     sort: str = Query("asc", enum=["asc", "desc"]),
     sort_by: str = Query("name", enum=["id", "name", "category_id", "brand", "price"]),
     skip: int = Query(0, ge=0),
-    limit: int = Query(10, ge=1)
+    limit: int = Query(10, ge=1),
+    pagination: str = Query("offset", enum=["offset", "cursor"]),
+    cursor: str = Query(None),
+    count: str = Query("exact", enum=COUNT_MODES)
 ):
-    logging.info(f"Pagination parameters - skip: {skip}, limit: {limit}")
+    return await db.run_sync(
+        list_products, page, category_id, title, sort, sort_by, skip, limit, pagination, cursor, count
+    )
+
 
+def list_products(
+    db: Session,
+    page: int = 1,
+    category_id: int = None,
+    title: str = None,
+    sort: str = "asc",
+    sort_by: str = "name",
+    skip: int = 0,
+    limit: int = 10,
+    pagination: str = "offset",
+    cursor: str = None,
+    count: str = "exact"
+):
     query = db.query(models.Product).options(joinedload(models.Product.category))
 
     if category_id is not None:
         query = query.filter(models.Product.category_id == category_id)
     if title:
-        query = query.filter(models.Product.name.ilike(f"%{title}%"))
+        query = search.filter_by_name(db, query, title)
 
     sort_column_map = {
         "id": models.Product.id,
@@ -39,67 +68,99 @@ def get_products(
         "price": models.Product.price
     }
     sort_column = sort_column_map.get(sort_by, models.Product.name)
-    query = query.order_by(desc(sort_column) if sort == "desc" else asc(sort_column))
 
-    total = db.query(models.Product.id).count()
+    total = count_query(db.query(models.Product), count)
 
-    if page < 1:
-        page = 1
-
-    skip = (page - 1) * limit
-    logging.info(f"Corrected skip value: {skip}")
+    next_cursor = None
+    if pagination == "cursor" or cursor:
+        products, _, next_cursor = paginate_cursor(
+            query, sort_by, sort_column, models.Product.id, sort, cursor, limit, count="none"
+        )
+    else:
+        query = query.order_by(desc(sort_column) if sort == "desc" else asc(sort_column))
 
-    products, _ = paginate(query, skip, limit)
+        if page < 1:
+            page = 1
 
-    logging.info(f"Total products: {total}, Products returned: {len(products)}")
+        skip = (page - 1) * limit
 
-    logging.info(f"Generated SQL Query: {str(query)}")
+        products, _ = paginate(query, skip, limit, count="none")
 
     return schemas.PaginatedResponse(
         items=products,
-        total=total
+        total=total,
+        next_cursor=next_cursor
     )
 
 
-@router.post("", response_model=schemas.Product)
+@router.get("/search", response_model=List[schemas.Product])
+async def search_products(
+    q: str = Query(..., min_length=1),
+    category_id: int = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db)
+):
+    return await db.run_sync(ranked_products, q, category_id, limit)
+
+
+def ranked_products(db: Session, q: str, category_id: int = None, limit: int = 20):
+    query = db.query(models.Product).options(joinedload(models.Product.category))
+    if category_id is not None:
+        query = query.filter(models.Product.category_id == category_id)
+    return search.search_products(db, query, q.strip()).limit(limit).all()
+
+
+@router.post("", response_model=schemas.Product, dependencies=[Depends(require_admin)])
 def create_product(product: schemas.ProductBase, db: Session = Depends(get_db)):
-    normalized_name = product.name.strip().lower()
+    try:
+        db_product = run_write(db, insert_product, product)
+    except IntegrityError:
+        # Outra requisição gravou o mesmo nome entre a checagem e o commit.
+        raise HTTPException(status_code=400, detail="Produto com o mesmo nome já existe")
+    invalidate(PRODUCTS, CATEGORIES)
+    return db_product
 
-    existing_product = db.query(models.Product).filter(
-        models.Product.name.ilike(normalized_name)
-    ).first()
 
-    if existing_product:
+def insert_product(db: Session, product: schemas.ProductBase):
+    if catalog_names.name_taken(db, models.Product, product.name):
         raise HTTPException(status_code=400, detail="Produto com o mesmo nome já existe")
 
-    db_product = models.Product(**product.dict())
+    if product.profit_margin is not None and not 0 <= product.profit_margin <= 1:
+        raise HTTPException(status_code=400, detail="O campo 'profit_margin' deve estar entre 0 e 1")
+
+    _check_category(db, product.category_id)
+    db_product = models.Product(**product.dict(), normalized_name=normalize_name(product.name))
     db.add(db_product)
-    db.commit()
-    db.refresh(db_product)
-    return db_product
+    category_counter.adjust_product_counts(db, {db_product.category_id: 1})
+    db.flush()
+    return _loaded(db, db_product)
 
 
-@router.put("/{product_id}", response_model=schemas.Product)
+@router.put("/{product_id}", response_model=schemas.Product, dependencies=[Depends(require_admin)])
 def update_product(
     product_id: int,
     updated_product: schemas.ProductUpdate,  
     db: Session = Depends(get_db)
 ):
+    try:
+        product = run_write(db, change_product, product_id, updated_product)
+    except IntegrityError:
+        raise HTTPException(status_code=400, detail="Já existe outro produto com esse nome")
+    invalidate(PRODUCTS, CATEGORIES, PRICE_HISTORY)
+    return product
+
+
+def change_product(db: Session, product_id: int, updated_product: schemas.ProductUpdate):
     product = db.query(models.Product).filter(models.Product.id == product_id).first()
     if not product:
         raise HTTPException(status_code=404, detail="Produto não encontrado")
 
     if updated_product.name is not None:
-        normalized_name = updated_product.name.strip().lower()
-        existing_product = db.query(models.Product).filter(
-            models.Product.id != product_id, 
-            models.Product.name.ilike(normalized_name)
-        ).first()
-
-        if existing_product:
+        if catalog_names.name_taken(db, models.Product, updated_product.name, exclude_id=product_id):
             raise HTTPException(status_code=400, detail="Já existe outro produto com esse nome")
 
         product.name = updated_product.name.strip()
+        product.normalized_name = normalize_name(updated_product.name)
 
     if updated_product.description is not None:
         product.description = updated_product.description
@@ -107,115 +168,145 @@ def update_product(
     if updated_product.price is not None:
         product.price = updated_product.price
 
-        add_price_history(db, product_id, updated_product.price, reason="Preço atualizado manualmente")
+        record_price_change(db, product_id, updated_product.price, reason="Preço atualizado manualmente")
 
     if updated_product.category_id is not None:
+        _check_category(db, updated_product.category_id)
+        category_counter.move_product(db, product.category_id, updated_product.category_id)
         product.category_id = updated_product.category_id
 
     if updated_product.brand is not None:
         product.brand = updated_product.brand.strip()
 
-    db.commit()
+    if updated_product.profit_margin is not None:
+        if not 0 <= updated_product.profit_margin <= 1:
+            raise HTTPException(status_code=400, detail="O campo 'profit_margin' deve estar entre 0 e 1")
+        product.profit_margin = updated_product.profit_margin
+
+    db.flush()
+    return _loaded(db, product)
+
+
+def _check_category(db: Session, category_id: int):
+    # Com foreign_keys=ON a categoria inexistente só apareceria como IntegrityError no flush.
+    if category_id is not None and db.get(models.Category, category_id) is None:
+        raise HTTPException(status_code=404, detail="Categoria não encontrada")
+
+
+def _loaded(db: Session, product: models.Product) -> models.Product:
+    # Com a fila de escrita o produto sai da sessão do writer antes de ser serializado:
+    # a categoria (lazy) precisa estar carregada aqui.
     db.refresh(product)
+    product.category
     return product
 
 
-@router.delete("/{product_id}")
+@router.delete("/{product_id}", dependencies=[Depends(require_admin)])
 def delete_product(product_id: int, db: Session = Depends(get_db)):
+    run_write(db, remove_product, product_id)
+    invalidate(PRODUCTS, CATEGORIES, PRICE_HISTORY)
+    sales_analytics.mark_product_removed(product_id)
+
+    return {"detail": "Produto deletado com sucesso"}
+
+
+def remove_product(db: Session, product_id: int):
     product = db.query(models.Product).filter(models.Product.id == product_id).first()
     if not product:
         raise HTTPException(status_code=404, detail="Produto não encontrado")
 
-    db.query(models.Sale).filter(models.Sale.product_id == product_id).delete()
+    # Vendas, rollup e histórico de preços saem pelo ON DELETE CASCADE das FKs.
+    category_counter.adjust_product_counts(db, {product.category_id: -1})
+    sales_analytics.record_changes(db, product_id=product_id)
     db.delete(product)
-    db.commit()
-
-    remove_orphan_sales()
-
-    return {"detail": "Produto deletado com sucesso"}
 
 
-@router.post("/upload-csv")
-def upload_csv(file: UploadFile, db: Session = Depends(get_db)):
-    return csv_importer.import_products_csv(file, db)
+@router.post("/upload-csv", dependencies=[Depends(require_admin)])
+def upload_csv(
+    file: UploadFile,
+    db: Session = Depends(get_db),
+    mode: str = Query("insert", enum=csv_importer.IMPORT_MODES)
+):
+    return csv_importer.import_products_csv(file, db, mode)
 
-@router.put("/categories/{category_id}/discount")
+@router.put("/categories/{category_id}/discount", dependencies=[Depends(require_admin)])
 def update_category_discount(
     category_id: int,
     discount_percentage: float = Query(..., ge=0, le=100), 
+    stream: bool = Query(False, description="Retorna os produtos atualizados em NDJSON"),
     db: Session = Depends(get_db)
 ):
-    category = db.query(models.Category).filter(models.Category.id == category_id).first()
-    if not category:
-        raise HTTPException(status_code=404, detail="Categoria não encontrada")
-
-    category.discount_percentage = discount_percentage
+    updated_count = run_write(db, apply_category_discount, category_id, discount_percentage)
+    invalidate(PRODUCTS, CATEGORIES, PRICE_HISTORY)
 
-    update_product_prices(db, category_id)
-
-    products = db.query(models.Product).filter(models.Product.category_id == category_id).all()
-
-    db.commit()
+    if stream:
+        return ndjson_response(db, select(
+            models.Product.id.label("product_id"),
+            models.Product.name,
+            models.Product.price,
+            models.Product.category_id
+        ).where(models.Product.category_id == category_id).order_by(models.Product.id))
 
     return {
         "success": True,
         "message": "Desconto atualizado com sucesso",
         "discount_percentage": discount_percentage,
         "category_id": category_id,
-        "updated_products": [
-            {
-                "product_id": product.id,
-                "name": product.name,
-                "price": product.price,
-                "category_id": product.category_id
-            }
-            for product in products
-        ]
+        "updated_count": updated_count
     }
 
-def update_product_prices(db: Session, category_id: int):
+def apply_category_discount(db: Session, category_id: int, discount_percentage: float) -> int:
     category = db.query(models.Category).filter(models.Category.id == category_id).first()
     if not category:
-        return None
+        raise HTTPException(status_code=404, detail="Categoria não encontrada")
 
-    products = db.query(models.Product).filter(models.Product.category_id == category_id).all()
+    category.discount_percentage = discount_percentage
+    return update_product_prices(db, category_id, discount_percentage)
+
+def update_product_prices(db: Session, category_id: int, discount_percentage: float) -> int:
+    """
+    Aplica o desconto a todos os produtos da categoria com um único UPDATE e grava o
+    histórico com um único INSERT ... SELECT. Não faz commit: o chamador fecha a transação.
+    """
+    products = models.Product.__table__
+    discounted_price = products.c.price - products.c.price * (discount_percentage / 100)
+    in_category = and_(products.c.category_id == category_id, products.c.price.is_not(None))
+
+    updated = db.execute(
+        products.update()
+        .where(in_category)
+        .values(price=case((discounted_price < 0, 0.0), else_=discounted_price))
+    )
 
-    logging.info(f"Updating product prices for category_id: {category_id}")
-    logging.info(f"Category discount percentage: {category.discount_percentage}")
-    for product in products:
-        logging.info(f"Processing product_id: {product.id}, current price: {product.price}")
-        discount_amount = product.price * (category.discount_percentage / 100)
-        new_price = product.price - discount_amount
-        if new_price < 0:
-            new_price = 0 
-        logging.info(f"New price for product_id: {product.id} will be: {new_price}")
+    db.execute(
+        models.PriceHistory.__table__.insert().from_select(
+            ["product_id", "price", "date"],
+            select(products.c.id, products.c.price, literal(datetime.utcnow(), DateTime)).where(in_category)
+        )
+    )
 
-        product.price = new_price
+    return updated.rowcount
 
-        add_price_history(db, product.id, new_price)
 
-    db.commit()
+def record_price_change(db: Session, product_id: int, new_price: float, reason: str = None):
+    """Grava uma entrada no histórico de preços. Não faz commit: roda dentro da escrita do chamador."""
+    if not db.query(models.Product.id).filter(models.Product.id == product_id).first():
+        logger.error("Produto %s não existe; histórico de preço não registrado", product_id)
+        return None
 
+    price_history = models.PriceHistory(
+        product_id=product_id,
+        price=new_price,
+        reason=reason
+    )
+    db.add(price_history)
+    db.flush()
+    return price_history
 
-def add_price_history(db: Session, product_id: int, new_price: float, reason: str = None):
-    logging.info(f"Attempting to add price history: product_id={product_id}, new_price={new_price}, reason={reason}")
-    if not db.query(models.Product).filter(models.Product.id == product_id).first():
-        logging.error(f"Product with product_id={product_id} does not exist. Cannot add price history.")
-        return None
 
-    logging.info("Product exists. Proceeding to add price history.")
+def add_price_history(db: Session, product_id: int, new_price: float, reason: str = None):
     try:
-        price_history = models.PriceHistory(
-            product_id=product_id,
-            price=new_price,
-            reason=reason
-        )
-        db.add(price_history)
-        db.commit()
-        db.refresh(price_history)
-        return price_history
-    except Exception as e:
-        print("ERRO AO INSERIR PRICE HISTORY:", e) 
-        logging.error(f"Erro ao adicionar price history: {e}")
-        db.rollback()
-        return None
\ No newline at end of file
+        return run_write(db, record_price_change, product_id, new_price, reason)
+    except Exception:
+        logger.exception("Erro ao adicionar histórico de preço do produto %s", product_id)
+        return None
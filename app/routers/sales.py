@@ -1,40 +1,56 @@
-from fastapi import APIRouter, Depends, UploadFile, HTTPException, Query
+from fastapi import APIRouter, Depends, UploadFile, HTTPException, Query, Request
 from sqlalchemy.orm import Session
-from sqlalchemy import asc, desc
+from sqlalchemy import asc, desc, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List
+from datetime import datetime
 from app.models import models
 from app.schemas import schemas
-from app.database import get_db
-from app.utils.pagination import paginate
+from app.database import get_db, get_async_db
+from app.utils.pagination import paginate, paginate_cursor, COUNT_MODES
 from app.services.csv_importer import import_sales_csv
-from app.services.profit_service import calculate_total_profit
-from fastapi.responses import StreamingResponse
-import csv
-import io
-
-router = APIRouter(prefix="/sales", tags=["sales"])
-
-def generate_csv(data, headers):
-    stream = io.StringIO()
-    writer = csv.writer(stream)
-    writer.writerow(headers)
-    for item in data:
-        writer.writerow([getattr(item, h) for h in headers])
-    stream.seek(0)
-    return stream
+from app.services.profit_service import (
+    calculate_total_profit, profit_breakdown, sales_profit_statement, DETAIL_MODES, PROFIT_GROUPS
+)
+from app.services import sales_rollup, sales_analytics
+from app.services.sales_ingest import ingest_sales, COMMIT_SIZE, MAX_COMMIT_SIZE, RESULT_MODES
+from app.utils.streaming import csv_response, ndjson_response
+from app.services.auth import require_viewer, require_admin
+from app.services.write_queue import run_write
+
+router = APIRouter(prefix="/sales", tags=["sales"], dependencies=[Depends(require_viewer)])
 
 @router.get("", response_model=schemas.PaginatedResponse[schemas.SaleWithProductName])
-def get_sales(
-    db: Session = Depends(get_db),
+async def get_sales(
+    db: AsyncSession = Depends(get_async_db),
     page: int = 1,
     sort_by: str = Query("date", enum=["id", "product_id", "quantity", "total_price", "date"]),
     sort_order: str = Query("asc", enum=["asc", "desc"]),
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1),
-    product_id: int = Query(None)
+    product_id: int = Query(None),
+    pagination: str = Query("offset", enum=["offset", "cursor"]),
+    cursor: str = Query(None),
+    count: str = Query("exact", enum=COUNT_MODES)
+):
+    return await db.run_sync(
+        list_sales, page, sort_by, sort_order, skip, limit, product_id, pagination, cursor, count
+    )
+
+def list_sales(
+    db: Session,
+    page: int = 1,
+    sort_by: str = "date",
+    sort_order: str = "asc",
+    skip: int = 0,
+    limit: int = 10,
+    product_id: int = None,
+    pagination: str = "offset",
+    cursor: str = None,
+    count: str = "exact"
 ):
     if sort_order not in ["asc", "desc"]:
         raise HTTPException(status_code=400, detail="Invalid sort_order. Must be 'asc' or 'desc'.")
-    print(f"Query parameters received: sort_by={sort_by}, sort_order={sort_order}, page={page}, skip={skip}, limit={limit}, product_id={product_id}")
     query = db.query(models.Sale)
     if product_id is not None:
         query = query.filter(models.Sale.product_id == product_id)
@@ -46,8 +62,14 @@ def get_sales(
         "date": models.Sale.date
     }
     sort_column = sort_column_map.get(sort_by, models.Sale.date)
-    query = query.order_by(desc(sort_column) if sort_order == "desc" else asc(sort_column))
-    sales, total = paginate(query, skip, limit)
+    next_cursor = None
+    if pagination == "cursor" or cursor:
+        sales, total, next_cursor = paginate_cursor(
+            query, sort_by, sort_column, models.Sale.id, sort_order, cursor, limit, count
+        )
+    else:
+        query = query.order_by(desc(sort_column) if sort_order == "desc" else asc(sort_column))
+        sales, total = paginate(query, skip, limit, count)
     product_ids = [sale.product_id for sale in sales]
     products = db.query(models.Product.id, models.Product.name).filter(models.Product.id.in_(product_ids)).all()
     product_map = {pid: name for pid, name in products}
@@ -57,62 +79,156 @@ def get_sales(
     ]
     return schemas.PaginatedResponse(
         items=sales_with_name,
-        total=total
+        total=total,
+        next_cursor=next_cursor
     )
 
-@router.post("", response_model=schemas.Sale)
+@router.post("", response_model=schemas.Sale, dependencies=[Depends(require_admin)])
 def create_sale(sale: schemas.SaleCreate, db: Session = Depends(get_db)):
+    db_sale = run_write(db, insert_sale, sale)
+    sales_analytics.mark_changed([db_sale.id])
+    return db_sale
+
+def _check_product(db: Session, product_id: int):
+    # Com foreign_keys=ON um product_id inexistente viraria IntegrityError (500) no flush.
+    if db.get(models.Product, product_id) is None:
+        raise HTTPException(status_code=404, detail="Produto não encontrado")
+
+def insert_sale(db: Session, sale: schemas.SaleCreate):
+    _check_product(db, sale.product_id)
     db_sale = models.Sale(**sale.dict())
     db.add(db_sale)
-    db.commit()
-    db.refresh(db_sale)
+    sales_rollup.record_sale(db, db_sale)
+    db.flush()
     return db_sale
 
-@router.put("/{sale_id}")
+@router.post("/batch", dependencies=[Depends(require_admin)])
+async def create_sales_batch(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    commit_size: int = Query(COMMIT_SIZE, ge=1, le=MAX_COMMIT_SIZE),
+    results: str = Query("all", enum=RESULT_MODES)
+):
+    return await ingest_sales(request, db, commit_size, results)
+
+@router.put("/{sale_id}", dependencies=[Depends(require_admin)])
 def update_sale(
     sale_id: int,
     updated_sale: schemas.SaleUpdate,
     db: Session = Depends(get_db)
 ):
+    sale = run_write(db, change_sale, sale_id, updated_sale)
+    sales_analytics.mark_changed([sale_id])
+    return {"message": "Venda atualizada com sucesso", "sale": sale}
+
+def change_sale(db: Session, sale_id: int, updated_sale: schemas.SaleUpdate):
     sale = db.query(models.Sale).filter(models.Sale.id == sale_id).first()
     if not sale:
         raise HTTPException(status_code=404, detail="Venda não encontrada")
+    if updated_sale.product_id is not None:
+        _check_product(db, updated_sale.product_id)
+
+    sales_rollup.record_sale(db, sale, sign=-1)
 
     for key, value in updated_sale.dict(exclude_unset=True).items():
         setattr(sale, key, value)
 
-    db.commit()
-    db.refresh(sale)
-    return {"message": "Venda atualizada com sucesso", "sale": sale}
+    sales_rollup.record_sale(db, sale)
+    sales_analytics.record_changes(db, [sale_id])
+    db.flush()
+    return sale
 
-@router.delete("/{sale_id}")
+@router.delete("/{sale_id}", dependencies=[Depends(require_admin)])
 def delete_sale(sale_id: int, db: Session = Depends(get_db)):
+    run_write(db, remove_sale, sale_id)
+    sales_analytics.mark_changed([sale_id])
+    return {"detail": "Venda deletada com sucesso"}
+
+def remove_sale(db: Session, sale_id: int):
     sale = db.query(models.Sale).filter(models.Sale.id == sale_id).first()
     if not sale:
         raise HTTPException(status_code=404, detail="Venda não encontrada")
 
+    sales_rollup.record_sale(db, sale, sign=-1)
+    sales_analytics.record_changes(db, [sale_id])
     db.delete(sale)
-    db.commit()
-    return {"detail": "Venda deletada com sucesso"}
 
-@router.post("/upload-csv")
+@router.post("/upload-csv", dependencies=[Depends(require_admin)])
 def upload_sales_csv(file: UploadFile, db: Session = Depends(get_db)):
     return import_sales_csv(file, db)
 
 @router.get("/export")
 def export_sales_csv(db: Session = Depends(get_db)):
-    sales = db.query(models.Sale).all()
-    headers = ["id", "product_id", "quantity", "total_price", "date"]
-    return StreamingResponse(
-        generate_csv(sales, headers),
-        media_type="text/csv",
-        headers={"Content-Disposition": "attachment; filename=sales.csv"}
-    )
+    statement = select(
+        models.Sale.id, models.Sale.product_id, models.Sale.quantity, models.Sale.total_price, models.Sale.date
+    ).order_by(models.Sale.id)
+    return csv_response(db, statement, "sales.csv")
 
 @router.get("/profit/total")
 def get_total_profit(
     db: Session = Depends(get_db),
     days: int = Query(365, ge=1),
+    product_id: int = Query(None),
+    category_id: int = Query(None),
+    detail: str = Query("none", enum=DETAIL_MODES),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: str = Query(None)
+):
+    if detail == "stream":
+        statement = sales_profit_statement(days, product_id, category_id).order_by(models.Sale.id)
+        return ndjson_response(db, statement)
+    return calculate_total_profit(
+        db, days=days, product_id=product_id, category_id=category_id, detail=detail, limit=limit, cursor=cursor
+    )
+
+@router.get("/profit/breakdown", response_model=List[schemas.ProfitBreakdown])
+def get_profit_breakdown(
+    db: Session = Depends(get_db),
+    group_by: str = Query("product", enum=PROFIT_GROUPS),
+    days: int = Query(365, ge=1),
+    product_id: int = Query(None),
+    category_id: int = Query(None)
+):
+    return profit_breakdown(db, group_by, days, product_id, category_id)
+
+@router.get("/analytics/summary", response_model=schemas.SalesAnalyticsSummary)
+def get_sales_analytics_summary(
+    db: Session = Depends(get_db),
+    start: datetime = Query(None),
+    end: datetime = Query(None),
     product_id: int = Query(None)
 ):
-    return calculate_total_profit(db, days=days, product_id=product_id)
+    sales_analytics.snapshot.refresh(db)
+    return sales_analytics.snapshot.summary(start, end, product_id)
+
+@router.get("/analytics/revenue", response_model=List[schemas.SalesAnalyticsGroup])
+def get_sales_analytics_revenue(
+    db: Session = Depends(get_db),
+    group_by: str = Query("day", enum=sales_analytics.GROUPS),
+    start: datetime = Query(None),
+    end: datetime = Query(None),
+    product_id: int = Query(None)
+):
+    sales_analytics.snapshot.refresh(db)
+    return sales_analytics.snapshot.group_by(group_by, start, end, product_id)
+
+@router.get("/analytics/top-products", response_model=List[schemas.SalesAnalyticsTopProduct])
+def get_sales_analytics_top_products(
+    db: Session = Depends(get_db),
+    metric: str = Query("revenue", enum=sales_analytics.TOP_METRICS),
+    limit: int = Query(10, ge=1, le=1000),
+    start: datetime = Query(None),
+    end: datetime = Query(None)
+):
+    sales_analytics.snapshot.refresh(db)
+    top = sales_analytics.snapshot.top_products(limit, metric, start, end)
+    names = dict(
+        db.query(models.Product.id, models.Product.name)
+        .filter(models.Product.id.in_([row["product_id"] for row in top]))
+        .all()
+    )
+    return [{**row, "name": names.get(row["product_id"])} for row in top]
+
+@router.get("/analytics/status", response_model=schemas.SalesSnapshotStatus)
+def get_sales_analytics_status():
+    return sales_analytics.snapshot.status()
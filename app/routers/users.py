@@ -1,3 +1,4 @@
+import logging
 from typing import Optional, List
 from fastapi import APIRouter, Depends, HTTPException, Query, status, Cookie, Response, UploadFile, Request
 from fastapi.responses import JSONResponse
@@ -7,15 +8,18 @@ from app.database import get_db
 from app.models import models
 from app.schemas import schemas
 from app.services import security
-from app.utils.pagination import paginate
+from app.utils.pagination import paginate, paginate_cursor, COUNT_MODES
 from app.schemas.schemas import PaginatedResponse
-from app.services.email_service import send_email
+from app.services.email_service import enqueue_email
+from app.services.auth import require_viewer, require_admin
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/users", tags=["users"])
 
 # Criar um novo usuário
-@router.post("", response_model=schemas.User)
+@router.post("", response_model=schemas.User, dependencies=[Depends(require_admin)])
 def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
     normalized_email = user.email.strip().lower()
 
@@ -45,14 +49,17 @@ def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
     )
 
 # Recuperar usuários
-@router.get("", response_model=PaginatedResponse[schemas.User])
+@router.get("", response_model=PaginatedResponse[schemas.User], dependencies=[Depends(require_admin)])
 def get_users(
     db: Session = Depends(get_db),
     sort: str = Query("asc", enum=["asc", "desc"]),
     sort_by: str = Query("username", enum=["username", "email", "role", "created_at"]),
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1),
-    role: Optional[models.RoleEnum] = Query(None, description="Filtrar por role")
+    role: Optional[models.RoleEnum] = Query(None, description="Filtrar por role"),
+    pagination: str = Query("offset", enum=["offset", "cursor"]),
+    cursor: Optional[str] = Query(None),
+    count: str = Query("exact", enum=COUNT_MODES)
 ):
     query = db.query(models.User)
 
@@ -68,18 +75,23 @@ def get_users(
 
     sort_column = sort_column_map.get(sort_by, models.User.username)
 
-    query = query.order_by(desc(sort_column) if sort == "desc" else asc(sort_column))
-
-    users, total = paginate(query, skip, limit)
+    next_cursor = None
+    if pagination == "cursor" or cursor:
+        users, total, next_cursor = paginate_cursor(
+            query, sort_by, sort_column, models.User.id, sort, cursor, limit, count
+        )
+    else:
+        query = query.order_by(desc(sort_column) if sort == "desc" else asc(sort_column))
+        users, total = paginate(query, skip, limit, count)
 
     for user in users:
         user.hashed_password = user.password  
         delattr(user, 'password') 
 
-    return PaginatedResponse(items=users, total=total)
+    return PaginatedResponse(items=users, total=total, next_cursor=next_cursor)
 
 # Atualizar um usuário
-@router.put("/{user_id}")
+@router.put("/{user_id}", dependencies=[Depends(require_admin)])
 def update_user(user_id: int, updated_user: schemas.UserUpdate, db: Session = Depends(get_db)):
     db_user = db.query(models.User).filter(models.User.id == user_id).first()
 
@@ -93,19 +105,22 @@ def update_user(user_id: int, updated_user: schemas.UserUpdate, db: Session = De
     if updated_user.password:
         updated_user.password = security.hash_password(updated_user.password)
 
-    for key, value in updated_user.dict(exclude_unset=True).items():
+    changes = updated_user.dict(exclude_unset=True)
+    for key, value in changes.items():
         setattr(db_user, key, value)
 
     db.commit()
+
+    # Troca de senha ou de role invalida as sessões já emitidas para o usuário.
+    if "password" in changes or "role" in changes:
+        security.revoke_user_tokens(user_id)
     
     db.refresh(db_user)
-    
-    print(f"Usuário {user_id} atualizado: {db_user}")
 
     return db_user
 
 # Deletar um usuário
-@router.delete("/{user_id}")
+@router.delete("/{user_id}", dependencies=[Depends(require_admin)])
 def delete_user(user_id: int, db: Session = Depends(get_db)):
     user = db.query(models.User).filter(models.User.id == user_id).first()
     if not user:
@@ -113,6 +128,7 @@ def delete_user(user_id: int, db: Session = Depends(get_db)):
 
     db.delete(user)
     db.commit()
+    security.revoke_user_tokens(user_id)
     response = JSONResponse(content={"message": "Usuário deletado com sucesso", "uid": user_id})
     return response
 
@@ -133,7 +149,7 @@ def login(user: schemas.LoginRequest, request: Request, db: Session = Depends(ge
     if not security.pwd_context.identify(db_user.password):
         db_user.password = security.hash_password(db_user.password)
         db.commit()
-        print("Senha foi re-hashada.")
+        logger.info("Senha do usuário %s re-hasheada", db_user.id)
 
     if not security.verify_password(user.password, db_user.password):
         raise HTTPException(status_code=401, detail="Credenciais inválidas")
@@ -145,15 +161,12 @@ def login(user: schemas.LoginRequest, request: Request, db: Session = Depends(ge
     client_ip = request.client.host
     login_time = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
 
-    # Enviar email de notificação
-    try:
-        send_email(
-            to_email=db_user.email,
-            subject="Login bem-sucedido",
-            body=f"Olá {db_user.username},\n\nVocê logou às {login_time} com o IP {client_ip}.\n\nSe não foi você, por favor, entre em contato com o suporte."
-        )
-    except Exception as e:
-        print(f"Erro ao enviar email: {e}")
+    # Enfileirar email de notificação (enviado em background, fora do request)
+    enqueue_email(
+        to_email=db_user.email,
+        subject="Login bem-sucedido",
+        body=f"Olá {db_user.username},\n\nVocê logou às {login_time} com o IP {client_ip}.\n\nSe não foi você, por favor, entre em contato com o suporte."
+    )
 
     response = JSONResponse(content={
         "message": response_message,
@@ -175,17 +188,19 @@ def logout(response: Response, session_token: Optional[str] = Cookie(None)):
     except HTTPException:
         raise HTTPException(status_code=401, detail="Sessão inválida")
 
+    security.revoke_session_token(session_token)
+
     response.delete_cookie("session_token", path="/")
     return {"message": "Logout bem-sucedido"}
 
-@router.get("/roles", response_model=List[str])
+@router.get("/roles", response_model=List[str], dependencies=[Depends(require_viewer)])
 def get_roles():
     """
     Retorna a lista de roles disponíveis no sistema.
     """
     return [role.value for role in models.RoleEnum]
 
-@router.post("/upload-csv")
+@router.post("/upload-csv", dependencies=[Depends(require_admin)])
 def upload_users_csv(file: UploadFile, db: Session = Depends(get_db)):
     from app.services.csv_importer import import_users_csv
     return import_users_csv(file, db)
\ No newline at end of file
@@ -16,7 +16,8 @@ class RoleEnum(str, Enum):
 
 class PaginatedResponse(BaseModel, Generic[T]):
     items: List[T]
-    total: int
+    total: Optional[int] = None
+    next_cursor: Optional[str] = None
 
 # Categories
 
@@ -24,6 +25,7 @@ class CategoryBase(BaseModel):
     name: str
     description: Optional[str] = None
     discount_percentage: Optional[float] = None 
+    profit_margin: Optional[float] = None
 
     class Config:
         from_attributes = True
@@ -32,6 +34,7 @@ class CategoryCreate(CategoryBase):
     name: str 
     description: Optional[str] = None
     discount_percentage: Optional[float] = None
+    profit_margin: Optional[float] = None
 
     @model_validator(mode='before')
     def check_name_or_description(cls, values):
@@ -47,6 +50,7 @@ class Category(BaseModel):
     name: str
     description: Optional[str] = None
     discount_percentage: Optional[float] = None
+    profit_margin: Optional[float] = None
     total_products: Optional[int] = None
 
     class Config:
@@ -56,6 +60,7 @@ class CategoryUpdate(BaseModel):
     name: Optional[str] = None
     description: Optional[str] = None
     discount_percentage: Optional[float] = None
+    profit_margin: Optional[float] = None
 
     class Config:
         from_attributes = True
@@ -74,6 +79,7 @@ class ProductBase(BaseModel):
     price: Optional[float] = None  
     category_id: Optional[int] = None  
     brand: Optional[str] = None  
+    profit_margin: Optional[float] = None
 
     class Config:
         from_attributes = True
@@ -97,6 +103,7 @@ class Product(BaseModel):
     price: Optional[float] = None
     category_id: Optional[int] = None
     brand: Optional[str] = None
+    profit_margin: Optional[float] = None
     category: Optional[CategoryName] = None 
 
     class Config:
@@ -108,6 +115,7 @@ class ProductUpdate(BaseModel):
     price: Optional[float] = None
     category_id: Optional[int] = None
     brand: Optional[str] = None
+    profit_margin: Optional[float] = None
 
     class Config:
         from_attributes = True
@@ -196,3 +204,54 @@ class PriceHistoryBase(BaseModel):
 
 class PriceHistory(PriceHistoryBase):
     id: int
+
+class PriceHistoryBucket(BaseModel):
+    bucket: datetime
+    min_price: float
+    max_price: float
+    last_price: float
+    count: int
+
+class PriceAsOf(BaseModel):
+    product_id: int
+    price: Optional[float] = None
+    date: datetime
+
+class ProfitBreakdown(BaseModel):
+    key: str
+    name: Optional[str] = None
+    sale_count: int
+    quantity: int
+    revenue: float
+    profit: float
+
+class SalesAnalyticsGroup(BaseModel):
+    key: str
+    sale_count: int
+    quantity: int
+    revenue: float
+
+class SalesAnalyticsTopProduct(SalesAnalyticsGroup):
+    product_id: int
+    name: Optional[str] = None
+
+class SalesAnalyticsSummary(BaseModel):
+    sale_count: int
+    quantity: int
+    revenue: float
+    average_ticket: float
+    product_count: int
+    first_sale: Optional[datetime] = None
+    last_sale: Optional[datetime] = None
+
+class SalesSnapshotStatus(BaseModel):
+    loaded: bool
+    rows: int
+    live_rows: int
+    last_sale_id: int
+    memory_bytes: int
+    load_seconds: Optional[float] = None
+    refreshed_at: Optional[datetime] = None
+    refresh_lag_seconds: Optional[float] = None
+    pending_changes: int
+    refresh_interval_seconds: float
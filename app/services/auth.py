@@ -0,0 +1,66 @@
+import os
+from typing import Optional
+
+from fastapi import Depends, HTTPException, Request
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from starlette.requests import HTTPConnection
+
+from app.models.models import RoleEnum
+from app.services import security
+
+AUTH_ENABLED = os.getenv("AUTH_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Claims usados quando a autenticação está desligada (ex.: desenvolvimento local).
+_ANONYMOUS_CLAIMS = {"user_id": None, "username": None, "role": RoleEnum.admin.value}
+
+bearer_scheme = HTTPBearer(auto_error=False)
+
+
+def token_from(connection: HTTPConnection) -> Optional[str]:
+    """Token do cabeçalho `Authorization: Bearer` ou, sem ele, do cookie `session_token`."""
+    scheme, _, credentials = connection.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and credentials.strip():
+        return credentials.strip()
+    return connection.cookies.get("session_token")
+
+
+def get_current_claims(
+    request: Request,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme)
+) -> dict:
+    # `credentials` só registra o esquema Bearer no OpenAPI; o token vem de token_from.
+    if not AUTH_ENABLED:
+        return _ANONYMOUS_CLAIMS
+    token = token_from(request)
+    if not token:
+        raise HTTPException(status_code=401, detail="Não autenticado", headers={"WWW-Authenticate": "Bearer"})
+    return security.verify_session_token(token)
+
+
+def require_role(*roles: RoleEnum):
+    allowed = {role.value for role in roles}
+
+    def dependency(claims: dict = Depends(get_current_claims)) -> dict:
+        if claims.get("role") not in allowed:
+            raise HTTPException(status_code=403, detail="Permissão insuficiente")
+        return claims
+
+    return dependency
+
+
+require_viewer = require_role(RoleEnum.admin, RoleEnum.viewer)
+require_admin = require_role(RoleEnum.admin)
+
+
+def has_viewer_access(scope) -> bool:
+    """Mesma checagem de `require_viewer`, para middlewares que respondem antes do roteador."""
+    if not AUTH_ENABLED:
+        return True
+    token = token_from(HTTPConnection(scope))
+    if not token:
+        return False
+    try:
+        claims = security.verify_session_token(token)
+    except HTTPException:
+        return False
+    return claims.get("role") in (RoleEnum.admin.value, RoleEnum.viewer.value)
@@ -0,0 +1,64 @@
+import logging
+
+from sqlalchemy import bindparam, inspect, select, text
+from sqlalchemy.orm import Session
+
+from app.models import models
+from app.utils.names import normalize_name
+
+logger = logging.getLogger(__name__)
+
+NAMED_MODELS = (models.Category, models.Product)
+
+
+def name_taken(db: Session, model, name: str, exclude_id: int = None) -> bool:
+    """Checa se já existe `model` com o mesmo nome normalizado (busca pelo índice único)."""
+    query = db.query(model.id).filter(model.normalized_name == normalize_name(name))
+    if exclude_id is not None:
+        query = query.filter(model.id != exclude_id)
+    return query.first() is not None
+
+
+def backfill_normalized_names(connection, table):
+    """
+    Preenche `normalized_name` a partir de `name`. Em bancos antigos podem existir
+    nomes que só diferem em maiúsculas/espaços: o de menor id fica com a chave e os
+    demais ficam com NULL (o índice único aceita vários NULLs) e são listados no log.
+    """
+    seen = set()
+    updates = []
+    duplicates = []
+    for row_id, name in connection.execute(select(table.c.id, table.c.name).order_by(table.c.id)):
+        normalized = normalize_name(name)
+        if normalized is not None and normalized in seen:
+            duplicates.append(row_id)
+            normalized = None
+        seen.add(normalized)
+        updates.append({"row_id": row_id, "normalized": normalized})
+
+    if updates:
+        connection.execute(
+            table.update().where(table.c.id == bindparam("row_id")).values(normalized_name=bindparam("normalized")),
+            updates,
+        )
+    if duplicates:
+        logger.warning(
+            "%s registros em '%s' com nome duplicado ficaram sem normalized_name: ids %s",
+            len(duplicates), table.name, duplicates[:50]
+        )
+
+
+def ensure_normalized_name_columns(engine):
+    """
+    Adiciona e preenche `normalized_name` em bancos criados antes da coluna existir.
+    Precisa rodar antes de `ensure_indexes`, que cria o índice único.
+    """
+    inspector = inspect(engine)
+    for model in NAMED_MODELS:
+        table = model.__table__
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        if "normalized_name" in columns:
+            continue
+        with engine.begin() as connection:
+            connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN normalized_name VARCHAR"))
+            backfill_normalized_names(connection, table)
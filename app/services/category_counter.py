@@ -0,0 +1,66 @@
+from sqlalchemy import bindparam, func, inspect, select, text
+from sqlalchemy.orm import Session
+
+from app.models import models
+
+categories_table = models.Category.__table__
+products_table = models.Product.__table__
+
+
+def adjust_product_counts(db: Session, deltas: dict):
+    """
+    Soma `deltas` (category_id -> variação) em `categories.product_count`.
+    Não faz commit: roda na mesma transação da escrita em `products`.
+    """
+    params = [
+        {"category_id": category_id, "delta": delta}
+        for category_id, delta in deltas.items()
+        if category_id is not None and delta
+    ]
+    if not params:
+        return
+    db.execute(
+        categories_table.update()
+        .where(categories_table.c.id == bindparam("category_id"))
+        .values(product_count=categories_table.c.product_count + bindparam("delta")),
+        params,
+    )
+
+
+def move_product(db: Session, old_category_id, new_category_id):
+    if old_category_id == new_category_id:
+        return
+    adjust_product_counts(db, {old_category_id: -1, new_category_id: 1})
+
+
+def rebuild_product_counts(db: Session):
+    counted = (
+        select(func.count(products_table.c.id))
+        .where(products_table.c.category_id == categories_table.c.id)
+        .scalar_subquery()
+    )
+    db.execute(categories_table.update().values(product_count=counted))
+    db.commit()
+
+
+def ensure_product_count_column(engine):
+    """Adiciona `categories.product_count` em bancos criados antes da coluna existir."""
+    columns = {column["name"] for column in inspect(engine).get_columns("categories")}
+    if "product_count" in columns:
+        return
+    with engine.begin() as connection:
+        connection.execute(text("ALTER TABLE categories ADD COLUMN product_count INTEGER NOT NULL DEFAULT 0"))
+    with Session(engine) as db:
+        rebuild_product_counts(db)
+
+
+if __name__ == "__main__":
+    from app.database import SessionLocal, create_tables
+
+    create_tables()
+    session = SessionLocal()
+    try:
+        rebuild_product_counts(session)
+        print("Contagem de produtos por categoria recalculada.")
+    finally:
+        session.close()
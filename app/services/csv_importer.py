@@ -1,59 +1,338 @@
+import os
+import time
+from datetime import datetime
+
 import pandas as pd
+from sqlalchemy import bindparam, insert, select
+
 from app.models import models
-from app.services.security import hash_password
-from datetime import datetime
+from app.services.security import hash_passwords
+from app.services.sales_rollup import apply_deltas
+from app.services.category_counter import adjust_product_counts
+from app.services.response_cache import invalidate, PRODUCTS, CATEGORIES, PRICE_HISTORY
+from app.services.write_queue import run_write
+from app.utils.names import normalize_name
+
+CHUNK_SIZE = int(os.getenv("CSV_IMPORT_CHUNK_SIZE", 10000))
+MAX_REJECTED_ROWS_REPORTED = 100
+# insert: nomes já existentes (ou repetidos no arquivo) são rejeitados;
+# upsert: atualiza o registro com o mesmo nome normalizado, então reimportar é idempotente.
+IMPORT_MODES = ("insert", "upsert")
+
+
+def _text(series: pd.Series) -> pd.Series:
+    return series.astype("string").str.strip()
+
+
+def _optional_text(df: pd.DataFrame, column: str) -> pd.Series:
+    if column not in df.columns:
+        return pd.Series(pd.NA, index=df.index, dtype="string")
+    values = _text(df[column])
+    return values.mask(values == "")
+
+
+def _numeric(df: pd.DataFrame, column: str) -> pd.Series:
+    return pd.to_numeric(df[column], errors="coerce")
+
+
+def _integer(df: pd.DataFrame, column: str) -> pd.Series:
+    if column not in df.columns:
+        return pd.Series(pd.NA, index=df.index, dtype="Int64")
+    values = _numeric(df, column)
+    return values.where(values % 1 == 0).astype("Int64")
+
+
+def _invalid_numeric(df: pd.DataFrame, column: str, values: pd.Series) -> pd.Series:
+    # Valor presente no CSV mas que não pôde ser convertido.
+    return df[column].notna() & values.isna()
+
+
+def _records(frame: pd.DataFrame) -> list:
+    columns = [
+        frame[column].astype(object).where(frame[column].notna(), None).tolist()
+        for column in frame.columns
+    ]
+    return [dict(zip(frame.columns, values)) for values in zip(*columns)]
+
+
+def _missing_references(db, frame: pd.DataFrame, references: dict) -> pd.Series:
+    """
+    Linhas cujas FKs (`{coluna: tabela alvo}`) apontam para ids que não existem.
+    Com foreign_keys=ON elas derrubariam o INSERT do bloco inteiro; assim viram
+    linhas rejeitadas como as demais.
+    """
+    missing = pd.Series(False, index=frame.index)
+    for column, target in references.items():
+        ids = [int(value) for value in frame[column].dropna().unique()]
+        found = set(db.execute(select(target.c.id).where(target.c.id.in_(ids))).scalars()) if ids else set()
+        missing |= frame[column].notna() & ~frame[column].isin(list(found))
+    return missing
+
+
+def _insert_rows(table, after_insert=None, references=None):
+    def write(db, frame: pd.DataFrame, chunk: pd.DataFrame) -> dict:
+        missing = _missing_references(db, frame, references or {})
+        frame = frame[~missing]
+        if len(frame):
+            db.execute(insert(table), _records(frame))
+            if after_insert:
+                after_insert(db, frame)
+        return {"inserted": len(frame), "updated": 0, "duplicates": 0, "rejected": missing.index[missing]}
+    return write
+
+
+def _write_by_name(table, mode: str, columns=(), after_insert=None, after_update=None, references=None):
+    """
+    Grava por nome normalizado. Os registros já existentes são buscados pelo índice
+    único de `normalized_name`; as linhas novas vão num INSERT em lote e as demais
+    são rejeitadas (insert) ou atualizadas num UPDATE em lote (upsert), só nas
+    colunas presentes no CSV. `columns` são colunas extras lidas dos existentes.
+    Linhas com FK inexistente (`references`) são rejeitadas antes.
+    """
+    def write(db, frame: pd.DataFrame, chunk: pd.DataFrame) -> dict:
+        missing = _missing_references(db, frame, references or {})
+        invalid = missing.index[missing]
+        frame = frame[~missing]
+        keys = frame["name"].map(normalize_name)
+        # Nome repetido no próprio arquivo: no upsert vale a última ocorrência, no insert a primeira.
+        keep = ~keys.duplicated(keep="last" if mode == "upsert" else "first")
+        repeated = frame.index[~keep]
+        frame = frame[keep].assign(normalized_name=keys[keep])
+
+        existing = {
+            row.normalized_name: row
+            for row in db.execute(
+                select(table.c.id, table.c.normalized_name, *(table.c[column] for column in columns))
+                .where(table.c.normalized_name.in_(frame["normalized_name"].tolist()))
+            )
+        }
+        found = frame["normalized_name"].isin(list(existing))
+
+        new = frame[~found]
+        if len(new):
+            db.execute(insert(table), _records(new))
+            if after_insert:
+                after_insert(db, new)
+
+        if mode == "insert":
+            return {"inserted": len(new), "updated": 0, "duplicates": 0, "rejected": invalid.union(repeated).union(frame.index[found])}
+
+        old = frame[found]
+        if len(old):
+            updated_columns = [column for column in old.columns if column in chunk.columns]
+            db.execute(
+                table.update()
+                .where(table.c.normalized_name == bindparam("key"))
+                .values({column: bindparam(f"new_{column}") for column in updated_columns}),
+                [
+                    {"key": record["normalized_name"], **{f"new_{column}": record[column] for column in updated_columns}}
+                    for record in _records(old)
+                ],
+            )
+            if after_update:
+                after_update(db, old, existing, updated_columns)
+        # As ocorrências anteriores de um nome repetido são absorvidas pela última e contadas à parte.
+        return {"inserted": len(new), "updated": len(old), "duplicates": len(repeated), "rejected": invalid}
+    return write
+
 
-def import_products_csv(file, db):
-    df = pd.read_csv(file.file)
-    for _, row in df.iterrows():
-        product = models.Product(
-            name=row["name"],
-            description=row.get("description"),  
-            price=row["price"],
-            category_id=row["category_id"],
-            brand=row.get("brand") 
+def _import_chunks(file, db, table, prepare, after_insert=None, invalidates=(), chunk_size: int = None, write=None):
+    """
+    Lê o CSV em blocos de tamanho fixo, valida cada bloco por coluna com `prepare`
+    e grava as linhas válidas com um único INSERT em lote (executemany) por bloco,
+    cada bloco na sua própria transação (via `run_write`, que usa a fila de escrita
+    quando ligada). A memória depende do tamanho do bloco, não do arquivo. `write`
+    substitui o INSERT (ex.: upsert por nome) e pode rejeitar linhas que só se
+    mostram inválidas diante do banco.
+    """
+    write = write or _insert_rows(table, after_insert)
+    report = {"imported": 0, "updated": 0, "duplicates": 0, "rejected": 0, "rejected_rows": [], "chunks": []}
+    started = time.perf_counter()
+
+    reader = pd.read_csv(file.file, chunksize=chunk_size or CHUNK_SIZE)
+    for index, chunk in enumerate(reader):
+        chunk_started = time.perf_counter()
+
+        frame, rejected_mask = prepare(chunk)
+        valid = frame[~rejected_mask]
+
+        written = {"inserted": 0, "updated": 0, "duplicates": 0, "rejected": valid.index[:0]}
+        if len(valid):
+            written = run_write(db, write, valid, chunk)
+            rejected_mask = rejected_mask | chunk.index.isin(written["rejected"])
+            invalidate(*invalidates)
+
+        elapsed = time.perf_counter() - chunk_started
+        rejected = int(rejected_mask.sum())
+        report["imported"] += written["inserted"]
+        report["updated"] += written["updated"]
+        report["duplicates"] += written["duplicates"]
+        report["rejected"] += rejected
+        free_slots = MAX_REJECTED_ROWS_REPORTED - len(report["rejected_rows"])
+        if rejected and free_slots > 0:
+            # +2: cabeçalho e numeração a partir de 1, para bater com a linha do arquivo.
+            report["rejected_rows"].extend(int(i) + 2 for i in chunk.index[rejected_mask][:free_slots])
+        report["chunks"].append({
+            "chunk": index,
+            "rows": len(chunk),
+            "imported": written["inserted"],
+            "updated": written["updated"],
+            "duplicates": written["duplicates"],
+            "rejected": rejected,
+            "seconds": round(elapsed, 4),
+            "rows_per_second": round(len(chunk) / elapsed, 1) if elapsed else None,
+        })
+
+    elapsed = time.perf_counter() - started
+    report["seconds"] = round(elapsed, 4)
+    rows = report["imported"] + report["updated"] + report["duplicates"] + report["rejected"]
+    report["rows_per_second"] = round(rows / elapsed, 1) if elapsed else None
+    return report
+
+
+def _prepare_products(chunk: pd.DataFrame):
+    price = _numeric(chunk, "price")
+    frame = pd.DataFrame({
+        "name": _optional_text(chunk, "name"),
+        "description": _optional_text(chunk, "description"),
+        "price": price,
+        "category_id": _integer(chunk, "category_id"),
+        "brand": _optional_text(chunk, "brand"),
+    })
+    rejected = frame["name"].isna() | price.isna()
+    if "category_id" in chunk.columns:
+        rejected |= _invalid_numeric(chunk, "category_id", frame["category_id"])
+    return frame, rejected
+
+
+def _count_products_chunk(db, frame: pd.DataFrame):
+    counts = frame["category_id"].dropna().value_counts()
+    adjust_product_counts(db, {int(category_id): int(count) for category_id, count in counts.items()})
+
+
+def _update_products_chunk(db, frame: pd.DataFrame, existing: dict, updated_columns: list):
+    deltas = {}
+    history = []
+    now = datetime.utcnow()
+    for record in _records(frame):
+        current = existing[record["normalized_name"]]
+        if "category_id" in updated_columns and record["category_id"] != current.category_id:
+            deltas[current.category_id] = deltas.get(current.category_id, 0) - 1
+            deltas[record["category_id"]] = deltas.get(record["category_id"], 0) + 1
+        if "price" in updated_columns and record["price"] != current.price:
+            history.append({"product_id": current.id, "price": record["price"], "date": now, "reason": "Importação CSV"})
+    adjust_product_counts(db, deltas)
+    if history:
+        db.execute(insert(models.PriceHistory.__table__), history)
+
+
+def import_products_csv(file, db, mode: str = "insert"):
+    report = _import_chunks(
+        file, db, models.Product.__table__, _prepare_products, invalidates=(PRODUCTS, CATEGORIES, PRICE_HISTORY),
+        write=_write_by_name(
+            models.Product.__table__, mode, columns=("category_id", "price"),
+            after_insert=_count_products_chunk, after_update=_update_products_chunk,
+            references={"category_id": models.Category.__table__}
         )
-        db.add(product)
-    db.commit()
-    return {"message": "Produtos importados com sucesso."}
+    )
+    return {"message": "Produtos importados com sucesso.", **report}
+
+
+def _prepare_users(chunk: pd.DataFrame):
+    username = _optional_text(chunk, "username")
+    password = _optional_text(chunk, "password").fillna(username)
+    frame = pd.DataFrame({
+        "email": _optional_text(chunk, "email").str.lower(),
+        "username": username,
+        "password": password,
+        "role": _optional_text(chunk, "role"),
+    })
+    rejected = (
+        frame["email"].isna()
+        | frame["username"].isna()
+        | ~frame["role"].isin([role.value for role in models.RoleEnum])
+    )
+    # E-mail ou username repetido no próprio bloco: vale a primeira ocorrência. Sai
+    # antes do bcrypt para não gastar hash com linha que seria rejeitada.
+    valid = frame[~rejected]
+    rejected |= frame.index.isin(valid.index[valid["email"].duplicated() | valid["username"].duplicated()])
+    frame.loc[~rejected, "password"] = hash_passwords(frame.loc[~rejected, "password"].tolist())
+    return frame, rejected
+
+
+def _write_users(db, frame: pd.DataFrame, chunk: pd.DataFrame) -> dict:
+    """
+    Rejeita os usuários cujo e-mail ou username já existe no banco (inclusive os
+    gravados por blocos anteriores do mesmo arquivo) e insere os demais em lote.
+    """
+    table = models.User.__table__
+    emails = frame["email"].tolist()
+    usernames = frame["username"].tolist()
+    taken_emails = set(db.execute(select(table.c.email).where(table.c.email.in_(emails))).scalars())
+    taken_usernames = set(db.execute(select(table.c.username).where(table.c.username.in_(usernames))).scalars())
+    taken = frame["email"].isin(list(taken_emails)) | frame["username"].isin(list(taken_usernames))
+
+    new = frame[~taken]
+    if len(new):
+        db.execute(insert(table), _records(new))
+    return {"inserted": len(new), "updated": 0, "duplicates": 0, "rejected": frame.index[taken]}
+
 
 def import_users_csv(file, db):
-    df = pd.read_csv(file.file)
-    for _, row in df.iterrows():
-        user = models.User(
-            email=row["email"].strip().lower(),
-            username=row["username"].strip(),
-            password=hash_password(row["password"].strip()) if "password" in row and pd.notna(row["password"]) else hash_password(row["username"].strip()),  
-            role=row["role"].strip()
-        )
-        db.add(user)
-    db.commit()
-    return {"message": "Usuários importados com sucesso."}
-
-def import_categories_csv(file, db):
-    df = pd.read_csv(file.file)
-    for _, row in df.iterrows():
-        category = models.Category(
-            name=row["name"].strip(),
-            description=row.get("description", "").strip() if pd.notna(row.get("description")) else None
+    report = _import_chunks(file, db, models.User.__table__, _prepare_users, write=_write_users)
+    return {"message": "Usuários importados com sucesso.", **report}
+
+
+def _prepare_categories(chunk: pd.DataFrame):
+    frame = pd.DataFrame({
+        "name": _optional_text(chunk, "name"),
+        "description": _optional_text(chunk, "description"),
+    })
+    return frame, frame["name"].isna()
+
+
+def import_categories_csv(file, db, mode: str = "insert"):
+    report = _import_chunks(
+        # PRODUCTS também: o upsert pode renomear categorias, e o nome delas aparece nas listagens de produtos.
+        file, db, models.Category.__table__, _prepare_categories, invalidates=(CATEGORIES, PRODUCTS),
+        write=_write_by_name(models.Category.__table__, mode)
+    )
+    return {"message": "Categorias importadas com sucesso.", **report}
+
+
+def _prepare_sales(chunk: pd.DataFrame):
+    frame = pd.DataFrame({
+        "product_id": _integer(chunk, "product_id"),
+        "quantity": _integer(chunk, "quantity"),
+        "total_price": _numeric(chunk, "total_price"),
+        "date": pd.to_datetime(chunk["date"], format="%Y-%m-%d %H:%M:%S", errors="coerce"),
+    })
+    return frame, frame.isna().any(axis=1)
+
+
+def _rollup_sales_chunk(db, frame: pd.DataFrame):
+    grouped = frame.assign(day=frame["date"].dt.date).groupby(["product_id", "day"]).agg(
+        sale_count=("quantity", "size"),
+        quantity=("quantity", "sum"),
+        revenue=("total_price", "sum"),
+    )
+    apply_deltas(db, {
+        (int(product_id), day): [int(count), int(quantity), float(revenue)]
+        for (product_id, day), count, quantity, revenue in zip(
+            grouped.index, grouped["sale_count"], grouped["quantity"], grouped["revenue"]
         )
-        db.add(category)
-    db.commit()
-    return {"message": "Categorias importadas com sucesso."}
+    })
+
 
 def import_sales_csv(file, db):
     try:
-        df = pd.read_csv(file.file)
-        for _, row in df.iterrows():
-            sale = models.Sale(
-                product_id=row["product_id"],
-                quantity=row["quantity"],
-                total_price=row["total_price"],
-                date=datetime.strptime(str(row["date"]), "%Y-%m-%d %H:%M:%S")
+        report = _import_chunks(
+            file, db, models.Sale.__table__, _prepare_sales,
+            write=_insert_rows(
+                models.Sale.__table__, _rollup_sales_chunk, references={"product_id": models.Product.__table__}
             )
-            db.add(sale)
-        db.commit()
-        return {"message": "Vendas importadas com sucesso."}
+        )
+        return {"message": "Vendas importadas com sucesso.", **report}
     except Exception as e:
         db.rollback()
-        return {"error": str(e)}
\ No newline at end of file
+        return {"error": str(e)}
@@ -1,30 +1,165 @@
+import logging
+import os
+import queue
 import smtplib
+import threading
+import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-import os
 
-def send_email(to_email: str, subject: str, body: str):
-    smtp_server = os.getenv("SMTP_SERVER", "smtp.gmail.com")
-    smtp_port = int(os.getenv("SMTP_PORT", 587))
-    smtp_user = os.getenv("SMTP_USER")
-    smtp_password = os.getenv("SMTP_PASSWORD")
-
-    if not smtp_user or not smtp_password:
-        raise ValueError("SMTP credentials are not set in environment variables")
+def _smtp_settings():
+    return {
+        "server": os.getenv("SMTP_SERVER", "smtp.gmail.com"),
+        "port": int(os.getenv("SMTP_PORT", 587)),
+        "user": os.getenv("SMTP_USER"),
+        "password": os.getenv("SMTP_PASSWORD"),
+        "sender": os.getenv("SMTP_FROM") or os.getenv("SMTP_USER"),
+        # Desligar TLS/autenticação permite testar contra um servidor SMTP local de debug.
+        "starttls": os.getenv("SMTP_STARTTLS", "true").lower() in ("1", "true", "yes"),
+        "auth": os.getenv("SMTP_AUTH", "true").lower() in ("1", "true", "yes"),
+        "timeout": float(os.getenv("SMTP_TIMEOUT", 10)),
+    }
 
+def _build_message(sender: str, to_email: str, subject: str, body: str) -> str:
     msg = MIMEMultipart()
-    msg["From"] = smtp_user
+    msg["From"] = sender
     msg["To"] = to_email
     msg["Subject"] = subject
 
     msg.attach(MIMEText(body, "plain"))
+    return msg.as_string()
+
+def _connect(settings: dict) -> smtplib.SMTP:
+    if settings["auth"] and (not settings["user"] or not settings["password"]):
+        raise ValueError("SMTP credentials are not set in environment variables")
 
+    server = smtplib.SMTP(settings["server"], settings["port"], timeout=settings["timeout"])
     try:
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
+        if settings["starttls"]:
             server.starttls()
-            server.login(smtp_user, smtp_password)
-            server.sendmail(smtp_user, to_email, msg.as_string())
-            print(f"Email sent to {to_email}")
+        if settings["auth"]:
+            server.login(settings["user"], settings["password"])
+    except Exception:
+        server.close()
+        raise
+    return server
+
+def send_email(to_email: str, subject: str, body: str):
+    settings = _smtp_settings()
+
+    try:
+        server = _connect(settings)
+        with server:
+            server.sendmail(settings["sender"], to_email, _build_message(settings["sender"], to_email, subject, body))
+            logging.info("Email enviado para %s", to_email)
     except Exception as e:
-        print(f"Failed to send email: {e}")
-        raise
\ No newline at end of file
+        logging.error("Falha ao enviar email para %s: %s", to_email, e)
+        raise
+
+
+class MailQueue:
+    """
+    Fila de emails em memória drenada por uma thread em background. A thread
+    reaproveita uma única conexão SMTP para vários envios (fechada após
+    `idle_timeout` segundos sem mensagens) e tenta de novo com backoff exponencial
+    quando a conexão cai ou o servidor responde com erro temporário.
+    """
+
+    _STOP = object()
+
+    def __init__(self, maxsize: int = 1000, max_retries: int = 3, backoff: float = 1.0, idle_timeout: float = 30.0):
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.idle_timeout = idle_timeout
+        self.sent = 0
+        self.failed = 0
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._thread = None
+        self._server = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="mail-queue", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None and thread.is_alive():
+            self._queue.put(self._STOP)
+            thread.join(timeout)
+
+    def enqueue(self, to_email: str, subject: str, body: str) -> bool:
+        self.start()
+        try:
+            self._queue.put_nowait((to_email, subject, body))
+            return True
+        except queue.Full:
+            logging.warning("Fila de emails cheia; descartando email para %s", to_email)
+            return False
+
+    def join(self):
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                self._disconnect()
+                continue
+
+            try:
+                if item is self._STOP:
+                    self._disconnect()
+                    return
+                self._deliver(*item)
+            finally:
+                self._queue.task_done()
+
+    def _deliver(self, to_email: str, subject: str, body: str):
+        settings = _smtp_settings()
+        message = _build_message(settings["sender"], to_email, subject, body)
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                if self._server is None:
+                    self._server = _connect(settings)
+                self._server.sendmail(settings["sender"], to_email, message)
+                self.sent += 1
+                return
+            except (ValueError, smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused) as e:
+                # Erros permanentes: tentar de novo não adianta.
+                logging.error("Falha definitiva ao enviar email para %s: %s", to_email, e)
+                break
+            except (smtplib.SMTPException, OSError) as e:
+                self._disconnect()
+                if attempt < self.max_retries:
+                    delay = self.backoff * (2 ** attempt)
+                    logging.warning("Falha ao enviar email para %s (%s); nova tentativa em %.1fs", to_email, e, delay)
+                    time.sleep(delay)
+                else:
+                    logging.error("Falha ao enviar email para %s após %s tentativas: %s", to_email, attempt + 1, e)
+        self.failed += 1
+
+    def _disconnect(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except (smtplib.SMTPException, OSError):
+                self._server.close()
+            self._server = None
+
+
+mail_queue = MailQueue(
+    maxsize=int(os.getenv("MAIL_QUEUE_MAXSIZE", 1000)),
+    max_retries=int(os.getenv("MAIL_QUEUE_MAX_RETRIES", 3)),
+    backoff=float(os.getenv("MAIL_QUEUE_BACKOFF", 1.0)),
+    idle_timeout=float(os.getenv("MAIL_QUEUE_IDLE_TIMEOUT", 30)),
+)
+
+def enqueue_email(to_email: str, subject: str, body: str) -> bool:
+    return mail_queue.enqueue(to_email, subject, body)
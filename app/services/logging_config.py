@@ -0,0 +1,133 @@
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # "text" ou "json"
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+TEXT_FORMAT = "%(asctime)s - %(levelname)s - [%(request_id)s %(route)s] %(message)s"
+
+# Campos extras dos registros que vão para a saída JSON.
+_STANDARD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id", "route"}
+
+
+class RequestContext:
+    __slots__ = ("request_id", "scope")
+
+    def __init__(self, request_id: str, scope: dict):
+        self.request_id = request_id
+        self.scope = scope
+
+    @property
+    def route(self) -> str:
+        # O template só existe depois do roteamento; antes disso, o path cru.
+        route = self.scope.get("route")
+        return route.path if route is not None else self.scope.get("path", "-")
+
+
+current_context: ContextVar = ContextVar("log_context", default=None)
+
+
+class RequestContextFilter(logging.Filter):
+    """Anexa request id e rota da requisição atual a cada registro, na thread que loga."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = current_context.get()
+        record.request_id = context.request_id if context else "-"
+        record.route = context.route if context else "-"
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", "-"),
+            "route": getattr(record, "route", "-"),
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in _STANDARD_ATTRIBUTES})
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler que descarta o registro quando a fila está cheia, em vez de bloquear a requisição."""
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+_listener = None
+
+
+def configure_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT):
+    """
+    Troca os handlers do logger raiz por uma fila: quem loga só enfileira o registro
+    (com o contexto da requisição já anexado) e uma thread do QueueListener formata
+    e escreve. Idempotente; `stop_logging()` esvazia a fila no encerramento.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    output = logging.StreamHandler()
+    output.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT))
+
+    log_queue = queue.Queue(LOG_QUEUE_SIZE)
+    handler = NonBlockingQueueHandler(log_queue)
+    handler.addFilter(RequestContextFilter())
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def stop_logging():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class RequestContextMiddleware:
+    """Gera (ou reaproveita o `X-Request-ID` recebido) um id por requisição e o devolve na resposta."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        request_id = headers.get(b"x-request-id", b"").decode("latin-1")[:64] or uuid.uuid4().hex
+        token = current_context.set(RequestContext(request_id, scope))
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), (b"x-request-id", request_id.encode("latin-1"))]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            current_context.reset(token)
@@ -0,0 +1,232 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+# Por padrão o /metrics exige token de admin; `true` o abre para scrapers numa rede interna.
+METRICS_PUBLIC = os.getenv("METRICS_PUBLIC", "false").lower() in ("1", "true", "yes")
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+UNMATCHED = "unmatched"
+
+
+class RequestStats:
+    __slots__ = ("statements", "db_seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_seconds = 0.0
+
+
+# Estatísticas de banco da requisição atual. O contexto é copiado para o threadpool
+# dos endpoints síncronos e para o run_sync das sessões async, então os eventos do
+# engine enxergam o mesmo objeto que o middleware criou.
+current_request: ContextVar = ContextVar("current_request", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values) -> str:
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}" if pairs else ""
+
+
+class Metrics:
+    """Registro em memória no formato de exposição do Prometheus (texto)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.requests = {}
+        self.latency = {}
+        self.sizes = {}
+        self.db_statements = {}
+        self.db_seconds = {}
+
+    def request_started(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def request_finished(self, method: str, route: str, status: int, duration: float, size: int, stats: RequestStats):
+        key = (method, route)
+        with self._lock:
+            self.in_flight -= 1
+            self.requests[(method, route, status)] = self.requests.get((method, route, status), 0) + 1
+            self.latency.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(duration)
+            self.sizes.setdefault(key, Histogram(SIZE_BUCKETS)).observe(size)
+            self.db_statements[key] = self.db_statements.get(key, 0) + stats.statements
+            self.db_seconds[key] = self.db_seconds.get(key, 0.0) + stats.db_seconds
+
+    def render(self) -> str:
+        lines = []
+
+        def header(name, kind, description):
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        def histogram(name, description, series):
+            header(name, "histogram", description)
+            for (method, route), values in sorted(series.items()):
+                cumulative = 0
+                for bound, count in zip(values.buckets + ("+Inf",), values.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(('method', 'route', 'le'), (method, route, bound))} {cumulative}")
+                labels = _labels(("method", "route"), (method, route))
+                lines.append(f"{name}_sum{labels} {values.sum}")
+                lines.append(f"{name}_count{labels} {values.count}")
+
+        with self._lock:
+            header("http_requests_in_flight", "gauge", "Requisições em andamento.")
+            lines.append(f"http_requests_in_flight {self.in_flight}")
+
+            header("http_requests_total", "counter", "Requisições atendidas por rota e status.")
+            for key, count in sorted(self.requests.items()):
+                lines.append(f"http_requests_total{_labels(('method', 'route', 'status'), key)} {count}")
+
+            histogram("http_request_duration_seconds", "Latência das requisições por rota.", self.latency)
+            histogram("http_response_size_bytes", "Tamanho do corpo das respostas por rota.", self.sizes)
+
+            header("db_statements_total", "counter", "Statements SQL executados por rota.")
+            for key, count in sorted(self.db_statements.items()):
+                lines.append(f"db_statements_total{_labels(('method', 'route'), key)} {count}")
+
+            header("db_duration_seconds_total", "counter", "Tempo gasto no banco por rota.")
+            for key, seconds in sorted(self.db_seconds.items()):
+                lines.append(f"db_duration_seconds_total{_labels(('method', 'route'), key)} {seconds}")
+
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+# O início fica no ExecutionContext do statement, e não numa pilha na conexão: um
+# statement que falha não chega ao after_cursor_execute e deixaria a pilha torta.
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_started = time.perf_counter()
+
+
+def _record(context):
+    started = getattr(context, "_metrics_started", None)
+    stats = current_request.get()
+    if started is not None and stats is not None:
+        stats.statements += 1
+        stats.db_seconds += time.perf_counter() - started
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _record(context)
+
+
+def _handle_error(exception_context):
+    # Statements que falham também ocupam o banco e entram na conta da requisição.
+    _record(exception_context.execution_context)
+
+
+def instrument_engine(engine):
+    """Conta statements e tempo de banco de cada requisição (engine síncrono ou `async_engine.sync_engine`)."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+    return engine
+
+
+class RouteTemplates:
+    """
+    Template de rota por path, aprendido das requisições que passaram pelo roteador.
+    Respostas que não chegam a ele (cache hit) usam o template já visto para o path.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._paths = OrderedDict()
+        self._lock = threading.Lock()
+
+    def resolve(self, scope) -> str:
+        path = scope["path"]
+        route = scope.get("route")
+        with self._lock:
+            if route is not None:
+                self._paths[path] = route.path
+                self._paths.move_to_end(path)
+                if len(self._paths) > self.max_entries:
+                    self._paths.popitem(last=False)
+                return route.path
+            return self._paths.get(path, UNMATCHED)
+
+
+def _server_timing(stats: RequestStats, elapsed: float) -> bytes:
+    return (
+        f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.statements} queries", '
+        f"app;dur={elapsed * 1000:.1f}"
+    ).encode("latin-1")
+
+
+class MetricsMiddleware:
+    """
+    Mede cada requisição HTTP: latência, tamanho da resposta e trabalho no banco,
+    agregados por template de rota. Acrescenta `Server-Timing` com o tempo de
+    banco e o total até o início da resposta.
+    """
+
+    def __init__(self, app, registry: Metrics = None, enabled: bool = METRICS_ENABLED):
+        self.app = app
+        self.registry = registry or metrics
+        self.enabled = enabled
+        self.routes = RouteTemplates()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        started = time.perf_counter()
+        response = {"status": 500, "size": 0}
+
+        async def instrumented_send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", _server_timing(stats, time.perf_counter() - started)))
+                message = {**message, "headers": headers}
+            elif message["type"] == "http.response.body":
+                response["size"] += len(message.get("body", b""))
+            await send(message)
+
+        self.registry.request_started()
+        try:
+            await self.app(scope, receive, instrumented_send)
+        finally:
+            current_request.reset(token)
+            self.registry.request_finished(
+                scope["method"],
+                self.routes.resolve(scope),
+                response["status"],
+                time.perf_counter() - started,
+                response["size"],
+                stats,
+            )
@@ -1,38 +1,149 @@
 from datetime import datetime, timedelta
+from sqlalchemy import func, inspect, select, text
 from sqlalchemy.orm import Session
 from app.models import models
-from app.utils.profit import calculate_profit
+from app.utils.pagination import paginate_cursor
+from app.utils.profit import margin_expression
 
-def calculate_total_profit(db: Session, days: int = 365, product_id: int = None) -> dict:
-    cutoff_date = datetime.utcnow() - timedelta(days=days)
-    
-    sales_query = db.query(models.Sale).filter(models.Sale.date >= cutoff_date)
-    
+PROFIT_GROUPS = ["product", "category", "day", "week", "month"]
+DETAIL_MODES = ["none", "page", "stream", "all"]
+
+
+def _cutoff(days: int):
+    return (datetime.utcnow() - timedelta(days=days)).date()
+
+
+def _with_margins(statement):
+    # Junta produto e categoria para resolver a margem efetiva de cada linha.
+    return statement.join(models.Product, models.Product.id == models.SalesDailyRollup.product_id).outerjoin(
+        models.Category, models.Category.id == models.Product.category_id
+    )
+
+
+def _rollup_filters(statement, days: int, product_id: int = None, category_id: int = None):
+    statement = statement.where(models.SalesDailyRollup.day >= _cutoff(days))
+    if product_id:
+        statement = statement.where(models.SalesDailyRollup.product_id == product_id)
+    if category_id:
+        statement = statement.where(models.Product.category_id == category_id)
+    return statement
+
+
+def _period_expression(db: Session, group_by: str):
+    day = models.SalesDailyRollup.day
+    if db.get_bind().dialect.name == "postgresql":
+        return func.to_char(func.date_trunc(group_by, day), "YYYY-MM-DD")
+    if group_by == "week":
+        return func.date(day, "weekday 0", "-6 days")
+    if group_by == "month":
+        return func.strftime("%Y-%m-01", day)
+    return func.date(day)
+
+
+def _totals():
+    rollup = models.SalesDailyRollup
+    return (
+        func.coalesce(func.sum(rollup.sale_count), 0).label("sale_count"),
+        func.coalesce(func.sum(rollup.quantity), 0).label("quantity"),
+        func.coalesce(func.sum(rollup.revenue), 0.0).label("revenue"),
+        func.coalesce(func.sum(rollup.revenue * margin_expression()), 0.0).label("profit"),
+    )
+
+
+def profit_summary(db: Session, days: int = 365, product_id: int = None, category_id: int = None) -> dict:
+    """Totais do período, agregados no banco a partir do rollup diário de vendas."""
+    statement = _rollup_filters(_with_margins(select(*_totals()).select_from(models.SalesDailyRollup)), days, product_id, category_id)
+    return dict(db.execute(statement).one()._mapping)
+
+
+def profit_breakdown(
+    db: Session, group_by: str = "product", days: int = 365, product_id: int = None, category_id: int = None
+) -> list:
+    """Lucro agrupado por produto, categoria ou período (dia, semana ou mês)."""
+    if group_by == "product":
+        keys = (models.Product.id.label("key"), models.Product.name.label("name"))
+    elif group_by == "category":
+        keys = (models.Category.id.label("key"), models.Category.name.label("name"))
+    else:
+        keys = (_period_expression(db, group_by).label("key"),)
+
+    statement = _rollup_filters(
+        _with_margins(select(*keys, *_totals()).select_from(models.SalesDailyRollup)), days, product_id, category_id
+    )
+    statement = statement.group_by(*keys).order_by(keys[0])
+    return [
+        {**row._mapping, "key": str(row.key) if row.key is not None else "none"}
+        for row in db.execute(statement)
+    ]
+
+
+def sales_profit_statement(days: int = 365, product_id: int = None, category_id: int = None):
+    """Linhas de venda com o lucro calculado no banco, para paginar ou transmitir."""
+    statement = (
+        select(
+            models.Sale.id,
+            models.Sale.product_id,
+            models.Sale.quantity,
+            models.Sale.total_price,
+            models.Sale.date,
+            (func.coalesce(models.Sale.total_price, 0.0) * margin_expression()).label("profit"),
+        )
+        .join(models.Product, models.Product.id == models.Sale.product_id)
+        .outerjoin(models.Category, models.Category.id == models.Product.category_id)
+        .where(models.Sale.date >= _cutoff(days))
+    )
     if product_id:
-        sales_query = sales_query.filter(models.Sale.product_id == product_id)
-    
-    sales = sales_query.all()
+        statement = statement.where(models.Sale.product_id == product_id)
+    if category_id:
+        statement = statement.where(models.Product.category_id == category_id)
+    return statement
+
+
+def calculate_total_profit(
+    db: Session,
+    days: int = 365,
+    product_id: int = None,
+    category_id: int = None,
+    detail: str = "none",
+    limit: int = 100,
+    cursor: str = None,
+) -> dict:
+    summary = profit_summary(db, days, product_id, category_id)
 
-    total_profit = sum(calculate_profit(sale).profit for sale in sales)
-    
     product_name = None
     if product_id:
-        product = db.query(models.Product).filter(models.Product.id == product_id).first()
-        if product:
-            product_name = product.name
+        product_name = db.query(models.Product.name).filter(models.Product.id == product_id).scalar()
 
-    return {
-        "total_profit": total_profit,
+    result = {
+        "total_profit": summary["profit"],
+        "total_revenue": summary["revenue"],
+        "quantity": summary["quantity"],
+        "sale_count": summary["sale_count"],
         "days": days,
-        "name": product_name,  
-        "sales": [
-            {
-                "product_id": sale.product_id,
-                "quantity": sale.quantity,
-                "total_price": sale.total_price,
-                "date": sale.date,
-                "profit": calculate_profit(sale).profit
-            }
-            for sale in sales
-        ]
+        "name": product_name,
     }
+
+    if detail == "none":
+        return result
+
+    statement = sales_profit_statement(days, product_id, category_id)
+    if detail == "page":
+        rows = statement.subquery()
+        items, _, next_cursor = paginate_cursor(
+            db.query(rows), "id", rows.c.id, rows.c.id, "asc", cursor, limit, "none"
+        )
+        result["sales"] = [dict(row._mapping) for row in items]
+        result["next_cursor"] = next_cursor
+    else:
+        result["sales"] = [dict(row._mapping) for row in db.execute(statement.order_by(models.Sale.id))]
+    return result
+
+
+def ensure_profit_margin_columns(engine):
+    """Adiciona `profit_margin` em produtos e categorias de bancos criados antes da coluna existir."""
+    inspector = inspect(engine)
+    for table in ("categories", "products"):
+        columns = {column["name"] for column in inspector.get_columns(table)}
+        if "profit_margin" not in columns:
+            with engine.begin() as connection:
+                connection.execute(text(f"ALTER TABLE {table} ADD COLUMN profit_margin FLOAT"))
@@ -0,0 +1,241 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlencode
+
+from app.services.auth import has_viewer_access
+
+CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", 60))
+CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 1024))
+CACHE_REDIS_URL = os.getenv("RESPONSE_CACHE_REDIS_URL")
+
+PRODUCTS = "products"
+CATEGORIES = "categories"
+PRICE_HISTORY = "price_history"
+ROLES = "roles"
+
+# Rotas GET cacheadas -> namespace invalidado pelas escritas correspondentes.
+CACHED_ROUTES = [
+    (re.compile(r"^/products(/search)?/?$"), PRODUCTS),
+    (re.compile(r"^/categories/?$"), CATEGORIES),
+    (re.compile(r"^/price-history/[^/]+(/raw|/buckets)?/?$"), PRICE_HISTORY),
+    (re.compile(r"^/users/roles/?$"), ROLES),
+]
+
+
+class LocalBackend:
+    """Backend em memória do processo: LRU limitado a `max_entries`, com TTL por entrada."""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: dict, ttl: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def version(self, namespace: str) -> int:
+        with self._lock:
+            return self._versions.get(namespace, 0)
+
+    def bump(self, namespace: str):
+        with self._lock:
+            self._versions[namespace] = self._versions.get(namespace, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+
+
+class RedisBackend:
+    """
+    Backend compartilhado entre workers. As versões dos namespaces ficam no Redis,
+    então uma escrita em qualquer worker invalida o cache de todos. O limite de
+    tamanho fica a cargo da política `maxmemory` do Redis.
+    """
+
+    def __init__(self, url: str, prefix: str = "smartmart:cache:"):
+        import redis
+
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key: str):
+        raw = self._client.get(self.prefix + key)
+        return json.loads(raw) if raw else None
+
+    def set(self, key: str, value: dict, ttl: float):
+        self._client.set(self.prefix + key, json.dumps(value), px=int(ttl * 1000))
+
+    def version(self, namespace: str) -> int:
+        return int(self._client.get(f"{self.prefix}version:{namespace}") or 0)
+
+    def bump(self, namespace: str):
+        self._client.incr(f"{self.prefix}version:{namespace}")
+
+    def clear(self):
+        for key in self._client.scan_iter(f"{self.prefix}*"):
+            self._client.delete(key)
+
+
+class ResponseCache:
+    def __init__(self, backend, ttl: float = CACHE_TTL, enabled: bool = CACHE_ENABLED):
+        self.backend = backend
+        self.ttl = ttl
+        self.enabled = enabled
+
+    def namespace_for(self, path: str):
+        for pattern, namespace in CACHED_ROUTES:
+            if pattern.match(path):
+                return namespace
+        return None
+
+    def key(self, namespace: str, path: str, query_string: bytes) -> str:
+        # Parâmetros ordenados: ?b=1&a=2 e ?a=2&b=1 caem na mesma entrada.
+        params = sorted(parse_qsl(query_string.decode("latin-1"), keep_blank_values=True))
+        return f"{namespace}:v{self.backend.version(namespace)}:{path.rstrip('/')}?{urlencode(params)}"
+
+    def get(self, key: str):
+        return self.backend.get(key)
+
+    def set(self, key: str, value: dict):
+        self.backend.set(key, value, self.ttl)
+
+    def invalidate(self, *namespaces: str):
+        for namespace in namespaces:
+            try:
+                self.backend.bump(namespace)
+            except Exception as e:
+                logging.error(f"Falha ao invalidar o cache '{namespace}': {e}")
+
+
+def _default_backend():
+    if CACHE_REDIS_URL:
+        try:
+            return RedisBackend(CACHE_REDIS_URL)
+        except ImportError:
+            logging.warning("Pacote 'redis' não instalado; usando cache local em memória")
+    return LocalBackend()
+
+
+response_cache = ResponseCache(_default_backend())
+
+
+def invalidate(*namespaces: str):
+    response_cache.invalidate(*namespaces)
+
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+class ResponseCacheMiddleware:
+    """
+    Cache read-through para os GETs de catálogo, como middleware ASGI puro.
+    Respostas 200 ficam em cache por rota + query normalizada, com ETag; um
+    `If-None-Match` igual recebe `304 Not Modified` sem corpo.
+    """
+
+    def __init__(self, app, cache: ResponseCache = None):
+        self.app = app
+        self.cache = cache or response_cache
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET" or not self.cache.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        namespace = self.cache.namespace_for(scope["path"])
+        if namespace is None:
+            await self.app(scope, receive, send)
+            return
+
+        # Sem credencial válida a requisição segue para o roteador, que responde 401/403.
+        if not has_viewer_access(scope):
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = dict(scope["headers"])
+        if_none_match = request_headers.get(b"if-none-match", b"").decode("latin-1")
+        key = self.cache.key(namespace, scope["path"], scope.get("query_string", b""))
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            await self._send(send, cached, if_none_match, b"HIT")
+            return
+
+        start = {}
+        chunks = []
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                start.update(message)
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await self.app(scope, receive, capture)
+
+        body = b"".join(chunks)
+        headers = [
+            (name.decode("latin-1"), value.decode("latin-1"))
+            for name, value in start.get("headers", [])
+            if name.lower() not in (b"content-length", b"etag")
+        ]
+        entry = {"status": start.get("status", 500), "headers": headers, "body": body.decode("latin-1")}
+        if entry["status"] == 200:
+            entry["etag"] = _etag(body)
+            self.cache.set(key, entry)
+        await self._send(send, entry, if_none_match, b"MISS")
+
+    async def _send(self, send, entry: dict, if_none_match: str, cache_status: bytes):
+        body = entry["body"].encode("latin-1")
+        headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in entry["headers"]]
+        etag = entry.get("etag")
+        if etag:
+            headers.append((b"etag", etag.encode("latin-1")))
+            headers.append((b"x-cache", cache_status))
+
+        if etag and _etag_matches(if_none_match, etag):
+            keep = (b"etag", b"x-cache", b"cache-control", b"vary")
+            await send({
+                "type": "http.response.start",
+                "status": 304,
+                "headers": [(name, value) for name, value in headers if name in keep],
+            })
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        headers.append((b"content-length", str(len(body)).encode("latin-1")))
+        await send({"type": "http.response.start", "status": entry["status"], "headers": headers})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,360 @@
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from app.models import models
+
+logger = logging.getLogger(__name__)
+
+# Intervalo mínimo entre consultas ao banco para buscar vendas novas de outros processos.
+REFRESH_INTERVAL = float(os.getenv("ANALYTICS_REFRESH_INTERVAL", 5))
+LOAD_BATCH_SIZE = int(os.getenv("ANALYTICS_LOAD_BATCH_SIZE", 50000))
+# Tempo que as marcações de `sale_changes` ficam guardadas; uma cópia que ficou mais
+# que isso sem atualizar é recarregada inteira.
+CHANGE_RETENTION = float(os.getenv("ANALYTICS_CHANGE_RETENTION", 3600))
+
+GROUPS = ("product", "day", "week", "month")
+TOP_METRICS = ("revenue", "quantity", "sale_count")
+
+NO_PRODUCT = -1
+NO_DATE = np.iinfo(np.int64).min  # valor inteiro de NaT
+
+sales_table = models.Sale.__table__
+changes_table = models.SaleChange.__table__
+_COLUMNS = (
+    sales_table.c.id, sales_table.c.product_id, sales_table.c.quantity, sales_table.c.total_price, sales_table.c.date
+)
+_DTYPES = {
+    "id": np.int64,
+    "product_id": np.int64,
+    "quantity": np.int64,
+    "total_price": np.float64,
+    "date": np.int64,
+    "alive": np.bool_,
+}
+
+
+def _to_micros(value: datetime) -> int:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return int(np.datetime64(value, "us").astype(np.int64))
+
+
+def _columns(rows) -> dict:
+    ids, product_ids, quantities, prices, dates = zip(*rows)
+    return {
+        "id": np.array(ids, dtype=np.int64),
+        "product_id": np.array([NO_PRODUCT if v is None else v for v in product_ids], dtype=np.int64),
+        "quantity": np.array([0 if v is None else v for v in quantities], dtype=np.int64),
+        "total_price": np.array([0.0 if v is None else v for v in prices], dtype=np.float64),
+        # datetime64 converte None em NaT, que vira NO_DATE como int64.
+        "date": np.array(dates, dtype="datetime64[us]").astype(np.int64),
+        "alive": np.ones(len(ids), dtype=np.bool_),
+    }
+
+
+class SalesSnapshot:
+    """
+    Cópia colunar de `sales` em arrays NumPy (product_id, quantity, total_price e date
+    em microssegundos como int64), para agregações vetorizadas sem passar pelo ORM.
+
+    A carga completa acontece uma vez; depois, cada `refresh` busca as vendas com id
+    maior que o último carregado e relê as vendas e produtos registrados em
+    `sale_changes` por `record_changes`, que as escritas de qualquer processo chamam
+    na própria transação; assim updates e deletes feitos por outros workers também
+    chegam. Os hooks locais (`mark_changed`, `mark_product_removed`) só antecipam o
+    refresh: escritas deste processo aparecem na consulta seguinte, as dos outros em
+    até `ANALYTICS_REFRESH_INTERVAL` segundos. Alterações feitas fora da API, sem
+    `record_changes`, exigem `invalidate()`.
+    """
+
+    def __init__(self, refresh_interval: float = REFRESH_INTERVAL, change_retention: float = CHANGE_RETENTION):
+        self.refresh_interval = refresh_interval
+        self.change_retention = change_retention
+        self._lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self._pending_ids = set()
+        self._removed_products = set()
+        self._reset()
+
+    def _reset(self):
+        self._arrays = {name: np.empty(0, dtype=dtype) for name, dtype in _DTYPES.items()}
+        self._size = 0
+        self.loaded = False
+        self._loading = False
+        self.last_id = 0
+        self.last_change_id = 0
+        self.refreshed_at = None
+        self._checked_at = 0.0
+        self.load_seconds = None
+
+    # Hooks de escrita ---------------------------------------------------------
+
+    # Antes da primeira carga não há o que corrigir: a carga completa já lê o estado atual.
+
+    def mark_changed(self, sale_ids):
+        if not (self.loaded or self._loading):
+            return
+        with self._pending_lock:
+            self._pending_ids.update(sale_ids)
+
+    def mark_product_removed(self, product_id: int):
+        if not (self.loaded or self._loading):
+            return
+        with self._pending_lock:
+            self._removed_products.add(product_id)
+
+    def invalidate(self):
+        with self._lock:
+            self._reset()
+
+    # Carga e atualização ------------------------------------------------------
+
+    def _append(self, columns: dict):
+        count = len(columns["id"])
+        needed = self._size + count
+        capacity = len(self._arrays["id"])
+        if needed > capacity:
+            # Crescimento geométrico: appends amortizados em O(1) por linha.
+            capacity = max(needed, capacity * 2, 1024)
+            for name, array in self._arrays.items():
+                grown = np.empty(capacity, dtype=array.dtype)
+                grown[:self._size] = array[:self._size]
+                self._arrays[name] = grown
+        for name, values in columns.items():
+            self._arrays[name][self._size:needed] = values
+        self._size = needed
+        self.last_id = int(columns["id"][-1])
+
+    def _load_after(self, db: Session, after_id: int) -> int:
+        statement = select(*_COLUMNS).where(sales_table.c.id > after_id).order_by(sales_table.c.id)
+        result = db.execute(statement.execution_options(yield_per=LOAD_BATCH_SIZE))
+        loaded = 0
+        for rows in result.partitions():
+            self._append(_columns(rows))
+            loaded += len(rows)
+        return loaded
+
+    def _reload_ids(self, db: Session, sale_ids):
+        ids = self._arrays["id"][:self._size]
+        alive = self._arrays["alive"]
+        sale_ids = sorted(sale_ids)
+        for start in range(0, len(sale_ids), 500):
+            chunk = [sale_id for sale_id in sale_ids[start:start + 500] if sale_id <= self.last_id]
+            if not chunk:
+                continue
+            found = {row[0]: row for row in db.execute(select(*_COLUMNS).where(sales_table.c.id.in_(chunk)))}
+            positions = np.searchsorted(ids, chunk)
+            for sale_id, position in zip(chunk, positions):
+                if position >= self._size or ids[position] != sale_id:
+                    continue
+                row = found.get(sale_id)
+                if row is None:
+                    alive[position] = False
+                    continue
+                for name, values in _columns([row]).items():
+                    self._arrays[name][position] = values[0]
+
+    def _load_changes(self, db: Session, pending_ids: set, removed_products: set):
+        rows = db.execute(
+            select(changes_table.c.id, changes_table.c.sale_id, changes_table.c.product_id)
+            .where(changes_table.c.id > self.last_change_id)
+            .order_by(changes_table.c.id)
+        ).all()
+        for change_id, sale_id, product_id in rows:
+            if sale_id is not None:
+                pending_ids.add(sale_id)
+            if product_id is not None:
+                removed_products.add(product_id)
+            self.last_change_id = change_id
+
+    def refresh(self, db: Session, force: bool = False):
+        with self._lock:
+            with self._pending_lock:
+                pending_ids, self._pending_ids = self._pending_ids, set()
+                removed_products, self._removed_products = self._removed_products, set()
+            try:
+                self._refresh(db, force, pending_ids, removed_products)
+            except Exception:
+                # Devolve as marcações para a próxima tentativa.
+                with self._pending_lock:
+                    self._pending_ids.update(pending_ids)
+                    self._removed_products.update(removed_products)
+                raise
+
+    def _refresh(self, db: Session, force: bool, pending_ids: set, removed_products: set):
+        now = time.monotonic()
+        due = force or not self.loaded or pending_ids or removed_products \
+            or now - self._checked_at >= self.refresh_interval
+        if not due:
+            return
+        if self.loaded and now - self._checked_at >= self.change_retention:
+            # As marcações desde a última atualização podem já ter sido apagadas.
+            self._reset()
+
+        if not self.loaded:
+            started = time.perf_counter()
+            self._loading = True
+            try:
+                # Marcações anteriores à carga já estão refletidas nela.
+                self.last_change_id = db.execute(select(func.max(changes_table.c.id))).scalar() or 0
+                self._load_after(db, 0)
+            except Exception:
+                self._reset()
+                raise
+            self.load_seconds = round(time.perf_counter() - started, 3)
+            self.loaded, self._loading = True, False
+            logger.info("Snapshot de vendas carregado: %s linhas em %ss", self._size, self.load_seconds)
+        else:
+            self._load_changes(db, pending_ids, removed_products)
+            if removed_products:
+                product_ids = self._arrays["product_id"][:self._size]
+                self._arrays["alive"][:self._size] &= ~np.isin(product_ids, list(removed_products))
+            if pending_ids:
+                self._reload_ids(db, pending_ids)
+            self._load_after(db, self.last_id)
+
+        self._checked_at = now
+        self.refreshed_at = time.time()
+
+    # Consultas ----------------------------------------------------------------
+
+    def _selection(self, start: datetime = None, end: datetime = None, product_id: int = None):
+        size = self._size
+        mask = self._arrays["alive"][:size].copy()
+        dates = self._arrays["date"][:size]
+        if start:
+            mask &= dates >= _to_micros(start)
+        if end:
+            mask &= (dates < _to_micros(end)) & (dates != NO_DATE)
+        if product_id is not None:
+            mask &= self._arrays["product_id"][:size] == product_id
+        return {name: self._arrays[name][:size][mask] for name in ("product_id", "quantity", "total_price", "date")}
+
+    def summary(self, start: datetime = None, end: datetime = None, product_id: int = None) -> dict:
+        with self._lock:
+            selected = self._selection(start, end, product_id)
+        count = len(selected["quantity"])
+        revenue = float(selected["total_price"].sum())
+        dates = selected["date"][selected["date"] != NO_DATE]
+        return {
+            "sale_count": count,
+            "quantity": int(selected["quantity"].sum()),
+            "revenue": revenue,
+            "average_ticket": revenue / count if count else 0.0,
+            "product_count": int(np.unique(selected["product_id"][selected["product_id"] != NO_PRODUCT]).size),
+            "first_sale": dates.min().astype("datetime64[us]").item() if dates.size else None,
+            "last_sale": dates.max().astype("datetime64[us]").item() if dates.size else None,
+        }
+
+    def _grouped(self, group: str, start: datetime = None, end: datetime = None, product_id: int = None):
+        with self._lock:
+            selected = self._selection(start, end, product_id)
+
+        if group == "product":
+            keys = selected["product_id"]
+        else:
+            dated = selected["date"] != NO_DATE
+            selected = {name: values[dated] for name, values in selected.items()}
+            keys = selected["date"].astype("datetime64[us]").astype("datetime64[D]").astype(np.int64)
+            if group == "week":
+                # 1970-01-01 foi quinta-feira: (dia + 3) % 7 é o dia da semana com segunda = 0.
+                keys = keys - (keys + 3) % 7
+            elif group == "month":
+                keys = keys.astype("datetime64[D]").astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        counts = np.bincount(inverse, minlength=unique_keys.size)
+        quantities = np.bincount(inverse, weights=selected["quantity"], minlength=unique_keys.size)
+        revenues = np.bincount(inverse, weights=selected["total_price"], minlength=unique_keys.size)
+        return unique_keys, {"sale_count": counts, "quantity": quantities, "revenue": revenues}
+
+    @staticmethod
+    def _rows(labels, totals: dict, positions) -> list:
+        return [
+            {
+                "key": labels[position],
+                "sale_count": int(totals["sale_count"][position]),
+                "quantity": int(totals["quantity"][position]),
+                "revenue": float(totals["revenue"][position]),
+            }
+            for position in positions
+        ]
+
+    def group_by(self, group: str, start: datetime = None, end: datetime = None, product_id: int = None) -> list:
+        unique_keys, totals = self._grouped(group, start, end, product_id)
+        if group == "product":
+            labels = ["none" if key == NO_PRODUCT else str(key) for key in unique_keys.tolist()]
+        else:
+            labels = [str(day) for day in unique_keys.astype("datetime64[D]")]
+        return self._rows(labels, totals, range(unique_keys.size))
+
+    def top_products(self, limit: int = 10, metric: str = "revenue", start: datetime = None, end: datetime = None) -> list:
+        unique_keys, totals = self._grouped("product", start, end)
+        values = np.where(unique_keys == NO_PRODUCT, -np.inf, totals[metric].astype(np.float64))
+        limit = min(limit, int((unique_keys != NO_PRODUCT).sum()))
+        if limit <= 0:
+            return []
+        # argpartition separa os N maiores em O(n); só eles são ordenados.
+        top = np.argpartition(-values, limit - 1)[:limit]
+        top = top[np.argsort(-values[top], kind="stable")]
+        rows = self._rows([str(key) for key in unique_keys.tolist()], totals, top.tolist())
+        return [{**row, "product_id": int(row["key"])} for row in rows]
+
+    def status(self) -> dict:
+        with self._lock:
+            alive = int(self._arrays["alive"][:self._size].sum())
+            memory = sum(array.nbytes for array in self._arrays.values())
+            size = self._size
+        with self._pending_lock:
+            pending = len(self._pending_ids) + len(self._removed_products)
+        return {
+            "loaded": self.loaded,
+            "rows": size,
+            "live_rows": alive,
+            "last_sale_id": self.last_id,
+            "memory_bytes": memory,
+            "load_seconds": self.load_seconds,
+            "refreshed_at": datetime.fromtimestamp(self.refreshed_at) if self.refreshed_at else None,
+            "refresh_lag_seconds": round(time.time() - self.refreshed_at, 3) if self.refreshed_at else None,
+            "pending_changes": pending,
+            "refresh_interval_seconds": self.refresh_interval,
+        }
+
+
+snapshot = SalesSnapshot()
+_pruned_at = 0.0
+
+
+def record_changes(db: Session, sale_ids=(), product_id: int = None):
+    """
+    Registra em `sale_changes` as vendas alteradas ou removidas (ou o produto removido),
+    sem commit: roda na transação da escrita. De tempos em tempos apaga as marcações
+    mais antigas que `ANALYTICS_CHANGE_RETENTION`.
+    """
+    global _pruned_at
+    now = datetime.utcnow()
+    rows = [{"sale_id": sale_id, "product_id": None, "changed_at": now} for sale_id in sale_ids]
+    if product_id is not None:
+        rows.append({"sale_id": None, "product_id": product_id, "changed_at": now})
+    if rows:
+        db.execute(insert(changes_table), rows)
+    if time.monotonic() - _pruned_at >= 60:
+        _pruned_at = time.monotonic()
+        db.execute(delete(changes_table).where(
+            changes_table.c.changed_at < datetime.utcfromtimestamp(time.time() - CHANGE_RETENTION)
+        ))
+
+
+def mark_changed(sale_ids):
+    snapshot.mark_changed(sale_ids)
+
+
+def mark_product_removed(product_id: int):
+    snapshot.mark_product_removed(product_id)
@@ -0,0 +1,201 @@
+import json
+import logging
+import os
+import time
+from typing import List
+
+from fastapi import HTTPException, Request
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import func, insert, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models import models
+from app.schemas import schemas
+from app.services import sales_analytics, sales_rollup
+from app.services.write_queue import run_write_async
+
+logger = logging.getLogger(__name__)
+
+COMMIT_SIZE = int(os.getenv("SALES_INGEST_COMMIT_SIZE", 1000))
+MAX_COMMIT_SIZE = 10000
+RESULT_MODES = ("all", "errors", "none")
+NDJSON_TYPES = ("application/x-ndjson", "application/jsonl", "application/jsonlines", "application/ndjson")
+
+sales_table = models.Sale.__table__
+products_table = models.Product.__table__
+
+_sales_adapter = TypeAdapter(List[schemas.SaleCreate])
+
+
+class _InvalidLine:
+    def __init__(self, error: str):
+        self.error = error
+
+
+def _error_messages(errors) -> list:
+    return [
+        f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" if error["loc"] else error["msg"]
+        for error in errors
+    ]
+
+
+def validate_sales(items: list):
+    """
+    Valida a lista inteira com um único TypeAdapter (pydantic-core, sem laço em Python).
+    Se algum item falhar, os erros vêm indexados por posição e só os itens válidos são
+    validados de novo. Devolve (posições e linhas válidas, posição -> erros).
+    """
+    rejected = {}
+    candidates = []
+    for position, item in enumerate(items):
+        if isinstance(item, _InvalidLine):
+            rejected[position] = [item.error]
+        else:
+            candidates.append(position)
+
+    try:
+        sales = _sales_adapter.validate_python([items[position] for position in candidates])
+    except ValidationError as e:
+        for error in e.errors(include_url=False):
+            position = candidates[error["loc"][0]]
+            rejected.setdefault(position, []).extend(_error_messages([{**error, "loc": error["loc"][1:]}]))
+        candidates = [position for position in candidates if position not in rejected]
+        sales = _sales_adapter.validate_python([items[position] for position in candidates])
+
+    return list(zip(candidates, (sale.model_dump() for sale in sales))), rejected
+
+
+def write_sales(db: Session, entries: list):
+    """
+    Grava as vendas validadas com um INSERT em lote, junto com o rollup diário, sem
+    commit: é uma unidade de `run_write`, e todo o lote vai num único commit (group
+    commit). Vendas de produtos inexistentes são rejeitadas antes, para que uma FK
+    inválida não derrube o lote inteiro.
+    """
+    product_ids = {row["product_id"] for _, row in entries}
+    known = set(db.execute(select(products_table.c.id).where(products_table.c.id.in_(product_ids))).scalars())
+
+    rejected = {position: ["product_id: Produto não encontrado"] for position, row in entries if row["product_id"] not in known}
+    entries = [(position, row) for position, row in entries if row["product_id"] in known]
+    if not entries:
+        return {}, rejected
+
+    rows = [row for _, row in entries]
+    ids = _insert_returning_ids(db, rows)
+    sales_rollup.record_sales(
+        db, ((row["product_id"], row["date"], row["quantity"], row["total_price"]) for row in rows)
+    )
+    return {position: sale_id for (position, _), sale_id in zip(entries, ids)}, rejected
+
+
+async def insert_sales(db: AsyncSession, entries: list):
+    try:
+        created, rejected = await run_write_async(db, write_sales, entries)
+    except SQLAlchemyError as e:
+        logger.error("Falha ao gravar lote de %s vendas: %s", len(entries), e)
+        return {}, {position: ["Falha ao gravar o lote"] for position, _ in entries}
+
+    sales_analytics.mark_changed(created.values())
+    return created, rejected
+
+
+def _insert_returning_ids(db: Session, rows: list) -> list:
+    if db.get_bind().dialect.name != "sqlite":
+        return db.execute(
+            insert(sales_table).returning(sales_table.c.id, sort_by_parameter_order=True), rows
+        ).scalars().all()
+    # No SQLite, RETURNING com ordem garantida vira um INSERT por linha. Um executemany
+    # simples é bem mais rápido, e como a transação segura o lock de escrita até o
+    # commit, os rowids novos são max(id) + 1, + 2, ... na ordem dos parâmetros.
+    db.execute(insert(sales_table), rows)
+    last_id = db.execute(select(func.max(sales_table.c.id))).scalar()
+    return list(range(last_id - len(rows) + 1, last_id + 1))
+
+
+async def _ndjson_items(request: Request):
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield _parse_line(line)
+    if buffer.strip():
+        yield _parse_line(buffer)
+
+
+def _parse_line(line: bytes):
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return _InvalidLine(f"JSON inválido: {e}")
+
+
+async def _batches(request: Request, commit_size: int):
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in NDJSON_TYPES:
+        # NDJSON é processado à medida que chega: a memória depende de `commit_size`, não do corpo.
+        batch = []
+        async for item in _ndjson_items(request):
+            batch.append(item)
+            if len(batch) >= commit_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+        return
+
+    try:
+        items = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Corpo deve ser um array JSON ou NDJSON")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Corpo deve ser um array JSON ou NDJSON")
+    for start in range(0, len(items), commit_size):
+        yield items[start:start + commit_size]
+
+
+async def _ingest_batch(db: AsyncSession, items: list):
+    entries, rejected = validate_sales(items)
+    created = {}
+    if entries:
+        created, rejected_on_insert = await insert_sales(db, entries)
+        rejected.update(rejected_on_insert)
+    return created, rejected
+
+
+async def ingest_sales(request: Request, db: AsyncSession, commit_size: int = COMMIT_SIZE, results: str = "all") -> dict:
+    """
+    Recebe vendas em lote (array JSON ou NDJSON), valida e grava em grupos de
+    `commit_size` linhas, cada grupo com um commit. O resultado traz o status de
+    cada linha, pela posição no corpo (a partir de 0).
+    """
+    report = {"received": 0, "created": 0, "rejected": 0, "commits": 0, "results": []}
+    started = time.perf_counter()
+
+    async for items in _batches(request, commit_size):
+        offset = report["received"]
+        created, rejected = await _ingest_batch(db, items)
+
+        report["received"] += len(items)
+        report["created"] += len(created)
+        report["rejected"] += len(rejected)
+        report["commits"] += 1 if created else 0
+
+        if results == "none":
+            continue
+        for position in range(len(items)):
+            if position in created:
+                if results == "all":
+                    report["results"].append({"index": offset + position, "status": "created", "id": created[position]})
+            else:
+                report["results"].append(
+                    {"index": offset + position, "status": "rejected", "errors": rejected.get(position, [])}
+                )
+
+    elapsed = time.perf_counter() - started
+    report["seconds"] = round(elapsed, 4)
+    report["rows_per_second"] = round(report["received"] / elapsed, 1) if elapsed else None
+    return report
@@ -0,0 +1,156 @@
+from datetime import datetime
+
+from sqlalchemy import exists, func, select, delete
+from sqlalchemy.orm import Session
+
+from app.models import models
+from app.utils.profit import PROFIT_MARGIN, profit_from_revenue
+
+rollup_table = models.SalesDailyRollup.__table__
+
+
+def _insert_for(db: Session):
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        return None
+    return insert
+
+
+def _sale_day(date):
+    if date is None:
+        return None
+    if isinstance(date, datetime):
+        return date.date()
+    return date
+
+
+def apply_deltas(db: Session, deltas: dict):
+    """
+    Aplica incrementos na tabela de rollup diário. `deltas` mapeia
+    (product_id, dia) -> [vendas, quantidade, receita]. Não faz commit:
+    roda na mesma transação da escrita em `sales`.
+    """
+    rows = [
+        {
+            "product_id": product_id,
+            "day": day,
+            "sale_count": count,
+            "quantity": quantity,
+            "revenue": revenue,
+            "profit": profit_from_revenue(revenue),
+        }
+        for (product_id, day), (count, quantity, revenue) in deltas.items()
+        if product_id is not None and day is not None
+    ]
+    if not rows:
+        return
+
+    insert = _insert_for(db)
+    if insert is not None:
+        stmt = insert(rollup_table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[rollup_table.c.product_id, rollup_table.c.day],
+            set_={
+                "sale_count": rollup_table.c.sale_count + stmt.excluded.sale_count,
+                "quantity": rollup_table.c.quantity + stmt.excluded.quantity,
+                "revenue": rollup_table.c.revenue + stmt.excluded.revenue,
+                "profit": rollup_table.c.profit + stmt.excluded.profit,
+            },
+        )
+        db.execute(stmt, rows)
+        return
+
+    for row in rows:
+        updated = db.execute(
+            rollup_table.update()
+            .where(rollup_table.c.product_id == row["product_id"], rollup_table.c.day == row["day"])
+            .values(
+                sale_count=rollup_table.c.sale_count + row["sale_count"],
+                quantity=rollup_table.c.quantity + row["quantity"],
+                revenue=rollup_table.c.revenue + row["revenue"],
+                profit=rollup_table.c.profit + row["profit"],
+            )
+        )
+        if updated.rowcount == 0:
+            db.execute(rollup_table.insert().values(**row))
+
+
+def add_sale_delta(deltas: dict, product_id, date, quantity, total_price, sign: int = 1):
+    entry = deltas.setdefault((product_id, _sale_day(date)), [0, 0, 0.0])
+    entry[0] += sign
+    entry[1] += sign * (quantity or 0)
+    entry[2] += sign * (total_price or 0.0)
+
+
+def record_sale(db: Session, sale, sign: int = 1):
+    deltas = {}
+    add_sale_delta(deltas, sale.product_id, sale.date, sale.quantity, sale.total_price, sign)
+    apply_deltas(db, deltas)
+
+
+def record_sales(db: Session, sales, sign: int = 1):
+    deltas = {}
+    for product_id, date, quantity, total_price in sales:
+        add_sale_delta(deltas, product_id, date, quantity, total_price, sign)
+    apply_deltas(db, deltas)
+
+
+def rebuild_sales_rollup(db: Session):
+    """
+    Recalcula o rollup inteiro a partir de `sales` com um único INSERT ... SELECT.
+    Usado para popular bancos já existentes ou corrigir divergências.
+    """
+    sale = models.Sale.__table__
+    day = func.date(sale.c.date)
+    revenue = func.coalesce(func.sum(sale.c.total_price), 0.0)
+
+    db.execute(delete(rollup_table))
+    db.execute(
+        rollup_table.insert().from_select(
+            ["product_id", "day", "sale_count", "quantity", "revenue", "profit"],
+            select(
+                sale.c.product_id,
+                day,
+                func.count(sale.c.id),
+                func.coalesce(func.sum(sale.c.quantity), 0),
+                revenue,
+                revenue * PROFIT_MARGIN,
+            )
+            .where(sale.c.product_id.is_not(None), sale.c.date.is_not(None))
+            .group_by(sale.c.product_id, day),
+        )
+    )
+    db.commit()
+
+
+def ensure_sales_rollup(engine):
+    """
+    Popula o rollup em bancos que já tinham vendas quando a tabela foi criada
+    (ou em que ela ficou vazia). Com o rollup preenchido, não faz nada.
+    """
+    sale = models.Sale.__table__
+    with engine.connect() as connection:
+        has_rollup = connection.execute(select(exists().select_from(rollup_table))).scalar()
+        has_sales = connection.execute(
+            select(exists().where(sale.c.product_id.is_not(None), sale.c.date.is_not(None)))
+        ).scalar()
+    if has_rollup or not has_sales:
+        return
+    with Session(engine) as db:
+        rebuild_sales_rollup(db)
+
+
+if __name__ == "__main__":
+    from app.database import SessionLocal, create_tables
+
+    create_tables()
+    session = SessionLocal()
+    try:
+        rebuild_sales_rollup(session)
+        print("Rollup diário de vendas recalculado.")
+    finally:
+        session.close()
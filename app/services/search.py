@@ -0,0 +1,204 @@
+import logging
+
+from sqlalchemy import case, func, literal_column, select, table, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Query, Session
+
+from app.models import models
+
+# Pesos do bm25 (SQLite) por coluna indexada: nome > marca > descrição.
+SEARCH_COLUMNS = ("name", "brand", "description")
+BM25_WEIGHTS = (10.0, 5.0, 1.0)
+MIN_TERM_LENGTH = 3  # o tokenizer trigram não indexa termos menores
+
+_SQLITE_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        name, brand, description,
+        content='products', content_rowid='id', tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, name, brand, description)
+        VALUES (new.id, new.name, new.brand, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, brand, description)
+        VALUES ('delete', old.id, old.name, old.brand, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF name, brand, description ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, brand, description)
+        VALUES ('delete', old.id, old.name, old.brand, old.description);
+        INSERT INTO products_fts(rowid, name, brand, description)
+        VALUES (new.id, new.name, new.brand, new.description);
+    END
+    """,
+]
+
+_POSTGRES_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    CREATE INDEX IF NOT EXISTS ix_products_search_trgm ON products
+    USING gin ((coalesce(name, '') || ' ' || coalesce(brand, '') || ' ' || coalesce(description, '')) gin_trgm_ops)
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_products_name_trgm ON products USING gin (name gin_trgm_ops)",
+]
+
+# Backend detectado por engine: "fts5", "trigram" ou None (fallback com ILIKE).
+_backends = {}
+
+
+def ensure_search_index(engine):
+    """
+    Cria (se faltar) o índice de busca de produtos. No SQLite é uma tabela FTS5 com
+    tokenizer trigram mantida por triggers, o que cobre também os INSERTs em lote do
+    importador; no Postgres, índices GIN com pg_trgm. Idempotente.
+    """
+    dialect = engine.dialect.name
+    try:
+        with engine.begin() as connection:
+            if dialect == "sqlite":
+                exists = connection.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'")
+                ).first()
+                for statement in _SQLITE_DDL:
+                    connection.execute(text(statement))
+                if not exists:
+                    connection.execute(text("INSERT INTO products_fts(products_fts) VALUES ('rebuild')"))
+                backend = "fts5"
+            elif dialect == "postgresql":
+                for statement in _POSTGRES_DDL:
+                    connection.execute(text(statement))
+                backend = "trigram"
+            else:
+                backend = None
+    except DBAPIError as e:
+        logging.warning(f"Índice de busca indisponível, usando ILIKE: {e}")
+        backend = None
+
+    _backends[engine.url] = backend
+    return backend
+
+
+def rebuild_search_index(engine):
+    if engine.dialect.name == "sqlite":
+        with engine.begin() as connection:
+            connection.execute(text("INSERT INTO products_fts(products_fts) VALUES ('rebuild')"))
+
+
+def drop_search_index(engine):
+    """Remove o índice de busca (ex.: antes de uma carga em massa); `ensure_search_index` recria e reindexa."""
+    with engine.begin() as connection:
+        if engine.dialect.name == "sqlite":
+            for trigger in ("products_fts_ai", "products_fts_ad", "products_fts_au"):
+                connection.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+            connection.execute(text("DROP TABLE IF EXISTS products_fts"))
+        elif engine.dialect.name == "postgresql":
+            connection.execute(text("DROP INDEX IF EXISTS ix_products_search_trgm"))
+            connection.execute(text("DROP INDEX IF EXISTS ix_products_name_trgm"))
+    _backends.pop(engine.url, None)
+
+
+def search_backend(db: Session):
+    engine = db.get_bind()
+    engine = getattr(engine, "engine", engine)
+    if engine.url not in _backends:
+        backend = None
+        if engine.dialect.name == "sqlite":
+            found = db.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'")
+            ).first()
+            backend = "fts5" if found else None
+        elif engine.dialect.name == "postgresql":
+            found = db.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).first()
+            backend = "trigram" if found else None
+        _backends[engine.url] = backend
+    return _backends[engine.url]
+
+
+def _terms(term: str):
+    return [word for word in term.split() if word]
+
+
+def _fts_match(term: str) -> str:
+    # Cada palavra vira uma frase entre aspas (sem operadores do FTS5), todas obrigatórias.
+    return " AND ".join('"' + word.replace('"', '""') + '"' for word in _terms(term))
+
+
+def _indexable(term: str) -> bool:
+    words = _terms(term)
+    return bool(words) and all(len(word) >= MIN_TERM_LENGTH for word in words)
+
+
+def _search_text():
+    product = models.Product
+    return (
+        func.coalesce(product.name, "") + " " + func.coalesce(product.brand, "") + " "
+        + func.coalesce(product.description, "")
+    )
+
+
+def _fts_subquery(match: str):
+    return (
+        select(
+            literal_column("rowid").label("id"),
+            literal_column(f"bm25(products_fts, {', '.join(str(w) for w in BM25_WEIGHTS)})").label("rank"),
+        )
+        .select_from(table("products_fts"))
+        .where(text("products_fts MATCH :match").bindparams(match=match))
+        .subquery()
+    )
+
+
+def _fts_phrase(term: str, column: str) -> str:
+    # O termo inteiro como uma frase: no trigram, é a substring contígua, na mesma ordem.
+    return f'{column} : "' + term.replace('"', '""') + '"'
+
+
+def filter_by_name(db: Session, query: Query, term: str) -> Query:
+    """
+    Filtra `query` (de Product) por substring contígua no nome, como um
+    `ILIKE '%termo%'`. Com o FTS5, o índice pré-seleciona os candidatos pela frase
+    e o ILIKE confirma, então o resultado é o mesmo com ou sem índice.
+    """
+    substring = models.Product.name.ilike(f"%{term}%")
+    if search_backend(db) == "fts5" and len(term) >= MIN_TERM_LENGTH:
+        fts = _fts_subquery(_fts_phrase(term, "name"))
+        return query.filter(models.Product.id.in_(select(fts.c.id)), substring)
+    return query.filter(substring)
+
+
+def search_products(db: Session, query: Query, term: str) -> Query:
+    """
+    Busca por substring em nome, marca e descrição, com os resultados ordenados por
+    relevância. Nomes que começam com o termo vêm primeiro (busca por prefixo).
+    """
+    product = models.Product
+    prefix_first = case((product.name.ilike(f"{term}%"), 0), else_=1)
+    backend = search_backend(db)
+
+    if backend == "fts5" and _indexable(term):
+        fts = _fts_subquery(_fts_match(term))
+        return query.join(fts, fts.c.id == product.id).order_by(prefix_first, fts.c.rank, product.id)
+
+    words = _terms(term)
+    for word in words:
+        query = query.filter(_search_text().ilike(f"%{word}%"))
+
+    if backend == "trigram":
+        return query.order_by(prefix_first, func.similarity(_search_text(), term).desc(), product.id)
+    return query.order_by(prefix_first, product.name, product.id)
+
+
+if __name__ == "__main__":
+    from app.database import engine, create_tables
+
+    create_tables()
+    backend = ensure_search_index(engine)
+    rebuild_search_index(engine)
+    print(f"Índice de busca de produtos recriado (backend: {backend or 'ILIKE'}).")
@@ -1,34 +1,276 @@
-from passlib.context import CryptContext
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import logging
+import multiprocessing
 import os
+import threading
+import time
+import uuid
+from passlib.context import CryptContext
 from fastapi import HTTPException
+from sqlalchemy import delete, insert, select
+from sqlalchemy.exc import SQLAlchemyError
 from app.models import models
 from jose import JWTError, jwt
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+logger = logging.getLogger(__name__)
 
-def hash_password(password: str) -> str:
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+# 0 desliga o pool e faz o hash na thread atual.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+_hash_pool = None
+_hash_pool_lock = threading.Lock()
+
+def _local_hash(password: str) -> str:
     return pwd_context.hash(password)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    print(f"Verificando senha: {plain_password} contra hash: {hashed_password}")  
+def _local_verify(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+def _pool_context():
+    # Nunca 'fork': quando o pool nasce já existem threads (listener de logs, fila de
+    # e-mail, pools das engines), e um fork copiaria locks presos por elas. O
+    # 'forkserver' parte de um processo limpo, sem essas threads; 'spawn' fica para
+    # plataformas sem ele. Os dois reimportam o __main__ nos filhos, então scripts que
+    # usam o pool precisam da guarda `if __name__ == "__main__"`.
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+def get_hash_pool():
+    """
+    Pool de processos dedicado ao bcrypt, criado sob demanda. Processos separados
+    tiram o hash (CPU pura) das threads que atendem requisições.
+    """
+    global _hash_pool
+    if PASSWORD_HASH_WORKERS <= 0:
+        return None
+    with _hash_pool_lock:
+        if _hash_pool is None:
+            _hash_pool = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, mp_context=_pool_context())
+        return _hash_pool
+
+def start_hash_pool():
+    """Cria os processos no startup, para o primeiro login não pagar a partida do pool."""
+    pool = get_hash_pool()
+    if pool is not None:
+        pool.submit(len, "").result()
+
+def shutdown_hash_pool():
+    global _hash_pool
+    with _hash_pool_lock:
+        if _hash_pool is not None:
+            _hash_pool.shutdown(wait=True)
+            _hash_pool = None
+
+def hash_password(password: str) -> str:
+    pool = get_hash_pool()
+    if pool is None:
+        return _local_hash(password)
+    return pool.submit(_local_hash, password).result()
+
+def hash_passwords(passwords: list) -> list:
+    """Gera os hashes em paralelo, distribuindo os lotes entre os processos do pool."""
+    pool = get_hash_pool()
+    if pool is None or len(passwords) < 2:
+        return [_local_hash(password) for password in passwords]
+    chunksize = max(1, len(passwords) // (PASSWORD_HASH_WORKERS * 4))
+    return list(pool.map(_local_hash, passwords, chunksize=chunksize))
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    pool = get_hash_pool()
+    if pool is None:
+        return _local_verify(plain_password, hashed_password)
+    return pool.submit(_local_verify, plain_password, hashed_password).result()
+
+def measure_hash_latency(rounds: int = BCRYPT_ROUNDS, samples: int = 5) -> float:
+    """Latência média (ms) de um hash bcrypt com o custo informado, na thread atual."""
+    context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=rounds)
+    started = time.perf_counter()
+    for _ in range(samples):
+        context.hash("benchmark-password")
+    return (time.perf_counter() - started) * 1000 / samples
+
 
 SECRET_KEY = os.getenv("SECRET_KEY", "mysecretkey")
 ALGORITHM = "HS256"
+TOKEN_TTL_SECONDS = int(os.getenv("TOKEN_TTL_SECONDS", 3600))
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 4096))
+# Intervalo máximo para uma revogação feita em outro worker valer neste.
+TOKEN_REVOCATION_SYNC_INTERVAL = float(os.getenv("TOKEN_REVOCATION_SYNC_INTERVAL", 1))
+
+revocations_table = models.TokenRevocation.__table__
+
+
+class TokenCache:
+    """
+    Claims já verificados, por hash do token (LRU limitado), para não decodificar e
+    checar a assinatura a cada requisição. Guarda também as revogações: por token
+    (`jti`, até expirar) e por usuário (tokens emitidos antes de um instante, até o
+    último deles expirar). As revogações são gravadas em `token_revocations` e cada
+    processo relê as novas a cada `sync_interval` segundos, então logout e troca de
+    role valem em todos os workers.
+    """
+
+    def __init__(self, max_entries: int = TOKEN_CACHE_SIZE, sync_interval: float = TOKEN_REVOCATION_SYNC_INTERVAL,
+                 engine=None):
+        self.max_entries = max_entries
+        self.sync_interval = sync_interval
+        self._engine = engine
+        self._claims = OrderedDict()
+        self._revoked_tokens = {}
+        self._revoked_users = {}
+        self._last_revocation_id = 0
+        self._synced_at = None
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            from app.database import engine
+            self._engine = engine
+        return self._engine
+
+    def get(self, key: bytes):
+        with self._lock:
+            claims = self._claims.get(key)
+            if claims is not None:
+                self._claims.move_to_end(key)
+            return claims
+
+    def put(self, key: bytes, claims: dict):
+        with self._lock:
+            self._claims[key] = claims
+            self._claims.move_to_end(key)
+            while len(self._claims) > self.max_entries:
+                self._claims.popitem(last=False)
+
+    def discard(self, key: bytes):
+        with self._lock:
+            self._claims.pop(key, None)
+
+    def is_active(self, claims: dict) -> bool:
+        if claims["exp"] <= time.time():
+            return False
+        self.sync()
+        with self._lock:
+            if claims.get("jti") in self._revoked_tokens:
+                return False
+            revoked = self._revoked_users.get(claims.get("user_id"))
+        return revoked is None or claims.get("iat", 0) > revoked[0]
+
+    def _apply(self, jti, user_id, revoked_at: float, expires_at: float):
+        if jti is not None:
+            self._revoked_tokens[jti] = expires_at
+        if user_id is not None:
+            current = self._revoked_users.get(user_id)
+            if current is None or revoked_at > current[0]:
+                self._revoked_users[user_id] = (revoked_at, expires_at)
+
+    def _prune(self, now: float):
+        self._revoked_tokens = {jti: exp for jti, exp in self._revoked_tokens.items() if exp > now}
+        self._revoked_users = {
+            user_id: revoked for user_id, revoked in self._revoked_users.items() if revoked[1] > now
+        }
+
+    def sync(self, force: bool = False):
+        """Traz as revogações gravadas por outros processos desde a última leitura."""
+        now = time.monotonic()
+        if not force and self._synced_at is not None and now - self._synced_at < self.sync_interval:
+            return
+        # Uma thread sincroniza; as outras seguem com o estado atual.
+        if not self._sync_lock.acquire(blocking=force):
+            return
+        try:
+            with self.engine.connect() as connection:
+                rows = connection.execute(
+                    select(revocations_table).where(revocations_table.c.id > self._last_revocation_id)
+                    .order_by(revocations_table.c.id)
+                ).all()
+            with self._lock:
+                for row in rows:
+                    self._apply(row.jti, row.user_id, row.revoked_at, row.expires_at)
+                    self._last_revocation_id = row.id
+                self._prune(time.time())
+            self._synced_at = now
+        except SQLAlchemyError as e:
+            logger.warning("Falha ao sincronizar revogações de token: %s", e)
+        finally:
+            self._sync_lock.release()
+
+    def _record(self, jti, user_id, expires_at: float):
+        now = time.time()
+        with self._lock:
+            self._apply(jti, user_id, now, expires_at)
+            self._prune(now)
+        with self.engine.begin() as connection:
+            connection.execute(delete(revocations_table).where(revocations_table.c.expires_at <= now))
+            connection.execute(insert(revocations_table).values(
+                jti=jti, user_id=user_id, revoked_at=now, expires_at=expires_at
+            ))
+
+    def revoke_token(self, claims: dict):
+        self._record(claims.get("jti"), None, claims["exp"])
+
+    def revoke_user(self, user_id: int):
+        # Depois de TOKEN_TTL_SECONDS todos os tokens emitidos antes já expiraram.
+        self._record(None, user_id, time.time() + TOKEN_TTL_SECONDS)
+
+    def clear(self):
+        with self._lock:
+            self._claims.clear()
+            self._revoked_tokens.clear()
+            self._revoked_users.clear()
+
+
+token_cache = TokenCache()
+
+
+def _token_key(token: str) -> bytes:
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
 
 def create_session_token(user: models.User) -> str:
+    issued_at = time.time()
     payload = {
         "user_id": user.id,
         "email": user.email,
         "role": user.role.name,
-        "username": user.username 
+        "username": user.username,
+        "iat": issued_at,
+        "exp": int(issued_at) + TOKEN_TTL_SECONDS,
+        "jti": uuid.uuid4().hex
     }
     return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
 
 def verify_session_token(token: str) -> dict:
-    try:
-        data = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-    except JWTError:
+    key = _token_key(token)
+    data = token_cache.get(key)
+    if data is None:
+        try:
+            data = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM], options={"require_exp": True})
+        except JWTError:
+            raise HTTPException(status_code=401, detail="Token inválido ou expirado")
+        token_cache.put(key, data)
+    if not token_cache.is_active(data):
+        token_cache.discard(key)
         raise HTTPException(status_code=401, detail="Token inválido ou expirado")
     return data
+
+def revoke_session_token(token: str):
+    token_cache.revoke_token(verify_session_token(token))
+    token_cache.discard(_token_key(token))
+
+def revoke_user_tokens(user_id: int):
+    """Invalida todos os tokens já emitidos para o usuário (ex.: troca de role ou exclusão)."""
+    token_cache.revoke_user(user_id)
+
+
+if __name__ == "__main__":
+    # Planejamento de capacidade: python -m app.services.security
+    for rounds in range(10, 15):
+        latency = measure_hash_latency(rounds)
+        print(f"bcrypt rounds={rounds}: {latency:.1f} ms/hash, ~{1000 / latency * PASSWORD_HASH_WORKERS:.1f} hashes/s com {PASSWORD_HASH_WORKERS} processos")
@@ -0,0 +1,73 @@
+import logging
+import os
+import time
+
+from sqlalchemy import event
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 200))
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "true").lower() in ("1", "true", "yes")
+
+logger = logging.getLogger("app.slow_query")
+
+_EXPLAIN_PREFIX = {"sqlite": "EXPLAIN QUERY PLAN ", "postgresql": "EXPLAIN "}
+
+
+def redact(parameters, executemany: bool = False):
+    """Troca cada valor pelo nome do tipo: o log mostra a forma dos parâmetros, nunca o conteúdo."""
+    if executemany:
+        return f"<{len(parameters)} linhas>"
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+def query_plan(conn, statement: str, parameters):
+    """
+    Plano da consulta, num cursor separado da mesma conexão DBAPI, sem passar
+    pelos eventos do engine. Só para SELECTs (EXPLAIN não executa a consulta).
+    """
+    prefix = _EXPLAIN_PREFIX.get(conn.dialect.name)
+    if prefix is None or not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+        return None
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        return [" ".join(str(column) for column in row) for row in cursor.fetchall()]
+    except Exception as e:
+        return [f"plano indisponível: {e}"]
+    finally:
+        cursor.close()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # No ExecutionContext, e não na conexão: um statement que falha não passa pelo
+    # after_cursor_execute, e o início dele morre junto com o contexto.
+    if context is not None:
+        context._slow_query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_slow_query_started", None)
+    if started is None:
+        return
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if elapsed_ms < SLOW_QUERY_MS:
+        return
+    plan = query_plan(conn, statement, parameters) if SLOW_QUERY_EXPLAIN and not executemany else None
+    logger.warning(
+        "Consulta lenta (%.1f ms): %s | parâmetros: %s | plano: %s",
+        elapsed_ms,
+        " ".join(statement.split()),
+        redact(parameters, executemany),
+        plan,
+        extra={"duration_ms": round(elapsed_ms, 1), "statement": statement, "plan": plan},
+    )
+
+
+def instrument_slow_queries(engine):
+    """Registra statements acima de SLOW_QUERY_MS (engine síncrono ou `async_engine.sync_engine`)."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    return engine
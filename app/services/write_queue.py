@@ -0,0 +1,320 @@
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from fastapi import HTTPException
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.database import DATABASE_URL, configure_engine, engine_options, is_sqlite
+
+logger = logging.getLogger(__name__)
+
+# Só vale para SQLite; em bancos servidor as escritas continuam na sessão da requisição.
+WRITE_QUEUE_ENABLED = os.getenv("SQLITE_WRITE_QUEUE", "false").lower() in ("1", "true", "yes") and is_sqlite(DATABASE_URL)
+WRITE_QUEUE_MAX_BATCH = int(os.getenv("WRITE_QUEUE_MAX_BATCH", 64))
+WRITE_QUEUE_MAX_DELAY_MS = float(os.getenv("WRITE_QUEUE_MAX_DELAY_MS", 0))
+WRITE_QUEUE_MAXSIZE = int(os.getenv("WRITE_QUEUE_MAXSIZE", 10000))
+WRITE_QUEUE_TIMEOUT = float(os.getenv("WRITE_QUEUE_TIMEOUT", 30))
+WRITE_QUEUE_LOCK_RETRIES = int(os.getenv("WRITE_QUEUE_LOCK_RETRIES", 5))
+
+
+def _is_locked(error: OperationalError) -> bool:
+    message = str(error.orig).lower()
+    return "database is locked" in message or "database is busy" in message
+
+
+def create_writer_engine(url: str = DATABASE_URL):
+    """
+    Engine do writer. O pysqlite abre transações sozinho e só antes do primeiro DML,
+    o que quebra SAVEPOINT; aqui o driver fica em autocommit e o BEGIN é emitido
+    pelo SQLAlchemy como BEGIN IMMEDIATE, que pega o lock de escrita na abertura.
+    Assim o writer espera o lock pelo busy_timeout, em vez de falhar ao promover
+    uma transação de leitura para escrita (SQLITE_BUSY_SNAPSHOT, que não espera).
+    """
+    writer_engine = configure_engine(create_engine(url, **engine_options(url)), url)
+
+    @event.listens_for(writer_engine, "connect")
+    def _driver_autocommit(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(writer_engine, "begin")
+    def _begin_immediate(connection):
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+    return writer_engine
+
+
+class _UnitFailed(Exception):
+    pass
+
+
+class _WriteUnit:
+    __slots__ = ("function", "args", "kwargs", "future")
+
+    def __init__(self, function, args, kwargs):
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+
+
+class WriteQueue:
+    """
+    Writer único por processo para SQLite. As requisições enviam unidades de escrita
+    (funções `unit(session, *args)` que não fazem commit) e a thread do writer grava
+    várias numa mesma transação (group commit), com até `max_batch` unidades. Com
+    `max_delay` 0, o grupo é o que se acumulou na fila durante o commit anterior;
+    acima disso, o writer ainda espera até `max_delay` segundos por mais trabalho.
+    O erro de uma unidade volta só para quem a enviou: o grupo é refeito com um
+    SAVEPOINT por unidade e as demais seguem para o commit.
+
+    Com vários workers do uvicorn, cada processo tem o seu writer: o lock de escrita
+    do SQLite passa a ser disputado por um writer por processo, e não por cada thread
+    de requisição.
+    """
+
+    _STOP = object()
+
+    def __init__(self, max_batch: int = 64, max_delay: float = 0.0, maxsize: int = 10000,
+                 timeout: float = 30.0, lock_retries: int = 5, engine_factory=create_writer_engine):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.lock_retries = lock_retries
+        self.engine = None
+        self.groups = 0
+        self.units = 0
+        self.failed_units = 0
+        self.lock_retried = 0
+        self.largest_group = 0
+        self._engine_factory = engine_factory
+        self._session_factory = None
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        with self._lock:
+            if self.engine is None:
+                self.engine = self._engine_factory()
+                self._session_factory = sessionmaker(
+                    bind=self.engine, autoflush=False, expire_on_commit=False
+                )
+            if not self.running:
+                self._thread = threading.Thread(target=self._run, name="write-queue", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Grava o que já estava na fila e encerra a thread."""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None and thread.is_alive():
+            self._queue.put(self._STOP)
+            thread.join(timeout)
+
+    def _enqueue(self, function, args, kwargs) -> Future:
+        self.start()
+        unit = _WriteUnit(function, args, kwargs)
+        try:
+            self._queue.put(unit, timeout=self.timeout)
+        except queue.Full:
+            raise HTTPException(status_code=503, detail="Fila de escrita cheia; tente novamente")
+        return unit.future
+
+    @staticmethod
+    def _expire(future: Future):
+        """
+        Prazo esgotado: a unidade só é descartada se o writer ainda não a pegou. Se já
+        está num grupo, pode ser confirmada, então quem chamou espera o resultado em vez
+        de receber um erro que convida a repetir a escrita.
+        """
+        if future.cancel():
+            raise HTTPException(
+                status_code=503, detail="Tempo esgotado aguardando a fila de escrita; nada foi gravado"
+            )
+
+    def submit(self, function, *args, **kwargs):
+        """Envia a unidade e bloqueia até o commit do grupo; devolve o resultado ou relança o erro dela."""
+        future = self._enqueue(function, args, kwargs)
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            self._expire(future)
+            return future.result()
+
+    async def submit_async(self, function, *args, **kwargs):
+        """Versão para rotas assíncronas: aguarda o commit sem bloquear o event loop."""
+        future = await asyncio.to_thread(self._enqueue, function, args, kwargs)
+        waiter = asyncio.wrap_future(future)
+        done, _ = await asyncio.wait({waiter}, timeout=self.timeout)
+        if not done:
+            self._expire(future)
+        return await waiter
+
+    def status(self) -> dict:
+        return {
+            "enabled": True,
+            "running": self.running,
+            "queued": self._queue.qsize(),
+            "groups": self.groups,
+            "units": self.units,
+            "failed_units": self.failed_units,
+            "average_group_size": round(self.units / self.groups, 2) if self.groups else None,
+            "largest_group": self.largest_group,
+            "lock_retries": self.lock_retried,
+            "max_batch": self.max_batch,
+            "max_delay_ms": self.max_delay * 1000,
+        }
+
+    # Thread do writer ---------------------------------------------------------
+
+    def _collect(self, first) -> tuple:
+        """Junta ao primeiro item o que chegar até encher o grupo ou vencer o prazo."""
+        group = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(group) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is self._STOP:
+                return group, True
+            group.append(item)
+        return group, False
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is self._STOP:
+                return
+            group, stopping = self._collect(item)
+            group = [unit for unit in group if unit.future.set_running_or_notify_cancel()]
+            if group:
+                self._write_group(group)
+            if stopping:
+                return
+
+    def _write_group(self, group: list):
+        isolated = False
+        attempt = 0
+        while True:
+            try:
+                outcomes = self._commit_group(group, isolated)
+                break
+            except _UnitFailed:
+                # Caminho rápido falhou: refaz o grupo com um SAVEPOINT por unidade, isolando o erro.
+                isolated = True
+            except OperationalError as e:
+                if not _is_locked(e) or attempt >= self.lock_retries:
+                    self._fail(group, e)
+                    return
+                # Outro processo segurou o lock além do busy_timeout: o grupo inteiro tenta de novo.
+                self.lock_retried += 1
+                time.sleep(0.05 * (2 ** attempt))
+                attempt += 1
+            except Exception as e:
+                self._fail(group, e)
+                return
+
+        self.groups += 1
+        self.units += len(group)
+        self.largest_group = max(self.largest_group, len(group))
+        for unit, (result, error) in zip(group, outcomes):
+            if error is not None:
+                self.failed_units += 1
+                unit.future.set_exception(error)
+            else:
+                unit.future.set_result(result)
+
+    def _commit_group(self, group: list, isolated: bool) -> list:
+        """
+        Sem `isolated`, as unidades rodam direto na transação (sem SAVEPOINT/RELEASE
+        por unidade) e a primeira falha aborta a tentativa com `_UnitFailed`. Com
+        `isolated`, cada unidade tem seu SAVEPOINT e a falha fica só no resultado dela.
+        """
+        session: Session = self._session_factory()
+        try:
+            session.connection()
+            outcomes = []
+            for unit in group:
+                savepoint = session.begin_nested() if isolated else None
+                try:
+                    result = unit.function(session, *unit.args, **unit.kwargs)
+                    session.flush()
+                    if savepoint is not None:
+                        savepoint.commit()
+                    outcomes.append((result, None))
+                except Exception as e:
+                    if isinstance(e, OperationalError) and _is_locked(e):
+                        raise
+                    if savepoint is None:
+                        raise _UnitFailed() from e
+                    savepoint.rollback()
+                    outcomes.append((None, e))
+            session.commit()
+            return outcomes
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def _fail(self, group: list, error: Exception):
+        logger.error("Falha ao gravar grupo de %s escritas: %s", len(group), error)
+        self.failed_units += len(group)
+        for unit in group:
+            unit.future.set_exception(error)
+
+
+write_queue = WriteQueue(
+    max_batch=WRITE_QUEUE_MAX_BATCH,
+    max_delay=WRITE_QUEUE_MAX_DELAY_MS / 1000,
+    maxsize=WRITE_QUEUE_MAXSIZE,
+    timeout=WRITE_QUEUE_TIMEOUT,
+    lock_retries=WRITE_QUEUE_LOCK_RETRIES,
+)
+
+
+def run_write(db: Session, function, *args, **kwargs):
+    """
+    Executa `function(session, *args)` e confirma. Com `SQLITE_WRITE_QUEUE` ligado a
+    unidade vai para o writer e roda na sessão dele; senão roda em `db` com commit
+    próprio. A unidade não faz commit e só mexe no banco: na fila ela pode rodar
+    de novo (erro de outra unidade do grupo, lock). Efeitos pós-commit (cache,
+    snapshot) ficam com quem chama. Objetos ORM devolvidos saem da sessão do writer,
+    então relacionamentos lazy usados na resposta precisam ser carregados na unidade.
+    """
+    if WRITE_QUEUE_ENABLED:
+        return write_queue.submit(function, *args, **kwargs)
+    try:
+        result = function(db, *args, **kwargs)
+        db.commit()
+        return result
+    except Exception:
+        db.rollback()
+        raise
+
+
+async def run_write_async(db, function, *args, **kwargs):
+    """`run_write` para rotas assíncronas; sem a fila, roda via `AsyncSession.run_sync`."""
+    if WRITE_QUEUE_ENABLED:
+        return await write_queue.submit_async(function, *args, **kwargs)
+    return await db.run_sync(run_write, function, *args, **kwargs)
+
+
+def write_queue_status() -> dict:
+    if not WRITE_QUEUE_ENABLED:
+        return {"enabled": False}
+    return write_queue.status()
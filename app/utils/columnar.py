@@ -0,0 +1,151 @@
+import os
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import types as sqltypes
+from sqlalchemy.orm import Session
+
+from app.utils.streaming import ExportResponse, _plain_value, iter_row_batches
+
+# Cada lote lido do cursor vira um row group (Parquet) ou um record batch (Arrow).
+ROW_GROUP_SIZE = int(os.getenv("EXPORT_ROW_GROUP_SIZE", 65536))
+DEFAULT_COMPRESSION = os.getenv("EXPORT_COMPRESSION", "zstd")
+
+COLUMNAR_FORMATS = ("parquet", "arrow")
+COMPRESSIONS = {
+    "parquet": ("zstd", "snappy", "gzip", "lz4", "none"),
+    "arrow": ("zstd", "lz4", "none"),
+}
+MEDIA_TYPES = {
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+EXTENSIONS = {"parquet": "parquet", "arrow": "arrows"}
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise HTTPException(status_code=501, detail="Exportação colunar indisponível: pacote 'pyarrow' não instalado")
+    return pyarrow
+
+
+def _arrow_type(pa, column_type):
+    # Enum antes de String: o Enum do SQLAlchemy é subclasse de String.
+    if isinstance(column_type, sqltypes.Enum):
+        return pa.dictionary(pa.int32(), pa.string())
+    if isinstance(column_type, sqltypes.Boolean):
+        return pa.bool_()
+    if isinstance(column_type, sqltypes.Integer):
+        return pa.int64()
+    if isinstance(column_type, (sqltypes.Float, sqltypes.Numeric)):
+        return pa.float64()
+    if isinstance(column_type, sqltypes.DateTime):
+        return pa.timestamp("us")
+    if isinstance(column_type, sqltypes.Date):
+        return pa.date32()
+    if isinstance(column_type, sqltypes.String):
+        return pa.string()
+    return None
+
+
+def arrow_schema(statement):
+    """Schema Arrow a partir dos tipos das colunas do SELECT (não depende dos dados)."""
+    pa = _pyarrow()
+    fields = []
+    for column in statement.selected_columns:
+        arrow_type = _arrow_type(pa, column.type)
+        if arrow_type is None:
+            raise ValueError(f"Tipo sem mapeamento para Arrow na coluna '{column.key}': {column.type}")
+        fields.append(pa.field(column.key, arrow_type))
+    return pa.schema(fields)
+
+
+def _record_batch(pa, schema, rows):
+    columns = list(zip(*rows)) if rows else [[] for _ in schema]
+    arrays = []
+    for field, values in zip(schema, columns):
+        if pa.types.is_dictionary(field.type):
+            arrays.append(pa.array([_plain_value(value) for value in values], type=pa.string()).dictionary_encode())
+        else:
+            arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+class _ChunkSink:
+    """
+    Destino de escrita que guarda só os bytes ainda não enviados, mas reporta a
+    posição absoluta em `tell()`, que o writer de Parquet usa nos offsets do rodapé.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self):
+        return True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_columnar(db: Session, statement, format: str, compression: str, batch_size: int = ROW_GROUP_SIZE):
+    pa = _pyarrow()
+    schema = arrow_schema(statement)
+    sink = _ChunkSink()
+    codec = None if compression == "none" else compression
+
+    if format == "parquet":
+        writer = pa.parquet.ParquetWriter(sink, schema, compression=codec or "none")
+    else:
+        writer = pa.ipc.new_stream(sink, schema, options=pa.ipc.IpcWriteOptions(compression=codec))
+
+    batches = iter_row_batches(db, statement, batch_size)
+    try:
+        next(batches)
+        for rows in batches:
+            batch = _record_batch(pa, schema, rows)
+            if format == "parquet":
+                writer.write_batch(batch, row_group_size=len(rows))
+            else:
+                writer.write_batch(batch)
+            yield sink.drain()
+    finally:
+        batches.close()
+        writer.close()
+    yield sink.drain()
+
+
+def columnar_response(db: Session, statement, name: str, format: str, compression: str = None) -> StreamingResponse:
+    compression = compression or DEFAULT_COMPRESSION
+    if compression not in COMPRESSIONS[format]:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Compressão '{compression}' não suportada em {format}; use: {', '.join(COMPRESSIONS[format])}"
+        )
+    _pyarrow()
+    return ExportResponse(
+        stream_columnar(db, statement, format, compression),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f"attachment; filename={name}.{EXTENSIONS[format]}"}
+    )
@@ -0,0 +1,13 @@
+def normalize_name(name):
+    """
+    Chave de unicidade dos nomes de produtos e categorias: sem espaços nas pontas,
+    espaços internos colapsados e casefold ("  Smart  TV " e "smart tv" colidem).
+    """
+    if name is None:
+        return None
+    return " ".join(str(name).split()).casefold()
+
+
+def normalized_name_default(context):
+    # Default de coluna: preenche normalized_name em qualquer INSERT (ORM ou Core) que traga `name`.
+    return normalize_name(context.get_current_parameters().get("name"))
@@ -1,11 +1,153 @@
+import base64
+import json
+import threading
+import time
+from datetime import datetime
+from enum import Enum
+from typing import Any, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
 from sqlalchemy.orm import Query
-import logging
 
-def paginate(query: Query, skip: int = 0, limit: int = 10):
-    logging.info(f"Paginate called with skip: {skip}, limit: {limit}")
-    total_query = query.order_by(None).with_entities(query.column_descriptions[0]['entity'].id)
-    total = total_query.distinct().count()
-    logging.info(f"Total distinct products: {total}")
+COUNT_MODES = ["exact", "cached", "none"]
+COUNT_CACHE_TTL = 30
+COUNT_CACHE_MAX_ENTRIES = 256
+
+_count_cache = {}
+_count_cache_lock = threading.Lock()
+
+
+def _count_cache_key(query: Query):
+    compiled = query.statement.compile()
+    params = tuple(sorted((k, repr(v)) for k, v in compiled.params.items()))
+    return str(compiled), params
+
+
+def count_query(query: Query, count: str = "exact") -> Optional[int]:
+    if count == "none":
+        return None
+
+    total_query = query.order_by(None).with_entities(query.column_descriptions[0]['entity'].id).distinct()
+
+    if count != "cached":
+        return total_query.count()
+
+    key = _count_cache_key(total_query)
+    now = time.monotonic()
+    with _count_cache_lock:
+        cached = _count_cache.get(key)
+        if cached and cached[1] > now:
+            return cached[0]
+
+    total = total_query.count()
+
+    with _count_cache_lock:
+        if len(_count_cache) >= COUNT_CACHE_MAX_ENTRIES:
+            _count_cache.pop(next(iter(_count_cache)))
+        _count_cache[key] = (total, now + COUNT_CACHE_TTL)
+    return total
+
+
+def paginate(query: Query, skip: int = 0, limit: int = 10, count: str = "exact"):
+    total = count_query(query, count)
     items = query.offset(skip).limit(limit).all()
-    logging.info(f"Products returned: {len(items)}")
     return items, total
+
+
+def _encode_value(value: Any):
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, Enum):
+        return value.name
+    return value
+
+
+def _decode_value(value: Any):
+    if isinstance(value, dict) and "dt" in value:
+        return datetime.fromisoformat(value["dt"])
+    return value
+
+
+def encode_cursor(sort_by: str, sort_order: str, value: Any, last_id: int) -> str:
+    payload = {"s": sort_by, "o": sort_order, "v": _encode_value(value), "id": last_id}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_by: str, sort_order: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        value, last_id = _decode_value(payload["v"]), int(payload["id"])
+        cursor_sort_by, cursor_sort_order = payload["s"], payload["o"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+    if cursor_sort_by != sort_by or cursor_sort_order != sort_order:
+        raise HTTPException(status_code=400, detail="Cursor não corresponde à ordenação solicitada")
+
+    return value, last_id
+
+
+def _keyset_filter(sort_column, id_column, descending: bool, value, last_id: int):
+    # Segue a ordenação nativa do SQLite (NULLs primeiro em ASC, por último em DESC),
+    # explicitada no ORDER BY para que outros bancos se comportem igual.
+    if sort_column is id_column:
+        return id_column < last_id if descending else id_column > last_id
+
+    if value is None:
+        if descending:
+            return and_(sort_column.is_(None), id_column < last_id)
+        return or_(sort_column.is_not(None), and_(sort_column.is_(None), id_column > last_id))
+
+    if descending:
+        return or_(
+            sort_column < value,
+            and_(sort_column == value, id_column < last_id),
+            sort_column.is_(None),
+        )
+    return or_(sort_column > value, and_(sort_column == value, id_column > last_id))
+
+
+def paginate_cursor(
+    query: Query,
+    sort_by: str,
+    sort_column,
+    id_column,
+    sort_order: str = "asc",
+    cursor: Optional[str] = None,
+    limit: int = 10,
+    count: str = "exact",
+):
+    """
+    Paginação por keyset: em vez de OFFSET, filtra a partir do último par
+    (chave de ordenação, id) retornado, mantendo o custo constante em páginas profundas.
+    Retorna (items, total, next_cursor).
+    """
+    descending = sort_order == "desc"
+
+    total = count_query(query, count)
+
+    if sort_column is id_column:
+        ordering = [id_column.desc() if descending else id_column.asc()]
+    elif descending:
+        ordering = [sort_column.desc().nulls_last(), id_column.desc()]
+    else:
+        ordering = [sort_column.asc().nulls_first(), id_column.asc()]
+
+    query = query.order_by(None).order_by(*ordering)
+
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort_by, sort_order)
+        query = query.filter(_keyset_filter(sort_column, id_column, descending, value, last_id))
+
+    rows = query.limit(limit + 1).all()
+    items = rows[:limit]
+
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        next_cursor = encode_cursor(sort_by, sort_order, getattr(last, sort_column.key), last.id)
+
+    return items, total, next_cursor
@@ -1,8 +1,25 @@
-from app.schemas.schemas import Sale
+import os
+
+from sqlalchemy import func
+
+from app.models import models
 from app.schemas import schemas
 
-def calculate_profit(sale):
-    profit = sale.total_price * 0.2  
+# Margem padrão, usada quando nem o produto nem a categoria definem `profit_margin`.
+PROFIT_MARGIN = float(os.getenv("DEFAULT_PROFIT_MARGIN", 0.2))
+
+def profit_from_revenue(total_price, margin: float = PROFIT_MARGIN):
+    return (total_price or 0.0) * margin
+
+def margin_expression():
+    """
+    Margem efetiva em SQL: a do produto, senão a da categoria, senão a padrão.
+    A consulta precisa ter `products` e um LEFT JOIN com `categories`.
+    """
+    return func.coalesce(models.Product.profit_margin, models.Category.profit_margin, PROFIT_MARGIN)
+
+def calculate_profit(sale, margin: float = PROFIT_MARGIN):
+    profit = profit_from_revenue(sale.total_price, margin)
     sale_with_profit = schemas.SaleWithProfit(
         id=sale.id,
         product_id=sale.product_id,
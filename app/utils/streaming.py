@@ -0,0 +1,104 @@
+import csv
+import io
+import json
+import os
+from datetime import date, datetime
+from enum import Enum
+
+import anyio
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 5000))
+
+
+def _plain_value(value):
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+def _json_value(value):
+    value = _plain_value(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def iter_row_batches(db: Session, statement, batch_size: int = EXPORT_BATCH_SIZE):
+    """
+    Executa `statement` num cursor em lotes (linhas Core, sem instanciar objetos ORM)
+    e devolve primeiro as colunas e depois um lote por vez. Usa uma conexão própria,
+    já que o corpo da resposta é enviado depois que o handler retorna. Fechar o
+    gerador antes do fim fecha o cursor e devolve a conexão ao pool.
+    """
+    with db.get_bind().connect() as connection:
+        result = connection.execution_options(stream_results=True, yield_per=batch_size).execute(statement)
+        try:
+            yield list(result.keys())
+            for rows in result.partitions():
+                yield rows
+        finally:
+            result.close()
+
+
+class ExportResponse(StreamingResponse):
+    """
+    StreamingResponse que fecha o gerador do corpo ao terminar, inclusive quando o
+    cliente desconecta no meio: o Starlette só para de iterar, e o cursor e a conexão
+    do `stream_results` ficariam abertos até o coletor de lixo passar.
+    """
+
+    def __init__(self, content, **kwargs):
+        super().__init__(content, **kwargs)
+        self._source = content
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            with anyio.CancelScope(shield=True):
+                await anyio.to_thread.run_sync(self._source.close)
+
+
+def stream_csv(db: Session, statement, batch_size: int = EXPORT_BATCH_SIZE):
+    stream = io.StringIO()
+    writer = csv.writer(stream)
+
+    batches = iter_row_batches(db, statement, batch_size)
+    try:
+        writer.writerow(next(batches))
+        yield stream.getvalue()
+
+        for rows in batches:
+            stream.seek(0)
+            stream.truncate()
+            writer.writerows([_plain_value(value) for value in row] for row in rows)
+            yield stream.getvalue()
+    finally:
+        batches.close()
+
+
+def stream_ndjson(db: Session, statement, batch_size: int = EXPORT_BATCH_SIZE):
+    batches = iter_row_batches(db, statement, batch_size)
+    try:
+        keys = next(batches)
+        for rows in batches:
+            yield "".join(
+                json.dumps({key: _json_value(value) for key, value in zip(keys, row)}) + "\n"
+                for row in rows
+            )
+    finally:
+        batches.close()
+
+
+def csv_response(db: Session, statement, filename: str) -> StreamingResponse:
+    return ExportResponse(
+        stream_csv(db, statement),
+        media_type="text/csv",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+
+def ndjson_response(db: Session, statement) -> StreamingResponse:
+    return ExportResponse(stream_ndjson(db, statement), media_type="application/x-ndjson")
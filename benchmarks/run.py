@@ -0,0 +1,347 @@
+"""
+Benchmark dos endpoints da API.
+
+Executa cada cenário em processo (TestClient, com contagem de SQL) ou contra um
+servidor HTTP já em execução, e grava um JSON com p50/p95/p99, vazão, SQL por
+requisição e pico de RSS, para comparar execuções.
+
+    python -m benchmarks.run --generate --products 2000 --sales 100000 --output base.json
+    python -m benchmarks.run --url http://localhost:8000 --server-pid 1234 --output http.json
+    python -m benchmarks.run --generate --compare base.json
+"""
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+from benchmarks import synthetic_data
+
+UPLOAD_ROWS = 200
+BATCH_ROWS = 2000
+
+
+class Scenario:
+    def __init__(self, name: str, method: str, path: str, params=None, body=None, files=None, writes: bool = False):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.params = params or {}
+        self.body = body
+        self.files = files
+        self.writes = writes
+
+    def request(self, client, iteration: int):
+        path = self.path(iteration) if callable(self.path) else self.path
+        params = self.params(iteration) if callable(self.params) else self.params
+        kwargs = {"params": params}
+        if self.body is not None:
+            kwargs["json"] = self.body
+        if self.files is not None:
+            kwargs["files"] = self.files(iteration)
+        return client.request(self.method, path, **kwargs)
+
+
+def _sales_batch(products: int):
+    date = datetime(2024, 1, 1).isoformat()
+    return [
+        {"product_id": i % max(products, 1) + 1, "quantity": 1 + i % 5, "total_price": 10.0 + i % 90, "date": date}
+        for i in range(BATCH_ROWS)
+    ]
+
+
+def _products_csv(iteration: int):
+    rows = "".join(
+        f"Bench Upload {iteration}-{i},Produto de upload,{10 + i % 90}.90,1,Bench\n" for i in range(UPLOAD_ROWS)
+    )
+    body = "name,description,price,category_id,brand\n" + rows
+    return {"file": ("products.csv", io.BytesIO(body.encode()), "text/csv")}
+
+
+def scenarios(products: int) -> list:
+    def product_id(iteration: int) -> int:
+        return iteration * 7919 % max(products, 1) + 1
+
+    return [
+        Scenario("products_list", "GET", "/products", lambda i: {"skip": i % 50 * 20, "limit": 20}),
+        Scenario("products_cursor", "GET", "/products", {"pagination": "cursor", "limit": 50, "count": "none"}),
+        Scenario("products_title_filter", "GET", "/products", {"title": "Modelo 1", "limit": 20}),
+        Scenario("products_search", "GET", "/products/search", {"q": "Samsung", "limit": 20}),
+        Scenario("categories_list", "GET", "/categories", {"limit": 50}),
+        Scenario("sales_list", "GET", "/sales", lambda i: {"skip": i % 50 * 20, "limit": 20, "sort_by": "date"}),
+        Scenario("sales_by_product", "GET", "/sales", lambda i: {"product_id": product_id(i), "limit": 20}),
+        Scenario("profit_total_summary", "GET", "/sales/profit/total", {"days": 365, "detail": "none"}),
+        Scenario("profit_total_full", "GET", "/sales/profit/total", {"days": 30, "detail": "all"}),
+        Scenario("profit_breakdown_category", "GET", "/sales/profit/breakdown", {"group_by": "category"}),
+        Scenario("analytics_summary", "GET", "/sales/analytics/summary"),
+        Scenario("analytics_revenue_day", "GET", "/sales/analytics/revenue", {"group_by": "day"}),
+        Scenario("analytics_top_products", "GET", "/sales/analytics/top-products", {"limit": 20}),
+        Scenario("price_history", "GET", lambda i: f"/price-history/{product_id(i)}/raw", {"limit": 100}),
+        Scenario("export_products", "GET", "/export/products"),
+        Scenario("export_sales", "GET", "/export/sales"),
+        Scenario("export_categories", "GET", "/export/categories"),
+        Scenario("export_sales_with_profit", "GET", "/export/sales_with_profit"),
+        Scenario("export_users", "GET", "/export/users"),
+        Scenario("export_sales_parquet", "GET", "/export/sales", {"format": "parquet"}),
+        Scenario("export_sales_arrow", "GET", "/export/sales", {"format": "arrow"}),
+        Scenario("upload_products_csv", "POST", "/products/upload-csv", files=_products_csv, writes=True),
+        Scenario(
+            "sales_create", "POST", "/sales",
+            body={"product_id": 1, "quantity": 1, "total_price": 10.0, "date": datetime(2024, 1, 1).isoformat()},
+            writes=True,
+        ),
+        Scenario(
+            "sales_batch", "POST", "/sales/batch", {"results": "none"}, body=_sales_batch(products), writes=True
+        ),
+        Scenario(
+            "login", "POST", "/users/login",
+            body={"username": synthetic_data.BENCH_ADMIN, "password": synthetic_data.BENCH_PASSWORD},
+        ),
+    ]
+
+
+class StatementCounter:
+    """Conta os statements SQL executados pelos engines da aplicação (modo em processo)."""
+
+    def __init__(self, engines):
+        from sqlalchemy import event
+
+        self.count = 0
+        self._lock = threading.Lock()
+        for engine in engines:
+            event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args):
+        with self._lock:
+            self.count += 1
+
+
+class MetricsScraper:
+    """No modo HTTP, lê o total de statements SQL do `/metrics` do servidor."""
+
+    def __init__(self, client):
+        self.client = client
+
+    @property
+    def count(self):
+        response = self.client.get("/metrics")
+        if response.status_code != 200:
+            return None
+        return sum(
+            float(line.rsplit(" ", 1)[1])
+            for line in response.text.splitlines()
+            if line.startswith("db_statements_total{")
+        )
+
+
+def _peak_rss_kb(pid: int = None):
+    if pid:
+        try:
+            with open(f"/proc/{pid}/status") as status:
+                for line in status:
+                    if line.startswith("VmHWM:"):
+                        return int(line.split()[1])
+        except OSError:
+            return None
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def _percentiles(latencies: list) -> dict:
+    values = np.array(latencies) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "mean_ms": round(float(values.mean()), 3),
+        "max_ms": round(float(values.max()), 3),
+    }
+
+
+def run_scenario(client, scenario: Scenario, iterations: int, warmup: int, concurrency: int, counter=None, server_pid=None):
+    def call(iteration: int):
+        started = time.perf_counter()
+        response = scenario.request(client, iteration)
+        size = len(response.content)
+        return time.perf_counter() - started, response.status_code, size
+
+    for iteration in range(warmup):
+        call(iteration)
+
+    statements_before = counter.count if counter else None
+    counter = counter if statements_before is not None else None
+    started = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            samples = list(pool.map(call, range(warmup, warmup + iterations)))
+    else:
+        samples = [call(iteration) for iteration in range(warmup, warmup + iterations)]
+    elapsed = time.perf_counter() - started
+
+    latencies = [latency for latency, _, _ in samples]
+    errors = sum(1 for _, status, _ in samples if status >= 400)
+    result = {
+        "name": scenario.name,
+        "method": scenario.method,
+        "iterations": iterations,
+        "concurrency": concurrency,
+        "errors": errors,
+        "throughput_rps": round(iterations / elapsed, 2) if elapsed else None,
+        **_percentiles(latencies),
+        "mean_response_bytes": int(np.mean([size for _, _, size in samples])),
+        "sql_statements_per_request": (
+            round((counter.count - statements_before) / iterations, 2) if counter else None
+        ),
+        "peak_rss_kb": _peak_rss_kb(server_pid),
+    }
+    if errors:
+        result["status_codes"] = sorted({status for _, status, _ in samples})
+    return result
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: dict, baseline: dict):
+    """Imprime a variação de p50/p95/vazão de cada cenário em relação a uma execução anterior."""
+    previous = {result["name"]: result for result in baseline["results"]}
+    print(f"{'cenário':32} {'p50 ms':>18} {'p95 ms':>18} {'req/s':>18}")
+    for result in current["results"]:
+        old = previous.get(result["name"])
+        if not old:
+            continue
+        cells = []
+        for key in ("p50_ms", "p95_ms", "throughput_rps"):
+            before, after = old[key], result[key]
+            change = f"{(after - before) / before * 100:+.0f}%" if before else "n/a"
+            cells.append(f"{after:>10} {change:>7}")
+        print(f"{result['name']:32} {' '.join(cells)}")
+
+
+def _in_process_client(args):
+    if not os.getenv("DATABASE_URL"):
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='smartmart-bench-'), 'bench.db')}"
+    os.environ.setdefault("RESPONSE_CACHE_ENABLED", "false")
+
+    from fastapi.testclient import TestClient
+
+    from app import database
+    from app.main import app
+
+    if args.generate:
+        database.create_tables()
+        session = database.SessionLocal()
+        try:
+            synthetic_data.load_database(synthetic_data.generate_from_args(args), session)
+        finally:
+            session.close()
+
+    engines = [database.engine] + ([database.async_engine.sync_engine] if database.async_engine else [])
+    return TestClient(app), StatementCounter(engines)
+
+
+def authenticate(client):
+    """Loga como o admin sintético e envia o token em todas as requisições seguintes."""
+    response = client.post(
+        "/users/login",
+        json={"username": synthetic_data.BENCH_ADMIN, "password": synthetic_data.BENCH_PASSWORD},
+    )
+    response.raise_for_status()
+    client.headers["Authorization"] = f"Bearer {response.json()['token']}"
+
+
+def main(argv=None):
+    parser = synthetic_data._parser()
+    parser.description = "Benchmark dos endpoints do SmartMart."
+    parser.add_argument("--generate", action="store_true", help="gera e carrega dados sintéticos antes de medir")
+    parser.add_argument("--url", help="mede um servidor HTTP em execução em vez do app em processo")
+    parser.add_argument("--server-pid", type=int, help="PID do servidor, para o pico de RSS no modo HTTP")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--only", nargs="*", help="nomes dos cenários a executar")
+    parser.add_argument("--skip-writes", action="store_true", help="pula cenários que gravam no banco")
+    parser.add_argument("--output", help="arquivo JSON de saída (padrão: stdout)")
+    parser.add_argument("--compare", help="JSON de uma execução anterior para comparar")
+    args = parser.parse_args(argv)
+
+    if args.url:
+        import httpx
+
+        client = httpx.Client(base_url=args.url, timeout=120)
+        counter = MetricsScraper(client)
+    else:
+        client, counter = _in_process_client(args)
+
+    selected = [
+        scenario for scenario in scenarios(args.products)
+        if (not args.only or scenario.name in args.only) and not (args.skip_writes and scenario.writes)
+    ]
+
+    results = []
+    with client:
+        authenticate(client)
+        for scenario in selected:
+            result = run_scenario(
+                client, scenario, args.iterations, args.warmup, args.concurrency, counter,
+                args.server_pid if args.url else None,
+            )
+            print(f"{result['name']:32} p50={result['p50_ms']}ms p95={result['p95_ms']}ms "
+                  f"{result['throughput_rps']} req/s", file=sys.stderr)
+            results.append(result)
+
+    report = {
+        "timestamp": datetime.utcnow().isoformat(),
+        "commit": _git_commit(),
+        "mode": "http" if args.url else "in-process",
+        "target": args.url or os.getenv("DATABASE_URL"),
+        "python": platform.python_version(),
+        "config": {
+            "iterations": args.iterations,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+            "generated": bool(args.generate),
+            "sizes": {
+                "categories": args.categories,
+                "products": args.products,
+                "users": args.users,
+                "sales": args.sales,
+                "price_changes": args.price_changes,
+            },
+        },
+        "peak_rss_kb": _peak_rss_kb(args.server_pid if args.url else None),
+        "results": results,
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as file:
+            compare(report, json.load(file))
+
+
+if __name__ == "__main__":
+    main()
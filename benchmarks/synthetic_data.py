@@ -0,0 +1,202 @@
+"""
+Gerador de dados sintéticos para benchmarks.
+
+Produz categorias, produtos, usuários, vendas e histórico de preços com
+distribuições reproduzíveis (mesma semente -> mesmos dados): popularidade de
+produtos e tamanho de categorias seguem uma lei de potência, preços são
+log-normais e as quantidades vendidas, geométricas.
+
+    python -m benchmarks.synthetic_data --products 5000 --sales 200000 --load
+    python -m benchmarks.synthetic_data --sales 50000 --csv-dir /tmp/smartmart-data
+"""
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+BENCH_ADMIN = "bench_admin"
+BENCH_PASSWORD = "bench-password"
+BRANDS = ["Samsung", "LG", "Sony", "Philips", "Brastemp", "Electrolux", "Consul", "Apple", "Motorola", "Xiaomi"]
+LOAD_CHUNK_SIZE = 10000
+
+
+def _power_law_weights(rng, size: int, exponent: float = 1.1):
+    weights = 1.0 / np.arange(1, size + 1) ** exponent
+    rng.shuffle(weights)
+    return weights / weights.sum()
+
+
+def generate(
+    seed: int = 42,
+    categories: int = 20,
+    products: int = 2000,
+    users: int = 100,
+    sales: int = 50000,
+    price_changes: int = 5000,
+    days: int = 730,
+    end_date: datetime = None,
+) -> dict:
+    """Gera os dados como DataFrames, com ids explícitos e colunas iguais às dos CSVs de `data/`."""
+    rng = np.random.default_rng(seed)
+    end_date = end_date or datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    start_date = end_date - timedelta(days=days)
+    window_seconds = days * 24 * 3600
+
+    category_ids = np.arange(1, categories + 1)
+    category_frame = pd.DataFrame({
+        "id": category_ids,
+        "name": [f"Categoria {i}" for i in category_ids],
+        "description": [f"Categoria sintética {i}" for i in category_ids],
+    })
+
+    product_ids = np.arange(1, products + 1)
+    brands = rng.choice(BRANDS, size=products)
+    prices = np.round(np.exp(rng.normal(5.5, 1.0, size=products)), 2)
+    product_frame = pd.DataFrame({
+        "id": product_ids,
+        "name": [f"{brand} Modelo {i}" for brand, i in zip(brands, product_ids)],
+        "description": [f"Produto sintético {i}" for i in product_ids],
+        "price": prices,
+        "category_id": rng.choice(category_ids, size=products, p=_power_law_weights(rng, categories, 0.8)),
+        "brand": brands,
+    })
+
+    user_ids = np.arange(1, users + 1)
+    usernames = [BENCH_ADMIN] + [f"user{i}" for i in user_ids[1:]]
+    roles = np.where(rng.random(users) < 0.05, "admin", "viewer")
+    roles[0] = "admin"
+    user_frame = pd.DataFrame({
+        "id": user_ids,
+        "email": [f"{username}@bench.smartmart.com" for username in usernames],
+        "username": usernames,
+        "password": BENCH_PASSWORD,
+        "role": roles,
+        "created_at": [
+            (start_date + timedelta(seconds=int(offset))).strftime("%Y-%m-%dT%H:%M:%S")
+            for offset in rng.integers(0, window_seconds, size=users)
+        ],
+    })
+
+    sold = rng.choice(product_ids, size=sales, p=_power_law_weights(rng, products))
+    quantities = rng.geometric(0.4, size=sales)
+    sale_dates = start_date + pd.to_timedelta(np.sort(rng.integers(0, window_seconds, size=sales)), unit="s")
+    sale_frame = pd.DataFrame({
+        "id": np.arange(1, sales + 1),
+        "product_id": sold,
+        "quantity": quantities,
+        "total_price": np.round(prices[sold - 1] * quantities, 2),
+        "date": sale_dates.strftime("%Y-%m-%d %H:%M:%S"),
+    })
+
+    changed = rng.choice(product_ids, size=price_changes)
+    change_dates = start_date + pd.to_timedelta(np.sort(rng.integers(0, window_seconds, size=price_changes)), unit="s")
+    history_frame = pd.DataFrame({
+        "id": np.arange(1, price_changes + 1),
+        "product_id": changed,
+        "price": np.round(prices[changed - 1] * rng.uniform(0.7, 1.1, size=price_changes), 2),
+        "date": change_dates.strftime("%Y-%m-%d %H:%M:%S"),
+        "reason": "Variação sintética",
+    })
+
+    return {
+        "categories": category_frame,
+        "products": product_frame,
+        "users": user_frame,
+        "sales": sale_frame,
+        "price_history": history_frame,
+    }
+
+
+def write_csv(data: dict, directory: str):
+    """Grava um CSV por tabela; os formatos são aceitos pelos endpoints de upload."""
+    os.makedirs(directory, exist_ok=True)
+    for name, frame in data.items():
+        frame.to_csv(os.path.join(directory, f"{name}.csv"), index=False)
+
+
+def _insert(db, table, frame: pd.DataFrame, chunk_size: int = LOAD_CHUNK_SIZE):
+    for start in range(0, len(frame), chunk_size):
+        records = frame.iloc[start:start + chunk_size].to_dict("records")
+        db.execute(table.insert(), records)
+        db.commit()
+
+
+def load_database(data: dict, db):
+    """
+    Grava os dados num banco vazio com INSERTs em lote e recalcula rollup e
+    contagens. Todos os usuários compartilham um único hash de BENCH_PASSWORD.
+    """
+    from app.models import models
+    from app.services.category_counter import rebuild_product_counts
+    from app.services.sales_rollup import rebuild_sales_rollup
+    from app.services.security import hash_password
+
+    users = data["users"].assign(
+        password=hash_password(BENCH_PASSWORD),
+        created_at=pd.to_datetime(data["users"]["created_at"]).dt.to_pydatetime(),
+    )
+    sales = data["sales"].assign(date=pd.to_datetime(data["sales"]["date"]).dt.to_pydatetime())
+    history = data["price_history"].assign(date=pd.to_datetime(data["price_history"]["date"]).dt.to_pydatetime())
+
+    _insert(db, models.Category.__table__, data["categories"])
+    _insert(db, models.Product.__table__, data["products"])
+    _insert(db, models.User.__table__, users)
+    _insert(db, models.Sale.__table__, sales)
+    _insert(db, models.PriceHistory.__table__, history)
+    rebuild_sales_rollup(db)
+    rebuild_product_counts(db)
+
+
+def _parser():
+    parser = argparse.ArgumentParser(description="Gera dados sintéticos reproduzíveis para o SmartMart.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--sales", type=int, default=50000)
+    parser.add_argument("--price-changes", type=int, default=5000)
+    parser.add_argument("--days", type=int, default=730, help="janela de datas das vendas, terminando em --end-date")
+    parser.add_argument("--end-date", type=datetime.fromisoformat, default=None)
+    parser.add_argument("--csv-dir", help="grava os CSVs neste diretório")
+    parser.add_argument("--load", action="store_true", help="grava no banco de DATABASE_URL (deve estar vazio)")
+    return parser
+
+
+def generate_from_args(args) -> dict:
+    return generate(
+        seed=args.seed,
+        categories=args.categories,
+        products=args.products,
+        users=args.users,
+        sales=args.sales,
+        price_changes=args.price_changes,
+        days=args.days,
+        end_date=args.end_date,
+    )
+
+
+if __name__ == "__main__":
+    args = _parser().parse_args()
+    started = time.perf_counter()
+    data = generate_from_args(args)
+    print(", ".join(f"{name}: {len(frame)}" for name, frame in data.items()))
+
+    if args.csv_dir:
+        write_csv(data, args.csv_dir)
+        print(f"CSVs gravados em {args.csv_dir}")
+
+    if args.load:
+        from app.database import SessionLocal, create_tables
+
+        create_tables()
+        session = SessionLocal()
+        try:
+            load_database(data, session)
+        finally:
+            session.close()
+        print("Dados gravados no banco.")
+
+    print(f"Concluído em {time.perf_counter() - started:.1f}s.")
@@ -1,58 +1,273 @@
+# populate_initial_data.py
+#
+# Carga inicial do banco a partir dos CSVs de `data/` (ou de um extrato maior):
+#
+#     python populate_initial_data.py [--data-dir data] [--chunk-size 20000] [--restart]
+#
+# Cada arquivo é gravado em blocos, com um INSERT em lote (executemany) por bloco.
+# O progresso de cada arquivo fica na tabela `bootstrap_checkpoints`, atualizada na
+# mesma transação do bloco: uma carga interrompida continua de onde parou, e rodar
+# de novo depois de concluída não faz nada. Os índices não únicos e o índice de
+# busca são removidos antes da carga e recriados no fim; o rollup de vendas e as
+# contagens de produtos por categoria são recalculados depois.
+
+import argparse
+import os
+import time
+from datetime import datetime
+
 import pandas as pd
-from app.database import SessionLocal, create_tables
+from sqlalchemy import Boolean, Column, DateTime, Integer, MetaData, String, Table, delete, func, select, text
+
+from app.database import Base, SessionLocal, create_tables, engine
 from app.models import models
-from app.services import security 
-
-create_tables()
-
-db_session = SessionLocal()
-
-# Categories
-categories = pd.read_csv("data/categories.csv")
-for _, row in categories.iterrows():
-    db_session.add(models.Category(
-        id=row["id"],
-        name=row["name"],
-        description=row["description"]
-    ))
-
-# Products
-products = pd.read_csv("data/products.csv")
-for _, row in products.iterrows():
-    db_session.add(models.Product(
-        id=row["id"],
-        name=row["name"],
-        description=row["description"],
-        price=row["price"],
-        category_id=row["category_id"],
-        brand=row["brand"]
-    ))
-
-# Sales
-sales = pd.read_csv("data/sales.csv")
-sales['date'] = pd.to_datetime(sales['date'])
-for _, row in sales.iterrows():
-    db_session.add(models.Sale(
-        product_id=row["product_id"],
-        quantity=row["quantity"],
-        total_price=row["total_price"],
-        date=row["date"]
-    ))
-
-# Users
-users = pd.read_csv("data/users.csv")
-users['created_at'] = pd.to_datetime(users['created_at'])
-for _, row in users.iterrows():
-    db_session.add(models.User(
-        id=row["id"],
-        email=row["email"],
-        username=row["username"],
-        password=security.hash_password(row["password"]), 
-        role=row["role"],
-        created_at=row["created_at"]
-    ))
-
-db_session.commit()
-db_session.close()
-
-print("✅ Dados populados com sucesso.")
+from app.services import security
+from app.services.category_counter import rebuild_product_counts
+from app.services.sales_rollup import rebuild_sales_rollup
+from app.services.search import drop_search_index
+from app.utils.names import normalize_name
+
+CHUNK_SIZE = int(os.getenv("BOOTSTRAP_CHUNK_SIZE", 20000))
+
+checkpoints = Table(
+    "bootstrap_checkpoints", MetaData(),
+    Column("file", String, primary_key=True),
+    Column("size", Integer, nullable=False),
+    Column("rows_loaded", Integer, nullable=False, default=0),
+    Column("completed", Boolean, nullable=False, default=False),
+    Column("updated_at", DateTime),
+)
+
+
+def _present(chunk: pd.DataFrame, table, extra=()) -> pd.DataFrame:
+    columns = [column for column in chunk.columns if column in table.c and column not in extra]
+    return chunk[columns].copy()
+
+
+def _text(series: pd.Series) -> pd.Series:
+    values = series.astype("string").str.strip()
+    return values.mask(values == "")
+
+
+def _datetimes(series: pd.Series) -> pd.Series:
+    return pd.to_datetime(series, format="ISO8601")
+
+
+def _categories(chunk: pd.DataFrame) -> pd.DataFrame:
+    frame = _present(chunk, models.Category.__table__, extra=("product_count", "normalized_name"))
+    frame["name"] = _text(frame["name"])
+    frame["normalized_name"] = frame["name"].map(normalize_name, na_action="ignore")
+    return frame
+
+
+def _products(chunk: pd.DataFrame) -> pd.DataFrame:
+    frame = _present(chunk, models.Product.__table__, extra=("normalized_name",))
+    frame["name"] = _text(frame["name"])
+    frame["normalized_name"] = frame["name"].map(normalize_name, na_action="ignore")
+    if "category_id" in frame:
+        frame["category_id"] = pd.to_numeric(frame["category_id"]).astype("Int64")
+    return frame
+
+
+def _users(chunk: pd.DataFrame) -> pd.DataFrame:
+    frame = _present(chunk, models.User.__table__)
+    frame["email"] = _text(frame["email"]).str.lower()
+    if "created_at" in frame:
+        frame["created_at"] = _datetimes(frame["created_at"])
+    # Extratos de produção já trazem hashes; só as senhas em texto puro passam pelo bcrypt,
+    # em paralelo no pool de processos.
+    passwords = frame["password"].astype(str).tolist()
+    plain = [index for index, password in enumerate(passwords) if not security.pwd_context.identify(password)]
+    for index, hashed in zip(plain, security.hash_passwords([passwords[index] for index in plain])):
+        passwords[index] = hashed
+    frame["password"] = passwords
+    return frame
+
+
+def _sales(chunk: pd.DataFrame) -> pd.DataFrame:
+    frame = _present(chunk, models.Sale.__table__)
+    frame["date"] = _datetimes(frame["date"])
+    return frame
+
+
+# Ordem de carga respeita as FKs: categorias -> produtos -> usuários -> vendas.
+TABLES = (
+    ("categories.csv", models.Category.__table__, _categories),
+    ("products.csv", models.Product.__table__, _products),
+    ("users.csv", models.User.__table__, _users),
+    ("sales.csv", models.Sale.__table__, _sales),
+)
+
+
+def _records(frame: pd.DataFrame) -> list:
+    columns = []
+    for column in frame.columns:
+        values = frame[column]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            # `list`: no pandas 3 `to_pydatetime` devolve uma Series com índice próprio, que não alinharia.
+            values = pd.Series(list(values.dt.to_pydatetime()), index=frame.index, dtype=object)
+        columns.append(values.astype(object).where(values.notna(), None).tolist())
+    names = frame.columns.tolist()
+    return [dict(zip(names, row)) for row in zip(*columns)]
+
+
+def _count_rows(path: str) -> int:
+    # Estimativa para o progresso: conta quebras de linha (campos com quebra entre aspas contam a mais).
+    lines, last = 0, b"\n"
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            lines += block.count(b"\n")
+            last = block[-1:]
+    if last != b"\n":
+        lines += 1
+    return max(lines - 1, 0)
+
+
+def _plan(data_dir: str, progress) -> list:
+    """Arquivos a carregar, com a linha de onde cada um continua."""
+    plan = []
+    with engine.connect() as connection:
+        for filename, table, convert in TABLES:
+            path = os.path.join(data_dir, filename)
+            if not os.path.exists(path):
+                progress(f"{filename}: não encontrado, pulando.")
+                continue
+            size = os.path.getsize(path)
+            checkpoint = connection.execute(select(checkpoints).where(checkpoints.c.file == filename)).first()
+            if checkpoint is None:
+                if connection.execute(select(func.count()).select_from(table)).scalar():
+                    progress(f"{filename}: tabela {table.name} já contém dados fora desta carga, pulando (use --restart para recarregar).")
+                    continue
+                start = 0
+            elif checkpoint.completed:
+                continue
+            elif checkpoint.size != size:
+                raise SystemExit(
+                    f"{filename} mudou desde a carga interrompida ({checkpoint.size} -> {size} bytes); use --restart."
+                )
+            else:
+                start = checkpoint.rows_loaded
+            plan.append((filename, path, size, table, convert, start))
+    return plan
+
+
+def _restart():
+    with engine.begin() as connection:
+        connection.execute(delete(checkpoints))
+        for table in (models.PriceHistory.__table__, models.SalesDailyRollup.__table__) + tuple(
+            table for _, table, _ in reversed(TABLES)
+        ):
+            connection.execute(delete(table))
+
+
+def _drop_secondary_indexes(tables):
+    # Índices mantidos linha a linha custam mais que recriá-los uma vez no fim (create_tables).
+    # Os únicos ficam: são eles que barram nomes e e-mails duplicados durante a carga.
+    for table in tables:
+        for index in table.indexes:
+            if not index.unique:
+                index.drop(bind=engine, checkfirst=True)
+    drop_search_index(engine)
+
+
+def _reset_sequences(tables):
+    # Postgres: as linhas vêm com id explícito, então as sequences precisam avançar.
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as connection:
+        for table in tables:
+            connection.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                f"COALESCE((SELECT MAX(id) FROM {table.name}), 0) + 1, false)"
+            ))
+
+
+def _load_file(filename, path, size, table, convert, start, chunk_size, progress) -> int:
+    total = _count_rows(path)
+    loaded = start
+    started = time.perf_counter()
+    if start:
+        progress(f"{filename}: retomando do registro {start + 1} de {total}.")
+
+    # O checkpoint conta registros, não linhas físicas (um campo entre aspas pode ter
+    # quebras de linha): na retomada, os `start` primeiros registros são lidos e descartados.
+    skip = start
+    for chunk in pd.read_csv(path, chunksize=chunk_size):
+        if skip:
+            if len(chunk) <= skip:
+                skip -= len(chunk)
+                continue
+            chunk, skip = chunk.iloc[skip:], 0
+        records = _records(convert(chunk))
+        loaded += len(records)
+        with engine.begin() as connection:
+            connection.execute(table.insert(), records)
+            connection.execute(
+                checkpoints.update().where(checkpoints.c.file == filename)
+                .values(rows_loaded=loaded, updated_at=datetime.utcnow())
+            )
+        elapsed = time.perf_counter() - started
+        rate = (loaded - start) / elapsed if elapsed else 0
+        eta = (total - loaded) / rate if rate else 0
+        total = max(total, loaded)
+        progress(f"{filename}: {loaded}/{total} linhas ({loaded / max(total, 1):.0%}), {rate:,.0f} linhas/s, faltam ~{eta:.0f}s")
+
+    with engine.begin() as connection:
+        connection.execute(
+            checkpoints.update().where(checkpoints.c.file == filename)
+            .values(completed=True, updated_at=datetime.utcnow())
+        )
+    elapsed = time.perf_counter() - started
+    progress(f"{filename}: {loaded - start} linhas em {elapsed:.1f}s ({(loaded - start) / elapsed if elapsed else 0:,.0f} linhas/s).")
+    return loaded - start
+
+
+def populate(data_dir: str = "data", chunk_size: int = CHUNK_SIZE, restart: bool = False, progress=print) -> dict:
+    Base.metadata.create_all(bind=engine)
+    checkpoints.create(bind=engine, checkfirst=True)
+    if restart:
+        _restart()
+
+    plan = _plan(data_dir, progress)
+    if not plan:
+        create_tables()
+        progress("Nada a carregar.")
+        return {}
+
+    with engine.begin() as connection:
+        for filename, _, size, _, _, start in plan:
+            if not start:
+                connection.execute(delete(checkpoints).where(checkpoints.c.file == filename))
+                connection.execute(checkpoints.insert().values(file=filename, size=size, rows_loaded=0))
+
+    _drop_secondary_indexes([table for _, table, _ in TABLES])
+    loaded = {}
+    for filename, path, size, table, convert, start in plan:
+        loaded[table.name] = _load_file(filename, path, size, table, convert, start, chunk_size, progress)
+
+    started = time.perf_counter()
+    create_tables()
+    _reset_sequences([table for _, table, _ in TABLES])
+    session = SessionLocal()
+    try:
+        rebuild_sales_rollup(session)
+        rebuild_product_counts(session)
+    finally:
+        session.close()
+    progress(f"Índices, busca, rollup e contagens recriados em {time.perf_counter() - started:.1f}s.")
+    return loaded
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Carga inicial do banco a partir de CSVs, retomável.")
+    parser.add_argument("--data-dir", default="data", help="diretório com categories.csv, products.csv, users.csv e sales.csv")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="linhas por bloco (uma transação por bloco)")
+    parser.add_argument("--restart", action="store_true", help="apaga os dados carregados e recomeça do zero")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    try:
+        populate(args.data_dir, args.chunk_size, args.restart)
+    finally:
+        security.shutdown_hash_pool()
+    print(f"✅ Dados populados com sucesso em {time.perf_counter() - started:.1f}s.")
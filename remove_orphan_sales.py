@@ -1,21 +1,135 @@
 # remove_orphan_sales.py
+#
+# Manutenção: apaga vendas, rollups e histórico de preços de produtos que não
+# existem mais. Com `PRAGMA foreign_keys` ligado o banco já faz isso via
+# ON DELETE CASCADE; este job cobre dados antigos ou gravados com as FKs desligadas.
+# Roda em lotes (uma transação por lote), fora do caminho das requisições.
+
+import argparse
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import delete, exists, select
 
 from app.database import SessionLocal
 from app.models import models
+from app.services import sales_analytics
+
+BATCH_SIZE = int(os.getenv("ORPHAN_CLEANUP_BATCH_SIZE", 5000))
+
+products_table = models.Product.__table__
+ORPHAN_TABLES = (
+    models.Sale.__table__,
+    models.SalesDailyRollup.__table__,
+    models.PriceHistory.__table__,
+)
+
 
-def remove_orphan_sales():
+def _orphan_ids(table, after_id: int, batch_size: int):
+    # Varre por id (keyset), então cada lote custa o mesmo, e usa a PK de products no NOT EXISTS.
+    return (
+        select(table.c.id)
+        .where(
+            table.c.id > after_id,
+            table.c.product_id.is_not(None),
+            ~exists().where(products_table.c.id == table.c.product_id),
+        )
+        .order_by(table.c.id)
+        .limit(batch_size)
+    )
+
+
+def remove_orphan_sales(batch_size: int = BATCH_SIZE, progress=None) -> dict:
+    """
+    Remove os registros órfãos em lotes de `batch_size` e devolve quantos saíram de
+    cada tabela. `progress(tabela, removidos)` é chamado após cada lote.
+    """
+    removed = {}
     db = SessionLocal()
     try:
-        valid_product_ids = set(pid for (pid,) in db.query(models.Product.id).all())
-        orphan_sales = db.query(models.Sale).filter(~models.Sale.product_id.in_(valid_product_ids)).all()
-        print(f"Encontradas {len(orphan_sales)} vendas órfãs.")
-        for sale in orphan_sales:
-            print(f"Removendo venda id={sale.id} (product_id={sale.product_id})")
-            db.delete(sale)
-        db.commit()
-        print("Vendas órfãs removidas com sucesso.")
+        for table in ORPHAN_TABLES:
+            removed[table.name] = 0
+            last_id = 0
+            while True:
+                ids = db.execute(_orphan_ids(table, last_id, batch_size)).scalars().all()
+                if not ids:
+                    break
+                db.execute(delete(table).where(table.c.id.in_(ids)))
+                if table is models.Sale.__table__:
+                    sales_analytics.record_changes(db, ids)
+                db.commit()
+                if table is models.Sale.__table__:
+                    sales_analytics.mark_changed(ids)
+                last_id = ids[-1]
+                removed[table.name] += len(ids)
+                if progress:
+                    progress(table.name, removed[table.name])
     finally:
         db.close()
+    return removed
+
+
+class OrphanCleanupJob:
+    """Executa `remove_orphan_sales` numa thread, uma execução por vez, com status consultável."""
+
+    def __init__(self, batch_size: int = BATCH_SIZE):
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._thread = None
+        self._status = {"state": "idle", "removed": {}, "started_at": None, "finished_at": None, "error": None}
+
+    def status(self) -> dict:
+        with self._lock:
+            return {**self._status, "removed": dict(self._status["removed"])}
+
+    def start(self) -> bool:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self._status = {
+                "state": "running", "removed": {}, "started_at": datetime.utcnow(), "finished_at": None, "error": None
+            }
+            self._thread = threading.Thread(target=self._run, name="orphan-cleanup", daemon=True)
+            self._thread.start()
+            return True
+
+    def join(self, timeout: float = None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _progress(self, table: str, count: int):
+        with self._lock:
+            self._status["removed"][table] = count
+        logging.info(f"Limpeza de órfãos: {count} registros removidos de {table}")
+
+    def _run(self):
+        try:
+            removed = remove_orphan_sales(self.batch_size, self._progress)
+            state, error = "finished", None
+        except Exception as e:
+            logging.error(f"Falha na limpeza de registros órfãos: {e}")
+            removed, state, error = None, "failed", str(e)
+        with self._lock:
+            if removed is not None:
+                self._status["removed"] = removed
+            self._status.update(state=state, finished_at=datetime.utcnow(), error=error)
+
+
+orphan_cleanup = OrphanCleanupJob()
+
 
 if __name__ == "__main__":
-    remove_orphan_sales()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Remove vendas, rollups e histórico de preços de produtos inexistentes.")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    removed = remove_orphan_sales(
+        args.batch_size, lambda table, count: print(f"{table}: {count} registros órfãos removidos...")
+    )
+    for table, count in removed.items():
+        print(f"{table}: {count} registros órfãos removidos no total.")
+    print(f"Concluído em {time.perf_counter() - started:.1f}s.")
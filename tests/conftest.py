@@ -0,0 +1,84 @@
+import os
+import tempfile
+
+# Banco e configurações dos testes, definidos antes de qualquer import de `app`.
+_DB_DIR = tempfile.mkdtemp(prefix="smartmart-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'test.db')}"
+os.environ["PASSWORD_HASH_WORKERS"] = "0"
+os.environ["BCRYPT_ROUNDS"] = "4"
+os.environ["AUTH_ENABLED"] = "false"
+os.environ["SQLITE_WRITE_QUEUE"] = "false"
+
+from datetime import datetime
+
+import pytest
+
+from app.database import Base, SessionLocal, create_tables, engine
+from app.models import models
+from app.services import sales_analytics
+from app.services.response_cache import response_cache
+from app.utils.names import normalize_name
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _schema():
+    create_tables()
+    yield
+    engine.dispose()
+
+
+@pytest.fixture
+def db():
+    with engine.begin() as connection:
+        for table in reversed(Base.metadata.sorted_tables):
+            connection.execute(table.delete())
+    response_cache.backend.clear()
+    sales_analytics.snapshot.invalidate()
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.close()
+
+
+@pytest.fixture
+def client(db):
+    from fastapi.testclient import TestClient
+    from app.main import app
+    return TestClient(app)
+
+
+@pytest.fixture
+def make_category(db):
+    def make(name: str, **fields) -> models.Category:
+        category = models.Category(name=name, normalized_name=normalize_name(name), **fields)
+        db.add(category)
+        db.commit()
+        return category
+    return make
+
+
+@pytest.fixture
+def make_product(db):
+    def make(name: str, price: float = 10.0, category: models.Category = None, **fields) -> models.Product:
+        product = models.Product(
+            name=name, normalized_name=normalize_name(name), price=price,
+            category_id=category.id if category else None, **fields
+        )
+        db.add(product)
+        if category is not None:
+            category.product_count += 1
+        db.commit()
+        return product
+    return make
+
+
+@pytest.fixture
+def make_sale(db):
+    def make(product: models.Product, quantity: int = 1, total_price: float = 10.0, date: datetime = None) -> models.Sale:
+        sale = models.Sale(product_id=product.id, quantity=quantity, total_price=total_price, date=date or datetime(2026, 1, 1))
+        db.add(sale)
+        db.commit()
+        return sale
+    return make
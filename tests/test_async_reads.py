@@ -0,0 +1,38 @@
+from datetime import datetime
+
+import pytest
+
+from app.database import async_url, get_async_db, get_db
+from app.models import models
+from app.routers import categories, price_history, products, sales
+
+
+def test_async_url_maps_the_driver():
+    assert async_url("sqlite:///./app.db") == "sqlite+aiosqlite:///./app.db"
+    assert async_url("postgresql+psycopg2://u:p@db/smartmart") == "postgresql+asyncpg://u:p@db/smartmart"
+    assert async_url("mysql://u:p@db/x") == "mysql://u:p@db/x"
+
+
+@pytest.mark.parametrize("router, path", [
+    (products.router, "/products"),
+    (sales.router, "/sales"),
+    (categories.router, "/categories"),
+    (price_history.router, "/price-history/{product_id}"),
+])
+def test_hot_reads_use_the_async_session(router, path):
+    route = next(route for route in router.routes if route.path == path and "GET" in route.methods)
+    calls = [dependency.call for dependency in route.dependant.dependencies]
+    assert get_async_db in calls and get_db not in calls
+
+
+def test_async_reads_see_committed_rows(client, db, make_category, make_product, make_sale):
+    category = make_category("Periféricos")
+    product = make_product("Teclado", category=category)
+    make_sale(product, quantity=2, total_price=20.0)
+    db.add(models.PriceHistory(product_id=product.id, price=9.0, date=datetime(2026, 1, 1)))
+    db.commit()
+
+    assert [item["name"] for item in client.get("/products").json()["items"]] == ["Teclado"]
+    assert [item["quantity"] for item in client.get("/sales").json()["items"]] == [2]
+    assert client.get("/categories").json()["total"] == 1
+    assert [entry["price"] for entry in client.get(f"/price-history/{product.id}").json()] == [9.0]
@@ -0,0 +1,107 @@
+import pytest
+
+from app.models import models
+from app.services import auth, security
+
+
+@pytest.fixture
+def auth_on(monkeypatch):
+    monkeypatch.setattr(auth, "AUTH_ENABLED", True)
+    security.token_cache.clear()
+    yield
+    security.token_cache.clear()
+
+
+def _user(db, username, role):
+    user = models.User(
+        email=f"{username}@example.com", username=username,
+        password=security.hash_password("senha123"), role=role
+    )
+    db.add(user)
+    db.commit()
+    return user
+
+
+def _bearer(user):
+    return {"Authorization": f"Bearer {security.create_session_token(user)}"}
+
+
+def test_requests_without_token_are_rejected(client, db, auth_on):
+    assert client.get("/products").status_code == 401
+    assert client.get("/products", headers={"Authorization": "Bearer lixo"}).status_code == 401
+
+
+def test_viewer_reads_but_cannot_write(client, db, auth_on):
+    headers = _bearer(_user(db, "leitor", models.RoleEnum.viewer))
+    assert client.get("/products", headers=headers).status_code == 200
+    assert client.post("/categories/", json={"name": "Nova"}, headers=headers).status_code == 403
+    assert client.get("/export/users", headers=headers).status_code == 403
+
+
+def test_admin_writes(client, db, auth_on):
+    headers = _bearer(_user(db, "chefe", models.RoleEnum.admin))
+    assert client.post("/categories/", json={"name": "Nova"}, headers=headers).status_code == 200
+
+
+def test_cached_responses_still_require_a_token(client, db, auth_on):
+    headers = _bearer(_user(db, "leitor", models.RoleEnum.viewer))
+    assert client.get("/categories", headers=headers).status_code == 200
+    assert client.get("/categories", headers=headers).status_code == 200
+    assert client.get("/categories").status_code == 401
+
+
+def test_claims_are_cached_by_token(db, monkeypatch, auth_on):
+    token = security.create_session_token(_user(db, "leitor", models.RoleEnum.viewer))
+    security.verify_session_token(token)
+    monkeypatch.setattr(security.jwt, "decode", lambda *args, **kwargs: pytest.fail("token decodificado de novo"))
+    assert security.verify_session_token(token)["username"] == "leitor"
+
+
+def test_login_cookie_and_logout_revokes_it(client, db, auth_on):
+    _user(db, "leitor", models.RoleEnum.viewer)
+    response = client.post("/users/login", json={"username": "leitor", "password": "senha123"})
+    assert response.status_code == 200
+    token = response.json()["token"]
+
+    assert client.get("/products").status_code == 200  # cookie session_token
+    assert client.post("/users/logout").status_code == 200
+    assert client.get("/products", headers={"Authorization": f"Bearer {token}"}).status_code == 401
+
+
+def test_role_change_revokes_earlier_tokens(client, db, auth_on):
+    viewer = _user(db, "leitor", models.RoleEnum.viewer)
+    headers = _bearer(viewer)
+    admin_headers = _bearer(_user(db, "chefe", models.RoleEnum.admin))
+    assert client.get("/products", headers=headers).status_code == 200
+
+    assert client.put(f"/users/{viewer.id}", json={"role": "admin"}, headers=admin_headers).status_code == 200
+    assert client.get("/products", headers=headers).status_code == 401
+
+
+def test_expired_token_is_rejected(db, monkeypatch, auth_on):
+    monkeypatch.setattr(security, "TOKEN_TTL_SECONDS", -1)
+    token = security.create_session_token(_user(db, "leitor", models.RoleEnum.viewer))
+    with pytest.raises(Exception) as error:
+        security.verify_session_token(token)
+    assert error.value.status_code == 401
+
+
+def test_revocations_reach_other_workers(db, auth_on):
+    viewer = _user(db, "leitor", models.RoleEnum.viewer)
+    token = security.create_session_token(viewer)
+    claims = security.verify_session_token(token)
+    other_worker = security.TokenCache(sync_interval=0)
+    assert other_worker.is_active(claims)
+
+    security.revoke_session_token(token)
+    assert not other_worker.is_active(claims)
+
+    fresh = security.verify_session_token(security.create_session_token(viewer))
+    security.revoke_user_tokens(viewer.id)
+    assert not other_worker.is_active(fresh)
+
+
+def test_metrics_require_admin(client, db, auth_on):
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers=_bearer(_user(db, "leitor", models.RoleEnum.viewer))).status_code == 403
+    assert client.get("/metrics", headers=_bearer(_user(db, "chefe", models.RoleEnum.admin))).status_code == 200
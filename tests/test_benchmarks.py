@@ -0,0 +1,52 @@
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy import func, select
+
+from app.models import models
+from benchmarks import synthetic_data
+from benchmarks.run import Scenario, _percentiles, run_scenario
+
+END = datetime(2026, 1, 1)
+SIZES = dict(categories=3, products=20, users=5, sales=200, price_changes=30, days=60, end_date=END)
+
+
+def test_generation_is_reproducible():
+    first, second = synthetic_data.generate(seed=7, **SIZES), synthetic_data.generate(seed=7, **SIZES)
+    for name, frame in first.items():
+        pd.testing.assert_frame_equal(frame, second[name])
+    assert not synthetic_data.generate(seed=8, **SIZES)["sales"].equals(first["sales"])
+
+
+def test_generated_rows_are_consistent():
+    data = synthetic_data.generate(seed=7, **SIZES)
+    sales, products = data["sales"], data["products"]
+    assert sales["product_id"].isin(products["id"]).all()
+    assert products["category_id"].isin(data["categories"]["id"]).all()
+    assert (sales["quantity"] >= 1).all()
+    dates = pd.to_datetime(sales["date"])
+    assert dates.is_monotonic_increasing and dates.min() >= pd.Timestamp("2025-11-02") and dates.max() < pd.Timestamp(END)
+    assert data["users"].loc[0, "username"] == synthetic_data.BENCH_ADMIN
+
+
+def test_load_database_rebuilds_rollup_and_counts(db):
+    data = synthetic_data.generate(seed=7, **SIZES)
+    synthetic_data.load_database(data, db)
+    assert db.scalar(select(func.count()).select_from(models.Sale)) == 200
+    assert db.scalar(select(func.sum(models.SalesDailyRollup.sale_count))) == 200
+    assert sorted(db.scalars(select(models.Category.product_count))) == sorted(
+        data["products"]["category_id"].value_counts().reindex(data["categories"]["id"], fill_value=0).tolist()
+    )
+
+
+def test_run_scenario_reports_latency_and_errors(client, make_product):
+    make_product("Teclado")
+    result = run_scenario(client, Scenario("products_list", "GET", "/products", {"limit": 5}), iterations=4, warmup=1, concurrency=2)
+    assert (result["iterations"], result["errors"]) == (4, 0)
+    assert result["p50_ms"] <= result["p99_ms"] <= result["max_ms"]
+    missing = run_scenario(client, Scenario("missing", "GET", "/price-history/999"), iterations=2, warmup=0, concurrency=1)
+    assert (missing["errors"], missing["status_codes"]) == (2, [404])
+
+
+def test_percentiles_are_in_milliseconds():
+    assert _percentiles([0.001, 0.002, 0.003])["p50_ms"] == 2.0
@@ -0,0 +1,79 @@
+import io
+
+from sqlalchemy import select
+
+from app.database import engine
+from app.models import models
+from app.services import catalog_names, csv_importer
+from app.utils.names import normalize_name
+
+
+class _Upload:
+    def __init__(self, text: str):
+        self.file = io.BytesIO(text.encode())
+
+
+def test_normalize_name():
+    assert normalize_name("  Smart   TV ") == normalize_name("smart tv") == "smart tv"
+    assert normalize_name("STRASSE") == normalize_name("straße")
+    assert normalize_name(None) is None
+
+
+def test_api_rejects_names_that_only_differ_in_case_or_spacing(client, db, make_product, make_category):
+    make_category("Bebidas")
+    product = make_product("Smart TV")
+    other = make_product("Monitor")
+
+    assert client.post("/categories/", json={"name": "  bebidas "}).status_code == 400
+    assert client.post("/products", json={"name": "smart  tv", "price": 1.0}).status_code == 400
+    assert client.put(f"/products/{other.id}", json={"name": "SMART TV"}).status_code == 400
+    assert client.put(f"/products/{product.id}", json={"name": "Smart  TV"}).status_code == 200
+    db.refresh(product)
+    assert product.normalized_name == "smart tv"
+
+
+def test_csv_insert_rejects_existing_and_repeated_names(db, make_product):
+    make_product("Teclado")
+    report = csv_importer.import_products_csv(_Upload(
+        "name,price\n"
+        "teclado,10\n"
+        "Mouse,20\n"
+        " MOUSE ,30\n"
+    ), db)
+    assert (report["imported"], report["rejected"], report["rejected_rows"]) == (1, 2, [2, 4])
+    assert db.scalar(select(models.Product.price).where(models.Product.normalized_name == "mouse")) == 20
+
+
+def test_csv_upsert_is_idempotent(db, make_product, make_category):
+    bebidas, limpeza = make_category("Bebidas"), make_category("Limpeza")
+    make_product("Sabão", price=5.0, category=limpeza)
+    text = f"name,price,category_id\nsabão,7,{bebidas.id}\nÁgua,2,{bebidas.id}\n"
+
+    first = csv_importer.import_products_csv(_Upload(text), db, mode="upsert")
+    second = csv_importer.import_products_csv(_Upload(text), db, mode="upsert")
+    assert (first["imported"], first["updated"]) == (1, 1)
+    assert (second["imported"], second["updated"]) == (0, 2)
+
+    db.expire_all()
+    assert db.scalar(select(models.Product.price).where(models.Product.normalized_name == "sabão")) == 7
+    assert (bebidas.product_count, limpeza.product_count) == (2, 0)
+    assert db.query(models.PriceHistory).count() == 1
+
+
+def test_csv_upsert_keeps_the_last_repeated_name(db):
+    report = csv_importer.import_products_csv(_Upload("name,price\nCabo,1\ncabo ,2\nCABO,3\n"), db, mode="upsert")
+    assert (report["imported"], report["updated"], report["duplicates"], report["rejected"]) == (1, 0, 2, 0)
+    assert db.scalar(select(models.Product.price)) == 3
+
+
+def test_backfill_keeps_the_oldest_duplicate(db):
+    table = models.Category.__table__
+    with engine.begin() as connection:
+        connection.execute(table.insert(), [
+            {"name": "Bebidas", "normalized_name": None},
+            {"name": " bebidas", "normalized_name": None},
+            {"name": "Limpeza", "normalized_name": None},
+        ])
+        catalog_names.backfill_normalized_names(connection, table)
+    rows = db.execute(select(table.c.name, table.c.normalized_name).order_by(table.c.id)).all()
+    assert [tuple(row) for row in rows] == [("Bebidas", "bebidas"), (" bebidas", None), ("Limpeza", "limpeza")]
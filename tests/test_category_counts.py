@@ -0,0 +1,50 @@
+import io
+
+from sqlalchemy import create_engine, text
+
+from app.services import csv_importer
+from app.services.category_counter import ensure_product_count_column
+
+
+def _counts(client) -> dict:
+    return {item["name"]: item["total_products"] for item in client.get("/categories").json()["items"]}
+
+
+def test_product_writes_keep_counts(client, make_category):
+    drinks, food = make_category("Bebidas"), make_category("Mercearia")
+    product_id = client.post("/products", json={"name": "Suco", "price": 5.0, "category_id": drinks.id}).json()["id"]
+    client.post("/products", json={"name": "Arroz", "price": 20.0, "category_id": food.id})
+    assert _counts(client) == {"Bebidas": 1, "Mercearia": 1}
+
+    client.put(f"/products/{product_id}", json={"category_id": food.id})
+    assert _counts(client) == {"Bebidas": 0, "Mercearia": 2}
+
+    client.delete(f"/products/{product_id}")
+    assert _counts(client) == {"Bebidas": 0, "Mercearia": 1}
+
+
+def test_csv_import_counts_per_chunk(client, db, make_category):
+    drinks, food = make_category("Bebidas"), make_category("Mercearia")
+
+    class Upload:
+        file = io.BytesIO(
+            f"name,price,category_id\nSuco,5,{drinks.id}\nÁgua,2,{drinks.id}\nArroz,20,{food.id}\nSal,3,\n".encode()
+        )
+
+    assert csv_importer.import_products_csv(Upload(), db)["imported"] == 4
+    assert _counts(client) == {"Bebidas": 2, "Mercearia": 1}
+
+
+def test_old_databases_get_the_column_backfilled(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE categories (id INTEGER PRIMARY KEY, name VARCHAR, description VARCHAR, discount_percentage FLOAT)"))
+        connection.execute(text("CREATE TABLE products (id INTEGER PRIMARY KEY, name VARCHAR, category_id INTEGER)"))
+        connection.execute(text("INSERT INTO categories (id, name) VALUES (1, 'Bebidas'), (2, 'Vazia')"))
+        connection.execute(text("INSERT INTO products (name, category_id) VALUES ('Suco', 1), ('Água', 1), ('Sal', NULL)"))
+
+    ensure_product_count_column(engine)
+    ensure_product_count_column(engine)
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT id, product_count FROM categories ORDER BY id")).all() == [(1, 2), (2, 0)]
+    engine.dispose()
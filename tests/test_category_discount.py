@@ -0,0 +1,45 @@
+import json
+
+from sqlalchemy import select
+
+from app.models import models
+
+
+def _prices(db) -> dict:
+    return dict(db.execute(select(models.Product.name, models.Product.price)).all())
+
+
+def test_discount_updates_category_and_records_history(client, db, make_category, make_product):
+    category, other = make_category("Promo"), make_category("Outra")
+    make_product("A", price=100.0, category=category)
+    make_product("B", price=None, category=category)
+    make_product("C", price=100.0, category=other)
+
+    response = client.put(f"/products/categories/{category.id}/discount", params={"discount_percentage": 10})
+    assert response.status_code == 200
+    assert response.json()["updated_count"] == 1
+    db.expire_all()
+    assert _prices(db) == {"A": 90.0, "B": None, "C": 100.0}
+    assert db.get(models.Category, category.id).discount_percentage == 10
+    history = db.execute(select(models.PriceHistory.product_id, models.PriceHistory.price)).all()
+    assert [price for _, price in history] == [90.0]
+
+
+def test_discount_streams_updated_products(client, make_category, make_product):
+    category = make_category("Promo")
+    first = make_product("A", price=50.0, category=category)
+    second = make_product("B", price=20.0, category=category)
+    response = client.put(
+        f"/products/categories/{category.id}/discount", params={"discount_percentage": 50, "stream": True}
+    )
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line) for line in response.text.splitlines()] == [
+        {"product_id": first.id, "name": "A", "price": 25.0, "category_id": category.id},
+        {"product_id": second.id, "name": "B", "price": 10.0, "category_id": category.id},
+    ]
+
+
+def test_discount_validation(client, make_category):
+    category = make_category("Promo")
+    assert client.put("/products/categories/999/discount", params={"discount_percentage": 10}).status_code == 404
+    assert client.put(f"/products/categories/{category.id}/discount", params={"discount_percentage": 150}).status_code == 422
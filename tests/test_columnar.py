@@ -0,0 +1,57 @@
+import io
+from datetime import datetime
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+import pyarrow.parquet as pq
+
+from app.models import models
+
+
+@pytest.fixture
+def sales(db, make_product, make_sale):
+    mouse = make_product("Mouse")
+    teclado = make_product("Teclado")
+    make_sale(mouse, quantity=1, total_price=10.0, date=datetime(2024, 1, 5))
+    make_sale(mouse, quantity=2, total_price=20.0, date=datetime(2024, 2, 5))
+    make_sale(teclado, quantity=3, total_price=30.0, date=datetime(2024, 2, 6))
+    return mouse, teclado
+
+
+def test_parquet_export_keeps_column_types(client, sales):
+    response = client.get("/export/sales", params={"format": "parquet"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/vnd.apache.parquet"
+    table = pq.read_table(io.BytesIO(response.content))
+    assert table.num_rows == 3
+    assert table.schema.field("quantity").type == pa.int64()
+    assert table.schema.field("total_price").type == pa.float64()
+    assert pa.types.is_timestamp(table.schema.field("date").type)
+
+
+def test_arrow_stream_export_with_filters(client, sales):
+    mouse, _ = sales
+    response = client.get("/export/sales", params={
+        "format": "arrow", "compression": "lz4", "product_id": mouse.id, "start": "2024-02-01T00:00:00"
+    })
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert table.column("quantity").to_pylist() == [2]
+
+
+def test_empty_export_still_has_a_schema(client, db):
+    table = pq.read_table(io.BytesIO(client.get("/export/products", params={"format": "parquet"}).content))
+    assert table.num_rows == 0
+    assert "price" in table.schema.names
+
+
+def test_enum_columns_are_dictionary_encoded(client, db):
+    db.add(models.User(email="a@example.com", username="a", password="x", role=models.RoleEnum.admin))
+    db.commit()
+    table = pq.read_table(io.BytesIO(client.get("/export/users", params={"format": "parquet"}).content))
+    assert table.column("role").to_pylist() == ["admin"]
+
+
+def test_unsupported_compression_is_rejected(client, db):
+    response = client.get("/export/sales", params={"format": "arrow", "compression": "snappy"})
+    assert response.status_code == 400
@@ -0,0 +1,101 @@
+import io
+from datetime import date
+
+from sqlalchemy import func, select
+
+from app.models import models
+from app.services import csv_importer
+
+
+class _Upload:
+    """O que os importadores usam de um `UploadFile`: só o arquivo."""
+
+    def __init__(self, text: str):
+        self.file = io.BytesIO(text.encode())
+
+
+def _count(db, model) -> int:
+    return db.scalar(select(func.count()).select_from(model))
+
+
+def test_products_are_validated_per_column_and_chunked(db, monkeypatch):
+    monkeypatch.setattr(csv_importer, "CHUNK_SIZE", 2)
+    report = csv_importer.import_products_csv(_Upload(
+        "name,description,price,category_id,brand\n"
+        "Teclado,,100,,Acme\n"
+        ",sem nome,10,,\n"
+        "Mouse,,abc,,\n"
+        "Monitor,,900.5,1.5,\n"
+        "Cabo,,5,,\n"
+    ), db)
+    assert (report["imported"], report["rejected"]) == (2, 3)
+    assert report["rejected_rows"] == [3, 4, 5]
+    assert [(chunk["rows"], chunk["imported"], chunk["rejected"]) for chunk in report["chunks"]] == [
+        (2, 1, 1), (2, 0, 2), (1, 1, 0)
+    ]
+    assert sorted(db.scalars(select(models.Product.name))) == ["Cabo", "Teclado"]
+
+
+def test_sales_import_updates_rollup(db, make_product):
+    product = make_product("Teclado")
+    report = csv_importer.import_sales_csv(_Upload(
+        "product_id,quantity,total_price,date\n"
+        f"{product.id},2,100,2026-03-01 10:00:00\n"
+        f"{product.id},1,50,2026-03-01 18:00:00\n"
+        f"{product.id},1,50,01/03/2026\n"
+        f"{product.id},x,50,2026-03-02 10:00:00\n"
+    ), db)
+    assert (report["imported"], report["rejected"], report["rejected_rows"]) == (2, 2, [4, 5])
+    rollup = db.execute(select(models.SalesDailyRollup)).scalars().all()
+    assert [(row.day, row.sale_count, row.quantity, row.revenue) for row in rollup] == [(date(2026, 3, 1), 2, 3, 150.0)]
+
+
+def test_categories_and_users(db):
+    assert csv_importer.import_categories_csv(_Upload("name,description\nBebidas,\n ,x\n"), db)["imported"] == 1
+    report = csv_importer.import_users_csv(_Upload(
+        "email,username,password,role\n"
+        "Ana@Smartmart.test,ana,segredo,admin\n"
+        "bia@smartmart.test,bia,,viewer\n"
+        "caio@smartmart.test,caio,x,dono\n"
+    ), db)
+    assert (report["imported"], report["rejected_rows"]) == (2, [4])
+    ana = db.scalar(select(models.User).where(models.User.username == "ana"))
+    assert ana.email == "ana@smartmart.test"
+    assert ana.password != "segredo"
+    assert _count(db, models.Category) == 1
+
+
+def test_rows_with_missing_foreign_keys_are_rejected(db, make_product, make_category):
+    category = make_category("Bebidas")
+    product = make_product("Água")
+    report = csv_importer.import_products_csv(_Upload(
+        "name,price,category_id\n"
+        f"Suco,5,{category.id}\n"
+        "Refrigerante,6,999\n"
+    ), db)
+    assert (report["imported"], report["rejected_rows"]) == (1, [3])
+
+    report = csv_importer.import_sales_csv(_Upload(
+        "product_id,quantity,total_price,date\n"
+        f"{product.id},1,10,2026-03-01 10:00:00\n"
+        "999,1,10,2026-03-01 10:00:00\n"
+    ), db)
+    assert (report["imported"], report["rejected_rows"]) == (1, [3])
+    assert _count(db, models.Sale) == 1
+
+
+def test_duplicate_users_are_rejected_per_row(db, monkeypatch):
+    monkeypatch.setattr(csv_importer, "CHUNK_SIZE", 3)
+    db.add(models.User(email="ana@smartmart.test", username="ana", password="x", role=models.RoleEnum.viewer))
+    db.commit()
+    report = csv_importer.import_users_csv(_Upload(
+        "email,username,password,role\n"
+        "ANA@smartmart.test,ana2,x,viewer\n"   # e-mail já no banco
+        "bia@smartmart.test,ana,x,viewer\n"    # username já no banco
+        "caio@smartmart.test,caio,x,viewer\n"
+        "Caio@smartmart.test,caio3,x,viewer\n"  # e-mail repetido em outro bloco
+        "duda@smartmart.test,duda,x,viewer\n"
+        "eva@smartmart.test,duda,x,viewer\n"   # username repetido no mesmo bloco
+    ), db)
+    assert (report["imported"], report["rejected"], report["rejected_rows"]) == (2, 4, [2, 3, 5, 7])
+    assert sorted(db.scalars(select(models.User.username))) == ["ana", "caio", "duda"]
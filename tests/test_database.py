@@ -0,0 +1,40 @@
+import asyncio
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from app.database import async_engine, engine, engine_options
+
+
+def _pragmas(connection) -> tuple:
+    return tuple(
+        connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+        for name in ("journal_mode", "synchronous", "foreign_keys", "busy_timeout")
+    )
+
+
+def test_sqlite_connections_get_the_pragmas():
+    with engine.connect() as connection:
+        # synchronous=NORMAL é 1.
+        assert _pragmas(connection) == ("wal", 1, 1, 5000)
+
+
+def test_async_connections_get_the_pragmas():
+    async def read():
+        async with async_engine.connect() as connection:
+            return await connection.run_sync(_pragmas)
+
+    assert asyncio.run(read()) == ("wal", 1, 1, 5000)
+
+
+def test_engine_options_by_backend():
+    assert engine_options("sqlite:///./app.db") == {"echo": False, "connect_args": {"check_same_thread": False}}
+    assert engine_options("sqlite+aiosqlite:///./app.db") == {"echo": False}
+    options = engine_options("postgresql://u:p@db/smartmart")
+    assert (options["pool_size"], options["max_overflow"], options["pool_pre_ping"]) == (10, 20, True)
+
+
+def test_foreign_keys_are_enforced(db):
+    with engine.connect() as connection, pytest.raises(IntegrityError, match="FOREIGN KEY"):
+        connection.execute(text("INSERT INTO products (name, category_id) VALUES ('x', 999)"))
@@ -0,0 +1,49 @@
+import csv
+import io
+from datetime import datetime
+
+from sqlalchemy import select
+
+from app.models import models
+from app.utils.streaming import stream_csv
+
+
+def _rows(response) -> list:
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    return list(csv.reader(io.StringIO(response.text)))
+
+
+def test_products_export(client, make_category, make_product):
+    category = make_category("Periféricos")
+    make_product("Teclado", price=100.0, category=category, brand="Acme")
+    make_product("Mouse, sem fio", price=None)
+    rows = _rows(client.get("/export/products"))
+    assert rows[0] == ["id", "name", "description", "price", "category_id", "brand"]
+    assert [row[1:] for row in rows[1:]] == [
+        ["Teclado", "", "100.0", str(category.id), "Acme"],
+        ["Mouse, sem fio", "", "", "", ""],
+    ]
+
+
+def test_sales_with_profit_export(client, make_product, make_sale):
+    product = make_product("Monitor")
+    make_sale(product, quantity=2, total_price=1000.0, date=datetime(2026, 3, 1, 10))
+    rows = _rows(client.get("/export/sales_with_profit"))
+    assert rows[0] == ["id", "product_id", "quantity", "total_price", "date", "profit"]
+    assert rows[1][1:] == [str(product.id), "2", "1000.0", "2026-03-01 10:00:00", "200.0"]
+
+
+def test_users_export_writes_enum_values(client, db):
+    db.add(models.User(email="ana@smartmart.test", username="ana", password="x", role=models.RoleEnum.admin))
+    db.commit()
+    rows = _rows(client.get("/export/users"))
+    assert rows[1][1:4] == ["ana@smartmart.test", "ana", "admin"]
+
+
+def test_stream_yields_header_then_one_chunk_per_batch(db, make_product):
+    for index in range(5):
+        make_product(f"Produto {index}")
+    chunks = list(stream_csv(db, select(models.Product.id, models.Product.name).order_by(models.Product.id), batch_size=2))
+    assert chunks[0] == "id,name\r\n"
+    assert [chunk.count("\r\n") for chunk in chunks[1:]] == [2, 2, 1]
@@ -0,0 +1,75 @@
+import json
+import logging
+import queue
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.database import engine
+from app.services import slow_query
+from app.services.logging_config import (
+    JsonFormatter, NonBlockingQueueHandler, RequestContext, RequestContextFilter, current_context
+)
+
+
+def test_request_id_is_echoed_or_generated(client):
+    assert client.get("/categories", headers={"X-Request-ID": "abc-123"}).headers["x-request-id"] == "abc-123"
+    generated = client.get("/categories").headers["x-request-id"]
+    assert len(generated) == 32
+
+
+def test_records_carry_the_request_context():
+    record = logging.makeLogRecord({"msg": "oi"})
+    RequestContextFilter().filter(record)
+    assert (record.request_id, record.route) == ("-", "-")
+
+    token = current_context.set(RequestContext("abc", {"path": "/products/7"}))
+    try:
+        RequestContextFilter().filter(record)
+    finally:
+        current_context.reset(token)
+    assert (record.request_id, record.route) == ("abc", "/products/7")
+
+
+def test_json_formatter_keeps_extra_fields():
+    record = logging.makeLogRecord({"msg": "lento %s", "args": ("x",), "name": "app", "duration_ms": 12.5})
+    RequestContextFilter().filter(record)
+    entry = json.loads(JsonFormatter().format(record))
+    assert (entry["message"], entry["duration_ms"], entry["request_id"]) == ("lento x", 12.5, "-")
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = NonBlockingQueueHandler(queue.Queue(1))
+    handler.emit(logging.makeLogRecord({"msg": "primeiro"}))
+    handler.emit(logging.makeLogRecord({"msg": "descartado"}))
+    assert handler.queue.qsize() == 1
+
+
+def test_slow_queries_are_logged_with_redacted_parameters(client, caplog, monkeypatch):
+    monkeypatch.setattr(slow_query, "SLOW_QUERY_MS", 0)
+    with caplog.at_level(logging.WARNING, logger="app.slow_query"):
+        with engine.connect() as connection:
+            connection.execute(text("SELECT id FROM products WHERE name = :name"), {"name": "segredo"})
+    record = next(record for record in caplog.records if record.name == "app.slow_query")
+    assert "segredo" not in record.getMessage()
+    assert "['str']" in record.getMessage()
+    assert record.plan and "products" in " ".join(record.plan)
+
+
+def test_redact():
+    assert slow_query.redact({"a": 1, "b": "x"}) == {"a": "int", "b": "str"}
+    assert slow_query.redact((1.5, None)) == ["float", "NoneType"]
+    assert slow_query.redact([(1,), (2,)], executemany=True) == "<2 linhas>"
+
+
+def test_failed_statement_leaves_no_start_time_behind(client, caplog, monkeypatch):
+    monkeypatch.setattr(slow_query, "SLOW_QUERY_MS", 50)
+    with caplog.at_level(logging.WARNING, logger="app.slow_query"):
+        with engine.connect() as connection:
+            with pytest.raises(OperationalError):
+                connection.execute(text("SELECT * FROM tabela_que_nao_existe"))
+            connection.rollback()
+            assert not connection.info.get("slow_query_started")
+            connection.execute(text("SELECT 1"))
+    assert not [record for record in caplog.records if record.name == "app.slow_query"]
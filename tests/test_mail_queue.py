@@ -0,0 +1,106 @@
+import socketserver
+import threading
+
+import pytest
+
+from app.services.email_service import MailQueue
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """Servidor SMTP mínimo de debug: aceita tudo e guarda as mensagens recebidas."""
+
+    def _reply(self, line: str):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+            if server.refuse_next:
+                server.refuse_next -= 1
+                self._reply("421 indisponível")
+                return
+        self._reply("220 debug")
+        while True:
+            line = self.rfile.readline().decode().rstrip("\r\n")
+            if not line:
+                return
+            command = line.split(" ", 1)[0].upper()
+            if command in ("EHLO", "HELO"):
+                self._reply("250 debug")
+            elif command == "RCPT" and "recusado" in line:
+                self._reply("550 destinatário recusado")
+            elif command == "DATA":
+                self._reply("354 fim com .")
+                lines = []
+                while (data := self.rfile.readline().decode().rstrip("\r\n")) != ".":
+                    lines.append(data)
+                with server.lock:
+                    server.messages.append("\n".join(lines))
+                self._reply("250 ok")
+            elif command == "QUIT":
+                self._reply("221 tchau")
+                return
+            else:
+                self._reply("250 ok")
+
+
+@pytest.fixture
+def smtp_server(monkeypatch):
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _SMTPHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.connections = 0
+    server.refuse_next = 0
+    server.messages = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv("SMTP_SERVER", "127.0.0.1")
+    monkeypatch.setenv("SMTP_PORT", str(server.server_address[1]))
+    monkeypatch.setenv("SMTP_FROM", "api@smartmart.test")
+    monkeypatch.setenv("SMTP_STARTTLS", "false")
+    monkeypatch.setenv("SMTP_AUTH", "false")
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _drain(queue: MailQueue):
+    queue.join()
+    queue.stop()
+
+
+def test_reuses_one_connection_for_many_messages(smtp_server):
+    queue = MailQueue(idle_timeout=5)
+    for index in range(5):
+        assert queue.enqueue(f"cliente{index}@smartmart.test", "Login", f"corpo {index}")
+    _drain(queue)
+    assert (queue.sent, queue.failed) == (5, 0)
+    assert smtp_server.connections == 1
+    assert len(smtp_server.messages) == 5
+
+
+def test_retries_with_backoff_when_server_is_unavailable(smtp_server):
+    smtp_server.refuse_next = 2
+    queue = MailQueue(max_retries=3, backoff=0.01)
+    queue.enqueue("cliente@smartmart.test", "Login", "corpo")
+    _drain(queue)
+    assert (queue.sent, queue.failed) == (1, 0)
+    assert smtp_server.connections == 3
+
+
+def test_does_not_retry_permanent_errors(smtp_server):
+    queue = MailQueue(max_retries=3, backoff=0.01)
+    queue.enqueue("recusado@smartmart.test", "Login", "corpo")
+    queue.enqueue("cliente@smartmart.test", "Login", "corpo")
+    _drain(queue)
+    assert (queue.sent, queue.failed) == (1, 1)
+    assert smtp_server.connections == 1
+
+
+def test_enqueue_never_blocks_when_full(monkeypatch):
+    queue = MailQueue(maxsize=1)
+    # Sem worker drenando, a fila fica cheia com um item.
+    monkeypatch.setattr(queue, "start", lambda: None)
+    queue._queue.put(("ocupado@smartmart.test", "x", "y"))
+    assert queue.enqueue("cliente@smartmart.test", "Login", "corpo") is False
@@ -0,0 +1,71 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.database import engine
+from app.services.metrics import LATENCY_BUCKETS, Metrics, RequestStats, current_request, metrics
+
+
+def _requests(method: str, route: str, status: int) -> int:
+    return metrics.requests.get((method, route, status), 0)
+
+
+def test_requests_are_counted_by_route_template(client, make_product):
+    product = make_product("Teclado")
+    route = "/price-history/{product_id}/buckets"
+    before = _requests("GET", route, 200)
+    statements = metrics.db_statements.get(("GET", route), 0)
+    assert client.get(f"/price-history/{product.id}/buckets").status_code == 200
+    assert _requests("GET", route, 200) == before + 1
+    assert metrics.db_statements[("GET", route)] > statements
+
+
+def test_server_timing_reports_the_queries(client, make_product):
+    make_product("Teclado")
+    timing = client.get("/categories").headers["server-timing"]
+    assert timing.startswith("db;dur=") and "queries" in timing and "app;dur=" in timing
+
+
+def test_cache_hits_keep_the_route_template(client, make_category):
+    make_category("Bebidas")
+    assert client.get("/categories", params={"limit": 7}).headers["x-cache"] == "MISS"
+    before = _requests("GET", "/categories", 200)
+    assert client.get("/categories", params={"limit": 7}).headers["x-cache"] == "HIT"
+    assert _requests("GET", "/categories", 200) == before + 1
+
+
+def test_metrics_endpoint_renders_prometheus_text(client):
+    client.get("/categories")
+    response = client.get("/metrics")
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE http_request_duration_seconds histogram" in response.text
+    assert 'http_requests_total{method="GET",route="/categories",status="200"}' in response.text
+
+
+def test_histograms_are_cumulative():
+    registry = Metrics()
+    stats = RequestStats()
+    for duration in (0.001, 0.02, 20.0):
+        registry.request_started()
+        registry.request_finished("GET", '/x"y', 200, duration, 10, stats)
+    text = registry.render()
+    assert registry.in_flight == 0
+    assert f'http_request_duration_seconds_bucket{{method="GET",route="/x\\"y",le="{LATENCY_BUCKETS[0]}"}} 1' in text
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/x\\"y",le="+Inf"} 3' in text
+    assert 'http_request_duration_seconds_count{method="GET",route="/x\\"y"} 3' in text
+
+
+def test_failed_statements_are_counted_and_do_not_skew_later_ones(client):
+    stats = RequestStats()
+    token = current_request.set(stats)
+    try:
+        with engine.connect() as connection:
+            with pytest.raises(OperationalError):
+                connection.execute(text("SELECT * FROM tabela_que_nao_existe"))
+            connection.rollback()
+            connection.execute(text("SELECT 1"))
+            assert "query_started" not in connection.info
+    finally:
+        current_request.reset(token)
+    assert stats.statements == 2
+    assert 0 <= stats.db_seconds < 1
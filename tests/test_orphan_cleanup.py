@@ -0,0 +1,83 @@
+from datetime import datetime
+
+from sqlalchemy import create_engine, func, inspect, select, text
+
+from app.database import Base, ensure_foreign_key_cascades, engine
+from app.models import models
+from remove_orphan_sales import OrphanCleanupJob, orphan_cleanup, remove_orphan_sales
+
+
+def _count(db, model) -> int:
+    return db.scalar(select(func.count()).select_from(model))
+
+
+def test_deleting_a_product_cascades_in_the_database(client, db, make_product, make_sale):
+    product = make_product("Teclado")
+    client.post("/sales", json={"product_id": product.id, "quantity": 1, "total_price": 10.0, "date": "2026-03-01T10:00:00"})
+    db.add(models.PriceHistory(product_id=product.id, price=9.0, date=datetime(2026, 3, 1)))
+    db.commit()
+
+    assert client.delete(f"/products/{product.id}").status_code == 200
+    assert [_count(db, model) for model in (models.Sale, models.SalesDailyRollup, models.PriceHistory)] == [0, 0, 0]
+
+
+def _insert_orphans(product_id: int):
+    # Dados antigos, gravados com as FKs desligadas.
+    with engine.connect() as connection:
+        connection.exec_driver_sql("PRAGMA foreign_keys=OFF")
+        for day in range(1, 6):
+            connection.execute(
+                models.Sale.__table__.insert().values(product_id=999, quantity=1, total_price=1.0, date=datetime(2026, 3, day))
+            )
+        connection.execute(models.PriceHistory.__table__.insert().values(product_id=999, price=1.0))
+        connection.execute(models.Sale.__table__.insert().values(product_id=product_id, quantity=1, total_price=1.0))
+        connection.commit()
+        connection.exec_driver_sql("PRAGMA foreign_keys=ON")
+
+
+def test_cleanup_removes_orphans_in_batches(db, make_product):
+    product = make_product("Mouse")
+    _insert_orphans(product.id)
+    progress = []
+    removed = remove_orphan_sales(batch_size=2, progress=lambda table, count: progress.append((table, count)))
+    assert removed == {"sales": 5, "sales_daily_rollup": 0, "price_history": 1}
+    assert progress == [("sales", 2), ("sales", 4), ("sales", 5), ("price_history", 1)]
+    assert db.scalars(select(models.Sale.product_id)).all() == [product.id]
+
+
+def test_cleanup_job_runs_once_at_a_time(db, make_product):
+    _insert_orphans(make_product("Monitor").id)
+    job = OrphanCleanupJob(batch_size=2)
+    assert job.status()["state"] == "idle"
+    assert job.start()
+    job.join(10)
+    status = job.status()
+    assert (status["state"], status["removed"]["sales"], status["error"]) == ("finished", 5, None)
+
+
+def test_cleanup_endpoints(client, db, make_product):
+    _insert_orphans(make_product("Cabo").id)
+    assert client.post("/maintenance/orphan-sales").status_code == 202
+    orphan_cleanup.join(10)
+    status = client.get("/maintenance/orphan-sales").json()
+    assert (status["state"], status["removed"]["sales"]) == ("finished", 5)
+
+
+def test_old_databases_get_the_cascades(tmp_path):
+    old = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    Base.metadata.create_all(bind=old)
+    with old.begin() as connection:
+        connection.execute(text("DROP TABLE price_history"))
+        connection.execute(text(
+            "CREATE TABLE price_history (id INTEGER PRIMARY KEY, product_id INTEGER REFERENCES products (id),"
+            " price FLOAT, date DATETIME, reason VARCHAR)"
+        ))
+        connection.execute(text("INSERT INTO products (id, name) VALUES (1, 'Teclado')"))
+        connection.execute(text("INSERT INTO price_history (product_id, price) VALUES (1, 9.0)"))
+
+    ensure_foreign_key_cascades(old)
+    foreign_keys = inspect(old).get_foreign_keys("price_history")
+    assert [fk["options"].get("ondelete") for fk in foreign_keys] == ["CASCADE"]
+    with old.connect() as connection:
+        assert connection.execute(text("SELECT product_id, price FROM price_history")).all() == [(1, 9.0)]
+    old.dispose()
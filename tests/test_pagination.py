@@ -0,0 +1,143 @@
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from app.models import models
+from app.utils.pagination import _count_cache, count_query, encode_cursor, paginate_cursor
+
+# Preços, marcas e categorias com NULLs e chaves repetidas, em ordem de id embaralhada.
+PRODUCTS = [
+    ("Produto 05", 30.0, "Acme", 2),
+    ("Produto 01", None, None, None),
+    ("Produto 09", 10.0, "Zeta", 1),
+    ("Produto 03", 30.0, None, 2),
+    ("Produto 07", None, "Acme", 1),
+    ("Produto 02", 10.0, "Beta", None),
+    ("Produto 08", 20.0, "Acme", 2),
+    ("Produto 04", 30.0, "Zeta", 1),
+    ("Produto 06", None, None, 2),
+]
+
+SORT_KEYS = ["id", "name", "price", "brand", "category_id"]
+
+
+@pytest.fixture
+def catalog(db, make_category, make_product):
+    categories = {1: make_category("Categoria 1"), 2: make_category("Categoria 2")}
+    return [
+        make_product(name, price=price, brand=brand, category=categories.get(category_id))
+        for name, price, brand, category_id in PRODUCTS
+    ]
+
+
+def _expected(rows, key, descending: bool) -> list:
+    # Mesma ordem do keyset: NULLs primeiro em ASC e por último em DESC; empates pelo id.
+    present = sorted((row for row in rows if row[key] is not None), key=lambda row: (row[key], row["id"]))
+    missing = sorted((row for row in rows if row[key] is None), key=lambda row: row["id"])
+    ordered = missing + present
+    return [row["id"] for row in (reversed(ordered) if descending else ordered)]
+
+
+def _walk(db, sort_by: str, sort_order: str, limit: int) -> list:
+    column = getattr(models.Product, sort_by)
+    ids, cursor, pages = [], None, 0
+    while True:
+        items, _, cursor = paginate_cursor(
+            db.query(models.Product), sort_by, column, models.Product.id, sort_order, cursor, limit, count="none"
+        )
+        ids.extend(item.id for item in items)
+        pages += 1
+        assert pages <= len(PRODUCTS) + 1, "cursor não avança"
+        if cursor is None:
+            return ids
+
+
+@pytest.mark.parametrize("limit", [1, 2, 4])
+@pytest.mark.parametrize("sort_order", ["asc", "desc"])
+@pytest.mark.parametrize("sort_by", SORT_KEYS)
+def test_keyset_walk_visits_every_row_once_in_order(db, catalog, sort_by, sort_order, limit):
+    rows = [
+        {"id": product.id, "name": product.name, "price": product.price,
+         "brand": product.brand, "category_id": product.category_id}
+        for product in catalog
+    ]
+    assert _walk(db, sort_by, sort_order, limit) == _expected(rows, sort_by, sort_order == "desc")
+
+
+@pytest.mark.parametrize("sort_order", ["asc", "desc"])
+def test_keyset_walk_on_datetimes_with_nulls_and_ties(db, catalog, make_sale, sort_order):
+    dates = [datetime(2026, 1, 2), None, datetime(2026, 1, 1), datetime(2026, 1, 2), None, datetime(2026, 1, 3)]
+    sales = [make_sale(catalog[0]) for _ in dates]
+    for sale, date in zip(sales, dates):
+        sale.date = date
+    db.commit()
+
+    ids, cursor = [], None
+    while True:
+        items, _, cursor = paginate_cursor(
+            db.query(models.Sale), "date", models.Sale.date, models.Sale.id, sort_order, cursor, 2, count="none"
+        )
+        ids.extend(item.id for item in items)
+        if cursor is None:
+            break
+    rows = [{"id": sale.id, "date": date} for sale, date in zip(sales, dates)]
+    assert ids == _expected(rows, "date", sort_order == "desc")
+
+
+def test_keyset_walk_survives_inserts_before_the_cursor(db, catalog, make_product):
+    first, _, cursor = paginate_cursor(
+        db.query(models.Product), "price", models.Product.price, models.Product.id, "asc", None, 4, count="none"
+    )
+    # Uma linha nova antes do cursor não desloca as páginas seguintes (ao contrário do OFFSET).
+    make_product("Produto 00", price=None)
+    rest = _walk_from(db, cursor)
+    seen = [item.id for item in first] + rest
+    assert sorted(seen) == sorted(product.id for product in catalog)
+
+
+def _walk_from(db, cursor) -> list:
+    ids = []
+    while cursor:
+        items, _, cursor = paginate_cursor(
+            db.query(models.Product), "price", models.Product.price, models.Product.id, "asc", cursor, 3, count="none"
+        )
+        ids.extend(item.id for item in items)
+    return ids
+
+
+def test_cursor_must_match_the_requested_ordering(db, catalog):
+    cursor = encode_cursor("price", "asc", 10.0, catalog[0].id)
+    with pytest.raises(HTTPException) as error:
+        paginate_cursor(db.query(models.Product), "price", models.Product.price, models.Product.id, "desc", cursor)
+    assert error.value.status_code == 400
+    with pytest.raises(HTTPException) as error:
+        paginate_cursor(db.query(models.Product), "price", models.Product.price, models.Product.id, "asc", "não-é-cursor")
+    assert error.value.status_code == 400
+
+
+@pytest.mark.parametrize("sort", ["asc", "desc"])
+def test_products_endpoint_cursor_walk(client, catalog, sort):
+    ids, cursor = [], None
+    while True:
+        params = {"pagination": "cursor", "sort_by": "price", "sort": sort, "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        body = client.get("/products", params=params).json()
+        ids.extend(item["id"] for item in body["items"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    rows = [{"id": product.id, "price": product.price} for product in catalog]
+    assert ids == _expected(rows, "price", sort == "desc")
+
+
+def test_count_modes(db, catalog, make_product):
+    query = db.query(models.Product)
+    assert count_query(query, "none") is None
+    _count_cache.clear()
+    assert count_query(query, "cached") == len(PRODUCTS)
+    make_product("Produto 10")
+    # O total em cache vale até o TTL; o exato sempre vai ao banco.
+    assert count_query(query, "cached") == len(PRODUCTS)
+    assert count_query(query, "exact") == len(PRODUCTS) + 1
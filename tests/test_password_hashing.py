@@ -0,0 +1,39 @@
+import pytest
+
+from app.services import security
+
+
+@pytest.fixture
+def hash_pool(monkeypatch):
+    security.shutdown_hash_pool()
+    monkeypatch.setattr(security, "PASSWORD_HASH_WORKERS", 2)
+    yield
+    security.shutdown_hash_pool()
+
+
+def test_hash_and_verify_in_the_current_thread():
+    assert security.get_hash_pool() is None
+    hashed = security.hash_password("segredo")
+    # O custo vem de BCRYPT_ROUNDS (4 nos testes).
+    assert hashed.startswith("$2b$04$")
+    assert security.verify_password("segredo", hashed)
+    assert not security.verify_password("outro", hashed)
+
+
+def test_hash_and_verify_in_the_pool(hash_pool):
+    security.start_hash_pool()
+    assert security.get_hash_pool() is not None
+    # Nunca um fork do processo da API, que já tem threads rodando.
+    assert security.get_hash_pool()._mp_context.get_start_method() in ("forkserver", "spawn")
+    hashed = security.hash_password("segredo")
+    assert security.verify_password("segredo", hashed)
+    hashes = security.hash_passwords([f"senha {index}" for index in range(6)])
+    assert len(set(hashes)) == 6
+    assert all(security.verify_password(f"senha {index}", hashed) for index, hashed in enumerate(hashes))
+
+
+def test_shutdown_is_idempotent(hash_pool):
+    security.start_hash_pool()
+    security.shutdown_hash_pool()
+    security.shutdown_hash_pool()
+    assert security._hash_pool is None
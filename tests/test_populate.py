@@ -0,0 +1,97 @@
+import os
+import shutil
+
+import pytest
+from sqlalchemy import delete, func, select
+
+import populate_initial_data as loader
+from app.database import engine
+from app.models import models
+from app.services import security
+
+
+@pytest.fixture
+def data_dir(tmp_path, db):
+    shutil.copytree("data", tmp_path, dirs_exist_ok=True)
+    loader.checkpoints.create(bind=engine, checkfirst=True)
+    with engine.begin() as connection:
+        connection.execute(delete(loader.checkpoints))
+    return str(tmp_path)
+
+
+def _count(db, model) -> int:
+    return db.scalar(select(func.count()).select_from(model))
+
+
+def test_full_load_rebuilds_derived_data(db, data_dir):
+    loaded = loader.populate(data_dir, chunk_size=7, progress=lambda message: None)
+    assert loaded == {"categories": 5, "products": 15, "users": 2, "sales": 60}
+
+    assert db.scalar(select(func.sum(models.SalesDailyRollup.sale_count))) == 60
+    assert db.scalar(select(func.sum(models.Category.product_count))) == 15
+    assert _count(db, models.Product) == db.scalar(
+        select(func.count()).where(models.Product.normalized_name.is_not(None))
+    )
+    admin = db.scalar(select(models.User).where(models.User.username == "admin"))
+    assert security.pwd_context.identify(admin.password)
+
+    # Concluída, a carga não repete nada.
+    assert loader.populate(data_dir, progress=lambda message: None) == {}
+
+
+def test_interrupted_load_resumes_from_the_checkpoint(db, data_dir, monkeypatch):
+    calls = []
+
+    def failing_sales(chunk):
+        calls.append(len(chunk))
+        if len(calls) == 3:
+            raise RuntimeError("queda no meio da carga")
+        return loader._sales(chunk)
+
+    tables = tuple(
+        (filename, table, failing_sales if filename == "sales.csv" else convert)
+        for filename, table, convert in loader.TABLES
+    )
+    monkeypatch.setattr(loader, "TABLES", tables)
+    with pytest.raises(RuntimeError):
+        loader.populate(data_dir, chunk_size=10, progress=lambda message: None)
+    assert _count(db, models.Sale) == 20
+    monkeypatch.undo()
+
+    loaded = loader.populate(data_dir, chunk_size=10, progress=lambda message: None)
+    assert loaded == {"sales": 40}
+    assert _count(db, models.Sale) == 60
+    assert db.scalar(select(func.max(models.Sale.id))) == 60
+
+
+def test_resume_counts_records_not_lines(db, data_dir, monkeypatch):
+    os.remove(f"{data_dir}/sales.csv")
+    with open(f"{data_dir}/products.csv", "w") as file:
+        file.write(
+            "id,name,description,price,category_id,brand\n"
+            '1,Cafeteira,"Jarra de vidro\nfiltro permanente",199.9,1,Acme\n'
+            "\n"
+            '2,Chaleira,"Inox\n1,7 litros",149.9,1,Acme\n'
+            "3,Torradeira,,99.9,1,Acme\n"
+            "4,Liquidificador,,129.9,1,Acme\n"
+        )
+    calls = []
+
+    def failing_products(chunk):
+        calls.append(len(chunk))
+        if len(calls) == 2:
+            raise RuntimeError("queda no meio da carga")
+        return loader._products(chunk)
+
+    tables = tuple(
+        (filename, table, failing_products if filename == "products.csv" else convert)
+        for filename, table, convert in loader.TABLES
+    )
+    monkeypatch.setattr(loader, "TABLES", tables)
+    with pytest.raises(RuntimeError):
+        loader.populate(data_dir, chunk_size=2, progress=lambda message: None)
+    monkeypatch.undo()
+
+    loader.populate(data_dir, chunk_size=2, progress=lambda message: None)
+    products = dict(db.execute(select(models.Product.id, models.Product.name)).all())
+    assert products == {1: "Cafeteira", 2: "Chaleira", 3: "Torradeira", 4: "Liquidificador"}
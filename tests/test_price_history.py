@@ -0,0 +1,95 @@
+from datetime import datetime
+
+from sqlalchemy import inspect
+
+from app.database import engine
+from app.models import models
+
+
+def _history(db, product, *entries):
+    for date, price in entries:
+        db.add(models.PriceHistory(product_id=product.id, price=price, date=date))
+    db.commit()
+
+
+def test_history_is_indexed_by_product_and_date():
+    indexes = {index["name"]: index["column_names"] for index in inspect(engine).get_indexes("price_history")}
+    assert indexes["ix_price_history_product_date"] == ["product_id", "date"]
+
+
+def test_buckets_by_day_and_week(client, db, make_product):
+    product = make_product("Cafeteira")
+    _history(
+        db, product,
+        (datetime(2026, 5, 4, 9), 100.0),
+        (datetime(2026, 5, 4, 18), 120.0),
+        (datetime(2026, 5, 6, 9), 90.0),
+        (datetime(2026, 5, 11, 9), 80.0),
+    )
+    days = client.get(f"/price-history/{product.id}/buckets", params={"interval": "day"}).json()
+    assert [(row["bucket"][:10], row["min_price"], row["max_price"], row["last_price"], row["count"]) for row in days] == [
+        ("2026-05-04", 100.0, 120.0, 120.0, 2),
+        ("2026-05-06", 90.0, 90.0, 90.0, 1),
+        ("2026-05-11", 80.0, 80.0, 80.0, 1),
+    ]
+    # Semanas começam na segunda-feira (04/05 e 11/05 de 2026).
+    weeks = client.get(
+        f"/price-history/{product.id}/buckets", params={"interval": "week", "end": "2026-05-11T00:00:00"}
+    ).json()
+    assert [(row["bucket"][:10], row["last_price"], row["count"]) for row in weeks] == [("2026-05-04", 90.0, 3)]
+
+
+def test_as_of_returns_the_price_in_effect(client, db, make_product):
+    first, second, empty = make_product("Chaleira"), make_product("Torradeira"), make_product("Sem histórico")
+    _history(db, first, (datetime(2026, 5, 1), 50.0), (datetime(2026, 5, 3), 45.0))
+    _history(db, second, (datetime(2026, 5, 2), 70.0))
+    response = client.get("/price-history/as-of", params={
+        "product_ids": [first.id, second.id, empty.id], "timestamp": "2026-05-02T12:00:00"
+    })
+    assert response.json() == [
+        {"product_id": first.id, "price": 50.0, "date": "2026-05-01T00:00:00"},
+        {"product_id": second.id, "price": 70.0, "date": "2026-05-02T00:00:00"},
+    ]
+
+
+def test_raw_pages_with_a_cursor_inside_a_range(client, db, make_product):
+    product = make_product("Liquidificador")
+    _history(db, product, *((datetime(2026, 5, day), float(day)) for day in range(1, 8)))
+    prices, cursor = [], None
+    while True:
+        params = {"start": "2026-05-02T00:00:00", "end": "2026-05-07T00:00:00", "limit": 2, "sort": "desc"}
+        if cursor:
+            params["cursor"] = cursor
+        body = client.get(f"/price-history/{product.id}/raw", params=params).json()
+        prices.extend(item["price"] for item in body["items"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert prices == [6.0, 5.0, 4.0, 3.0, 2.0]
+
+
+def test_buckets_skip_null_prices(client, db, make_product):
+    product = make_product("Cafeteira")
+    _history(
+        db, product,
+        (datetime(2026, 5, 1, 9), 100.0),
+        (datetime(2026, 5, 1, 18), None),
+        (datetime(2026, 5, 2, 9), None),
+        (datetime(2026, 5, 3, 9), 80.0),
+        (datetime(2026, 5, 3, 12), 90.0),
+    )
+    response = client.get(f"/price-history/{product.id}/buckets", params={"interval": "day"})
+    assert response.status_code == 200
+    assert [(row["bucket"][:10], row["min_price"], row["max_price"], row["last_price"], row["count"])
+            for row in response.json()] == [
+        ("2026-05-01", 100.0, 100.0, 100.0, 1),
+        ("2026-05-03", 80.0, 90.0, 90.0, 2),
+    ]
+
+
+def test_as_of_accepts_null_price(client, db, make_product):
+    product = make_product("Chaleira")
+    _history(db, product, (datetime(2026, 5, 1), 50.0), (datetime(2026, 5, 2), None))
+    response = client.get("/price-history/as-of", params={"product_ids": [product.id], "timestamp": "2026-05-03T00:00:00"})
+    assert response.status_code == 200
+    assert response.json() == [{"product_id": product.id, "price": None, "date": "2026-05-02T00:00:00"}]
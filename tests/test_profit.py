@@ -0,0 +1,78 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+TODAY = datetime.utcnow().replace(hour=12, minute=0, second=0, microsecond=0)
+
+
+@pytest.fixture
+def sold(client, make_category, make_product):
+    # Margens: a do produto vence a da categoria, que vence a padrão (0,2).
+    category = make_category("Eletrônicos", profit_margin=0.5)
+    products = [
+        make_product("Com margem", category=category, profit_margin=0.1),
+        make_product("Da categoria", category=category),
+        make_product("Padrão"),
+    ]
+    for product in products:
+        client.post("/sales", json={
+            "product_id": product.id, "quantity": 1, "total_price": 100.0, "date": TODAY.isoformat()
+        })
+    return category, products
+
+
+def test_summary_applies_margins_in_sql(client, sold):
+    body = client.get("/sales/profit/total", params={"detail": "none"}).json()
+    assert body["total_profit"] == pytest.approx(10.0 + 50.0 + 20.0)
+    assert (body["total_revenue"], body["quantity"], body["sale_count"]) == (300.0, 3, 3)
+    assert "sales" not in body
+
+    category, _ = sold
+    in_category = client.get("/sales/profit/total", params={"detail": "none", "category_id": category.id}).json()
+    assert in_category["total_profit"] == pytest.approx(60.0)
+
+
+def test_detail_modes(client, sold):
+    full = client.get("/sales/profit/total", params={"detail": "all"}).json()
+    assert [sale["profit"] for sale in full["sales"]] == pytest.approx([10.0, 50.0, 20.0])
+
+    page = client.get("/sales/profit/total", params={"detail": "page", "limit": 2}).json()
+    assert len(page["sales"]) == 2
+    rest = client.get("/sales/profit/total", params={"detail": "page", "limit": 2, "cursor": page["next_cursor"]}).json()
+    assert [sale["id"] for sale in page["sales"] + rest["sales"]] == [sale["id"] for sale in full["sales"]]
+    assert rest["next_cursor"] is None
+
+    stream = client.get("/sales/profit/total", params={"detail": "stream"})
+    assert stream.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line)["profit"] for line in stream.text.splitlines()] == pytest.approx([10.0, 50.0, 20.0])
+
+
+def test_breakdown_groups(client, sold):
+    category, products = sold
+    by_product = client.get("/sales/profit/breakdown", params={"group_by": "product"}).json()
+    assert [(row["name"], row["profit"]) for row in by_product] == [
+        ("Com margem", pytest.approx(10.0)), ("Da categoria", pytest.approx(50.0)), ("Padrão", pytest.approx(20.0))
+    ]
+    by_category = client.get("/sales/profit/breakdown", params={"group_by": "category"}).json()
+    assert {row["key"]: row["revenue"] for row in by_category} == {"none": 100.0, str(category.id): 200.0}
+    by_month = client.get("/sales/profit/breakdown", params={"group_by": "month"}).json()
+    assert [row["key"] for row in by_month] == [TODAY.strftime("%Y-%m-01")]
+
+
+def test_days_window(client, make_product):
+    product = make_product("Antigo")
+    client.post("/sales", json={
+        "product_id": product.id, "quantity": 1, "total_price": 100.0,
+        "date": (TODAY - timedelta(days=40)).isoformat()
+    })
+    assert client.get("/sales/profit/total", params={"detail": "none", "days": 30}).json()["total_profit"] == 0.0
+    assert client.get("/sales/profit/total", params={"detail": "none", "days": 60}).json()["total_profit"] == pytest.approx(20.0)
+
+
+def test_profit_total_returns_only_the_summary_by_default(client, make_product):
+    product = make_product("Teclado")
+    client.post("/sales", json={"product_id": product.id, "quantity": 1, "total_price": 100.0, "date": datetime.utcnow().isoformat()})
+    body = client.get("/sales/profit/total").json()
+    assert body["sale_count"] == 1
+    assert "sales" not in body
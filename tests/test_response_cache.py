@@ -0,0 +1,80 @@
+from app.services.response_cache import CATEGORIES, LocalBackend, ResponseCache
+
+
+class SharedBackend(LocalBackend):
+    """Substituto local do Redis: uma instância compartilhada por vários caches, como workers."""
+
+
+def test_get_is_cached_with_etag_and_304(client, make_category):
+    make_category("Bebidas")
+    first = client.get("/categories")
+    assert first.headers["x-cache"] == "MISS"
+    second = client.get("/categories", params={})
+    assert second.headers["x-cache"] == "HIT"
+    assert second.headers["etag"] == first.headers["etag"]
+    assert second.json() == first.json()
+    not_modified = client.get("/categories", headers={"If-None-Match": first.headers["etag"]})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+
+
+def test_query_parameters_are_normalized(client, make_category):
+    make_category("Bebidas")
+    assert client.get("/categories?limit=5&skip=0").headers["x-cache"] == "MISS"
+    assert client.get("/categories?skip=0&limit=5").headers["x-cache"] == "HIT"
+
+
+def test_writes_invalidate_the_namespace(client, make_category):
+    make_category("Bebidas")
+    etag = client.get("/categories").headers["etag"]
+    assert client.post("/categories/", json={"name": "Limpeza"}).status_code == 200
+    fresh = client.get("/categories", headers={"If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert fresh.headers["x-cache"] == "MISS"
+    assert {item["name"] for item in fresh.json()["items"]} == {"Bebidas", "Limpeza"}
+
+
+def test_csv_import_invalidates_the_namespace(client, make_category):
+    make_category("Bebidas")
+    client.get("/categories")
+    response = client.post("/categories/upload-csv", files={"file": ("c.csv", "name\nHortifruti\n")})
+    assert response.json()["imported"] == 1
+    assert client.get("/categories").headers["x-cache"] == "MISS"
+
+
+def test_shared_backend_invalidates_every_worker():
+    backend = SharedBackend()
+    worker_a, worker_b = ResponseCache(backend), ResponseCache(backend)
+    key = worker_b.key(CATEGORIES, "/categories", b"")
+    worker_b.set(key, {"status": 200, "headers": [], "body": "[]", "etag": '"x"'})
+    assert worker_a.get(worker_a.key(CATEGORIES, "/categories", b"")) is not None
+    worker_a.invalidate(CATEGORIES)
+    assert worker_b.get(worker_b.key(CATEGORIES, "/categories", b"")) is None
+
+
+def test_local_backend_is_bounded_lru():
+    backend = LocalBackend(max_entries=2)
+    backend.set("a", {"v": 1}, 60)
+    backend.set("b", {"v": 2}, 60)
+    backend.get("a")
+    backend.set("c", {"v": 3}, 60)
+    assert backend.get("b") is None
+    assert backend.get("a") == {"v": 1} and backend.get("c") == {"v": 3}
+    backend.set("d", {"v": 4}, -1)
+    assert backend.get("d") is None
+
+
+def test_category_upsert_invalidates_products(client, make_category, make_product):
+    category = make_category("Bebidas")
+    make_product("Água", category=category)
+    assert client.get("/products").headers["x-cache"] == "MISS"
+    assert client.get("/products").headers["x-cache"] == "HIT"
+
+    # O upsert casa " BEBIDAS " com "Bebidas" e troca o nome exibido nos produtos.
+    response = client.post(
+        "/categories/upload-csv", params={"mode": "upsert"}, files={"file": ("c.csv", "name\n BEBIDAS \n")}
+    )
+    assert response.json()["updated"] == 1
+    fresh = client.get("/products")
+    assert fresh.headers["x-cache"] == "MISS"
+    assert fresh.json()["items"][0]["category"]["name"] == "BEBIDAS"
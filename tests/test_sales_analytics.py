@@ -0,0 +1,74 @@
+from datetime import datetime
+
+import pytest
+
+from app.models import models
+from app.services.sales_analytics import SalesSnapshot, record_changes
+
+
+@pytest.fixture
+def sales(db, make_product, make_sale):
+    mouse = make_product("Mouse")
+    teclado = make_product("Teclado")
+    make_sale(mouse, quantity=1, total_price=10.0, date=datetime(2024, 1, 1, 10))   # segunda-feira
+    make_sale(mouse, quantity=2, total_price=20.0, date=datetime(2024, 1, 3, 10))
+    make_sale(teclado, quantity=1, total_price=50.0, date=datetime(2024, 1, 8, 10))
+    return mouse, teclado
+
+
+def test_summary(client, sales):
+    body = client.get("/sales/analytics/summary").json()
+    assert (body["sale_count"], body["quantity"], body["revenue"], body["product_count"]) == (3, 4, 80.0, 2)
+    assert body["first_sale"].startswith("2024-01-01")
+
+    mouse, _ = sales
+    body = client.get("/sales/analytics/summary", params={"product_id": mouse.id, "end": "2024-01-02T00:00:00"}).json()
+    assert (body["sale_count"], body["revenue"]) == (1, 10.0)
+
+
+def test_revenue_by_week_starts_on_monday(client, sales):
+    body = client.get("/sales/analytics/revenue", params={"group_by": "week"}).json()
+    assert [(row["key"], row["revenue"]) for row in body] == [("2024-01-01", 30.0), ("2024-01-08", 50.0)]
+
+
+def test_top_products(client, sales):
+    mouse, teclado = sales
+    body = client.get("/sales/analytics/top-products", params={"metric": "quantity", "limit": 1}).json()
+    assert [(row["product_id"], row["name"], row["quantity"]) for row in body] == [(mouse.id, "Mouse", 3)]
+    body = client.get("/sales/analytics/top-products").json()
+    assert [row["product_id"] for row in body] == [teclado.id, mouse.id]
+
+
+def test_api_writes_reach_the_loaded_snapshot(client, sales):
+    mouse, teclado = sales
+    assert client.get("/sales/analytics/summary").json()["revenue"] == 80.0
+
+    created = client.post("/sales", json={
+        "product_id": mouse.id, "quantity": 1, "total_price": 5.0, "date": "2024-01-09T10:00:00"
+    }).json()
+    client.put(f"/sales/{created['id']}", json={"total_price": 7.0})
+    assert client.get("/sales/analytics/summary").json()["revenue"] == 87.0
+
+    client.delete(f"/sales/{created['id']}")
+    client.delete(f"/products/{teclado.id}")
+    body = client.get("/sales/analytics/summary").json()
+    assert (body["sale_count"], body["revenue"]) == (2, 30.0)
+    assert client.get("/sales/analytics/status").json()["live_rows"] == 2
+
+
+def test_changes_recorded_by_other_workers_reach_the_snapshot(db, sales):
+    mouse, teclado = sales
+    worker = SalesSnapshot()
+    worker.refresh(db)
+    assert worker.summary()["revenue"] == 80.0
+
+    # Escritas de outro processo: só chegam a este pela tabela sale_changes.
+    sale = db.query(models.Sale).filter(models.Sale.product_id == mouse.id).first()
+    sale.total_price = 15.0
+    record_changes(db, [sale.id])
+    db.query(models.Sale).filter(models.Sale.product_id == teclado.id).delete()
+    record_changes(db, product_id=teclado.id)
+    db.commit()
+
+    worker.refresh(db, force=True)
+    assert (worker.summary()["sale_count"], worker.summary()["revenue"]) == (2, 35.0)
@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+from app.models import models
+
+
+@pytest.fixture
+def product(db, make_product):
+    return make_product("Mouse")
+
+
+def _sale(product_id, quantity=1, total_price=10.0, date="2024-01-01T10:00:00"):
+    return {"product_id": product_id, "quantity": quantity, "total_price": total_price, "date": date}
+
+
+def test_json_array_is_committed_in_groups(client, db, product):
+    body = [_sale(product.id, quantity=i + 1) for i in range(5)]
+    report = client.post("/sales/batch", params={"commit_size": 2}, json=body).json()
+    assert (report["received"], report["created"], report["rejected"], report["commits"]) == (5, 5, 0, 3)
+
+    ids = [row["id"] for row in report["results"]]
+    quantities = dict(db.query(models.Sale.id, models.Sale.quantity).all())
+    assert [quantities[sale_id] for sale_id in ids] == [1, 2, 3, 4, 5]
+    assert db.query(models.SalesDailyRollup.quantity).scalar() == 15
+
+
+def test_invalid_rows_are_rejected_by_position(client, db, product):
+    body = [_sale(product.id), {"product_id": product.id, "quantity": "muitos"}, _sale(999)]
+    report = client.post("/sales/batch", json=body).json()
+    assert (report["created"], report["rejected"]) == (1, 2)
+    statuses = [(row["index"], row["status"]) for row in report["results"]]
+    assert statuses == [(0, "created"), (1, "rejected"), (2, "rejected")]
+    assert any(error.startswith("quantity") for error in report["results"][1]["errors"])
+    assert report["results"][2]["errors"] == ["product_id: Produto não encontrado"]
+
+
+def test_ndjson_stream(client, db, product):
+    lines = [json.dumps(_sale(product.id)), "não é json", json.dumps(_sale(product.id, quantity=3))]
+    report = client.post(
+        "/sales/batch", params={"results": "errors"},
+        content="\n".join(lines) + "\n", headers={"Content-Type": "application/x-ndjson"}
+    ).json()
+    assert (report["received"], report["created"]) == (3, 2)
+    assert [row["index"] for row in report["results"]] == [1]
+    assert report["results"][0]["errors"][0].startswith("JSON inválido")
+
+
+def test_body_must_be_an_array(client, db):
+    assert client.post("/sales/batch", json={"product_id": 1}).status_code == 400
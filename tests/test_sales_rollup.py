@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from app.database import create_tables
+from app.models import models
+from app.services import sales_rollup
+from app.services.sales_rollup import rebuild_sales_rollup, rollup_table
+
+TODAY = datetime.utcnow().replace(hour=12, minute=0, second=0, microsecond=0)
+
+
+def _rollup(db) -> dict:
+    return {
+        (row.product_id, row.day): (row.sale_count, row.quantity, row.revenue)
+        for row in db.execute(select(rollup_table)).all()
+    }
+
+
+def _sale(product_id: int, quantity: int, total_price: float, date: datetime) -> dict:
+    return {"product_id": product_id, "quantity": quantity, "total_price": total_price, "date": date.isoformat()}
+
+
+def test_sale_writes_keep_rollup_in_sync(client, db, make_product):
+    first, second = make_product("Teclado"), make_product("Mouse")
+    yesterday = TODAY - timedelta(days=1)
+    ids = [
+        client.post("/sales", json=_sale(first.id, 2, 100.0, yesterday)).json()["id"],
+        client.post("/sales", json=_sale(first.id, 1, 50.0, yesterday)).json()["id"],
+        client.post("/sales", json=_sale(second.id, 3, 30.0, TODAY)).json()["id"],
+    ]
+    client.put(f"/sales/{ids[1]}", json={"quantity": 4, "total_price": 80.0, "date": TODAY.isoformat()})
+    client.delete(f"/sales/{ids[2]}")
+
+    assert _rollup(db) == {
+        (first.id, yesterday.date()): (1, 2, 100.0),
+        (first.id, TODAY.date()): (1, 4, 80.0),
+        (second.id, TODAY.date()): (0, 0, 0.0),
+    }
+
+    # O rollup mantido pelas escritas bate com o recalculado a partir de `sales`.
+    maintained = {key: value for key, value in _rollup(db).items() if value[0]}
+    rebuild_sales_rollup(db)
+    assert _rollup(db) == maintained
+
+
+def test_profit_total_comes_from_rollup(client, db, make_product):
+    product = make_product("Monitor")
+    client.post("/sales", json=_sale(product.id, 1, 1000.0, TODAY))
+    client.post("/sales", json=_sale(product.id, 1, 500.0, TODAY - timedelta(days=400)))
+    rebuild_sales_rollup(db)
+
+    body = client.get("/sales/profit/total", params={"days": 30, "detail": "all"}).json()
+    assert body["total_profit"] == 200.0
+    assert [sale["total_price"] for sale in body["sales"]] == [1000.0]
+    assert client.get("/sales/profit/total", params={"days": 500, "product_id": product.id}).json()["total_profit"] == 300.0
+
+
+def test_deleting_product_clears_its_rollup(client, db, make_product):
+    product = make_product("Cabo")
+    client.post("/sales", json=_sale(product.id, 1, 10.0, TODAY))
+    assert client.delete(f"/products/{product.id}").status_code == 200
+    assert _rollup(db) == {}
+    assert db.scalar(select(models.Sale.id)) is None
+
+
+def test_create_tables_backfills_an_empty_rollup(db, make_product, make_sale, monkeypatch):
+    product = make_product("Teclado")
+    make_sale(product, quantity=2, total_price=100.0, date=TODAY)
+    make_sale(product, quantity=1, total_price=50.0, date=TODAY)
+    db.execute(rollup_table.delete())
+    db.commit()
+
+    # Banco atualizado: a tabela de rollup acabou de ser criada, vazia, ao lado de vendas antigas.
+    create_tables()
+    assert _rollup(db) == {(product.id, TODAY.date()): (2, 3, 150.0)}
+
+    # Com o rollup preenchido, a inicialização não recalcula nada.
+    monkeypatch.setattr(sales_rollup, "rebuild_sales_rollup", lambda session: pytest.fail("rollup recalculado"))
+    create_tables()
@@ -0,0 +1,73 @@
+import pytest
+from sqlalchemy import text
+
+from app.models import models
+from app.services.search import filter_by_name, search_backend
+
+
+@pytest.fixture
+def catalog(db, make_category, make_product):
+    phones = make_category("Celulares")
+    return [
+        make_product("Galaxy S24", brand="Samsung", category=phones),
+        make_product("Capa para Galaxy", brand="Genérica"),
+        make_product("iPhone 15", brand="Apple", description="Concorrente do galaxy", category=phones),
+        make_product("Fone", brand="Samsung"),
+    ]
+
+
+NAMES = ["Modelo 1", "Modelo 10", "1 Modelo", "Cadeira Gamer Pro", "Gamer Cadeira", "Outro modelo 1X"]
+
+
+@pytest.fixture
+def titles(db, make_product):
+    return [make_product(name) for name in NAMES]
+
+
+def _names(response) -> list:
+    assert response.status_code == 200
+    return [item["name"] for item in response.json()]
+
+
+def test_index_is_kept_in_sync_by_triggers(db, catalog):
+    if search_backend(db) != "fts5":
+        pytest.skip("SQLite sem FTS5")
+    count = lambda: db.execute(text("SELECT count(*) FROM products_fts WHERE products_fts MATCH '\"galaxy\"'")).scalar()
+    assert count() == 3
+    catalog[1].name = "Capa para celular"
+    db.delete(catalog[0])
+    db.commit()
+    assert count() == 1
+
+
+def test_search_ranks_prefix_matches_first(client, catalog):
+    assert _names(client.get("/products/search", params={"q": "galaxy"})) == ["Galaxy S24", "Capa para Galaxy", "iPhone 15"]
+    assert sorted(_names(client.get("/products/search", params={"q": "samsung"}))) == ["Fone", "Galaxy S24"]
+
+
+def test_search_filters_and_short_terms(client, catalog):
+    category_id = catalog[0].category_id
+    assert _names(client.get("/products/search", params={"q": "galaxy", "category_id": category_id})) == ["Galaxy S24", "iPhone 15"]
+    assert _names(client.get("/products/search", params={"q": "galaxy", "limit": 1})) == ["Galaxy S24"]
+    # Menos de 3 caracteres: cai no ILIKE.
+    assert _names(client.get("/products/search", params={"q": "15"})) == ["iPhone 15"]
+
+
+def test_title_filter_uses_the_name_index(client, catalog):
+    body = client.get("/products", params={"title": "galaxy", "sort_by": "id"}).json()
+    assert [item["name"] for item in body["items"]] == ["Galaxy S24", "Capa para Galaxy"]
+    assert body["total"] == 4
+
+
+@pytest.mark.parametrize("term", ["Modelo 1", "modelo 1", "1 Modelo", "Cadeira Gamer", "Gamer Cadeira", "ira Gam", "Mo"])
+def test_title_filter_is_a_contiguous_substring(db, titles, term):
+    found = {product.name for product in filter_by_name(db, db.query(models.Product), term)}
+    # Mesma semântica do `ILIKE '%termo%'`, com ou sem o índice FTS.
+    assert found == {name for name in NAMES if term.lower() in name.lower()}
+
+
+def test_title_filter_uses_the_index_on_sqlite(db, titles):
+    if search_backend(db) != "fts5":
+        pytest.skip("SQLite sem FTS5")
+    statement = str(filter_by_name(db, db.query(models.Product), "Modelo 1").statement)
+    assert "products_fts" in statement
@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+from sqlalchemy import select
+from starlette.requests import ClientDisconnect
+
+from app.database import engine
+from app.models import models
+from app.utils.streaming import csv_response, stream_ndjson
+
+
+@pytest.fixture
+def catalog(db, make_product):
+    return [make_product(f"Produto {index:02}") for index in range(10)]
+
+
+def test_stream_closed_early_releases_the_connection(db, catalog):
+    checked_out = engine.pool.checkedout()
+    stream = stream_ndjson(db, select(models.Product.id, models.Product.name), batch_size=2)
+    assert next(stream).count("\n") == 2
+    assert engine.pool.checkedout() == checked_out + 1
+    stream.close()
+    assert engine.pool.checkedout() == checked_out
+
+
+def test_client_disconnect_releases_the_connection(db, catalog):
+    checked_out = engine.pool.checkedout()
+    response = csv_response(db, select(models.Product.id, models.Product.name), "products.csv")
+    sent = []
+
+    async def receive():
+        await asyncio.sleep(10)
+
+    async def send(message):
+        # O cliente cai depois do primeiro pedaço do corpo.
+        if message["type"] == "http.response.body" and sent:
+            raise OSError("conexão encerrada")
+        sent.append(message)
+
+    async def serve():
+        with pytest.raises(ClientDisconnect):
+            await response({"type": "http", "asgi": {"spec_version": "2.4"}}, receive, send)
+        # Ainda com o event loop vivo, como num servidor: nada de coletor de lixo ajudando.
+        return engine.pool.checkedout()
+
+    assert asyncio.run(serve()) == checked_out
@@ -0,0 +1,206 @@
+import threading
+import time
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, func, select
+
+from app.models import models
+from app.routers import categories, products, sales
+from app.schemas import schemas
+from app.database import DATABASE_URL
+from app.services.write_queue import WriteQueue, create_writer_engine, run_write
+
+
+def _sale(product_id: int, quantity: int = 2, total_price: float = 20.0, date: datetime = datetime(2026, 3, 1, 10)):
+    return schemas.SaleCreate(product_id=product_id, quantity=quantity, total_price=total_price, date=date)
+
+
+def _rollup(db, product_id: int) -> dict:
+    return {
+        row.day: (row.sale_count, row.quantity, row.revenue)
+        for row in db.query(models.SalesDailyRollup).filter(models.SalesDailyRollup.product_id == product_id)
+    }
+
+
+def _changes(db) -> list:
+    return db.execute(select(models.SaleChange.sale_id, models.SaleChange.product_id).order_by(models.SaleChange.id)).all()
+
+
+# Vendas ------------------------------------------------------------------------
+
+def test_insert_sale_updates_rollup(db, make_product):
+    product = make_product("Teclado")
+    sale = run_write(db, sales.insert_sale, _sale(product.id))
+    assert sale.id is not None
+    assert _rollup(db, product.id) == {datetime(2026, 3, 1).date(): (1, 2, 20.0)}
+
+
+def test_change_sale_moves_rollup_and_records_change(db, make_product):
+    product = make_product("Mouse")
+    sale = run_write(db, sales.insert_sale, _sale(product.id))
+    update = schemas.SaleUpdate(quantity=5, total_price=50.0, date=datetime(2026, 3, 2, 9))
+    run_write(db, sales.change_sale, sale.id, update)
+    assert _rollup(db, product.id) == {
+        datetime(2026, 3, 1).date(): (0, 0, 0.0),
+        datetime(2026, 3, 2).date(): (1, 5, 50.0),
+    }
+    assert _changes(db) == [(sale.id, None)]
+
+
+def test_remove_sale(db, make_product):
+    product = make_product("Cabo")
+    sale = run_write(db, sales.insert_sale, _sale(product.id))
+    run_write(db, sales.remove_sale, sale.id)
+    assert db.get(models.Sale, sale.id) is None
+    assert _rollup(db, product.id) == {datetime(2026, 3, 1).date(): (0, 0, 0.0)}
+    with pytest.raises(HTTPException) as error:
+        run_write(db, sales.remove_sale, sale.id)
+    assert error.value.status_code == 404
+
+
+def test_insert_sale_unknown_product_is_404(db):
+    with pytest.raises(HTTPException) as error:
+        run_write(db, sales.insert_sale, _sale(999))
+    assert error.value.status_code == 404
+    assert db.scalar(select(func.count()).select_from(models.Sale)) == 0
+
+
+def test_change_sale_rejects_unknown_product(db, make_product):
+    product = make_product("Monitor")
+    sale = run_write(db, sales.insert_sale, _sale(product.id))
+    with pytest.raises(HTTPException) as error:
+        run_write(db, sales.change_sale, sale.id, schemas.SaleUpdate(product_id=999))
+    assert error.value.status_code == 404
+    assert db.get(models.Sale, sale.id).product_id == product.id
+
+
+# Produtos ----------------------------------------------------------------------
+
+def test_insert_product_counts_category(db, make_category):
+    category = make_category("Periféricos")
+    product = run_write(db, products.insert_product, schemas.ProductBase(name="Webcam", price=100.0, category_id=category.id))
+    assert product.category.name == "Periféricos"
+    db.refresh(category)
+    assert category.product_count == 1
+
+
+def test_insert_product_rejects_duplicate_name_and_unknown_category(db, make_product):
+    make_product("Headset")
+    with pytest.raises(HTTPException) as error:
+        run_write(db, products.insert_product, schemas.ProductBase(name="  HEADSET ", price=1.0))
+    assert error.value.status_code == 400
+    with pytest.raises(HTTPException) as error:
+        run_write(db, products.insert_product, schemas.ProductBase(name="Microfone", price=1.0, category_id=999))
+    assert error.value.status_code == 404
+
+
+def test_change_product_price_records_history_and_moves_count(db, make_category, make_product):
+    old, new = make_category("Antiga"), make_category("Nova")
+    product = make_product("Caixa de som", price=80.0, category=old)
+    run_write(db, products.change_product, product.id, schemas.ProductUpdate(price=70.0, category_id=new.id))
+    history = db.query(models.PriceHistory).filter(models.PriceHistory.product_id == product.id).all()
+    assert [entry.price for entry in history] == [70.0]
+    db.refresh(old)
+    db.refresh(new)
+    assert (old.product_count, new.product_count) == (0, 1)
+
+
+def test_remove_product_cascades_and_records_change(db, make_category, make_product):
+    category = make_category("Áudio")
+    product = make_product("Fone", category=category)
+    run_write(db, sales.insert_sale, _sale(product.id))
+    run_write(db, products.remove_product, product.id)
+    assert db.scalar(select(func.count()).select_from(models.Sale)) == 0
+    assert db.scalar(select(func.count()).select_from(models.SalesDailyRollup)) == 0
+    db.refresh(category)
+    assert category.product_count == 0
+    assert _changes(db) == [(None, product.id)]
+
+
+def test_apply_category_discount(db, make_category, make_product):
+    category = make_category("Promo")
+    make_product("A", price=100.0, category=category)
+    make_product("B", price=None, category=category)
+    make_product("C", price=100.0)
+    assert run_write(db, products.apply_category_discount, category.id, 10) == 1
+    prices = dict(db.execute(select(models.Product.name, models.Product.price)).all())
+    assert prices == {"A": 90.0, "B": None, "C": 100.0}
+    assert db.scalar(select(func.count()).select_from(models.PriceHistory)) == 1
+    with pytest.raises(HTTPException):
+        run_write(db, products.apply_category_discount, 999, 10)
+
+
+# Categorias --------------------------------------------------------------------
+
+def test_category_units(db):
+    category = run_write(db, categories.insert_category, schemas.CategoryCreate(name="Games"))
+    with pytest.raises(HTTPException) as error:
+        run_write(db, categories.insert_category, schemas.CategoryCreate(name="games"))
+    assert error.value.status_code == 400
+    renamed = run_write(db, categories.change_category, category.id, schemas.CategoryUpdate(name="Jogos"))
+    assert (renamed.name, renamed.normalized_name) == ("Jogos", "jogos")
+    run_write(db, categories.remove_category, category.id)
+    assert db.get(models.Category, category.id) is None
+
+
+# run_write e fila de escrita ---------------------------------------------------
+
+def test_run_write_rolls_back_failed_unit(db, make_product):
+    product = make_product("Notebook")
+
+    def failing(session):
+        sales.insert_sale(session, _sale(product.id))
+        raise HTTPException(status_code=400, detail="falhou")
+
+    with pytest.raises(HTTPException):
+        run_write(db, failing)
+    assert db.scalar(select(func.count()).select_from(models.Sale)) == 0
+    assert db.scalar(select(func.count()).select_from(models.SalesDailyRollup)) == 0
+
+
+def test_write_queue_isolates_failing_unit(db, make_product):
+    product = make_product("Tablet")
+    queue = WriteQueue(max_delay=0.05, engine_factory=lambda: create_writer_engine(DATABASE_URL))
+    try:
+        futures = [
+            queue._enqueue(sales.insert_sale, (_sale(product.id),), {}),
+            queue._enqueue(sales.remove_sale, (999,), {}),
+            queue._enqueue(sales.insert_sale, (_sale(product.id, quantity=3),), {}),
+        ]
+        assert futures[0].result(timeout=10).id is not None
+        with pytest.raises(HTTPException):
+            futures[1].result(timeout=10)
+        assert futures[2].result(timeout=10).quantity == 3
+    finally:
+        queue.stop()
+        queue.engine.dispose()
+    assert db.scalar(select(func.count()).select_from(models.Sale)) == 2
+    assert queue.failed_units == 1
+
+
+def test_write_queue_cancels_unit_that_expires_in_queue():
+    queue = WriteQueue(timeout=0.05, engine_factory=lambda: create_engine("sqlite://"))
+    started = []
+    running = threading.Event()
+
+    def slow(session):
+        started.append("slow")
+        running.set()
+        time.sleep(0.3)
+
+    def quick(session):
+        started.append("quick")
+
+    try:
+        blocker = queue._enqueue(slow, (), {})
+        # Só com o writer ocupado a segunda unidade fica de fato esperando na fila.
+        assert running.wait(5)
+        with pytest.raises(HTTPException) as error:
+            queue.submit(quick)
+        assert error.value.status_code == 503
+        blocker.result(timeout=5)
+    finally:
+        queue.stop()
+    assert started == ["slow"]